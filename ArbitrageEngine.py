@@ -1,19 +1,2902 @@
-# ArbitrageEngine - Pseudocode Outline
+# ArbitrageEngine - marketplace arbitrage scanner
 #
-# This module sketches out the design of a personal AI tool that scans
-# various public marketplaces looking for arbitrage opportunities.
-# It illustrates how the engine could be organized in Python.
+# Polls the search pages of public marketplaces for a set of queries,
+# extracts listings through declarative MarketplaceSpec parsers (bs4 or
+# lxml), compares their prices with resale estimates and deal rules, and
+# alerts on underpriced ones. Fetching is rate limited, cached and
+# deduplicated per marketplace; metrics, price history and multiprocess
+# sharding are optional. main() is the command line entry point.
+
+from __future__ import annotations
 
 import asyncio
+import bisect
+import codecs
+import functools
+import hashlib
+import heapq
+import inspect
+import itertools
+import math
+import os
+import random
 import re
-from urllib.parse import quote_plus
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import repeat
+from operator import attrgetter
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import quote_plus, urlsplit
+
+# aiohttp and BeautifulSoup take longer to import than the rest of the
+# module; they are imported where first needed so short runs, warm start
+# clients and the lxml backend do not pay for them.
+if TYPE_CHECKING:
+    import sqlite3
+
+    import aiohttp
+
+
+# ----------------------------------------------------------------------
+# Listing records
+# ----------------------------------------------------------------------
+class Listing:
+    """A single marketplace listing.
+
+    A compact ``__slots__`` record emitted by the parsers. For backward
+    compatibility it supports ``listing["title"]`` and ``listing.get(...)``
+    lookups and compares equal to the equivalent dict from
+    :meth:`to_dict`.
+    """
+
+    __slots__ = ("title", "price", "url", "marketplace", "query", "market_value", "category")
+
+    def __init__(
+        self,
+        title,
+        price=None,
+        url=None,
+        marketplace=None,
+        query=None,
+        market_value=None,
+        category=None,
+    ):
+        self.title = title
+        self.price = price
+        self.url = url
+        self.marketplace = marketplace
+        self.query = query
+        self.market_value = market_value
+        self.category = category
+
+    @classmethod
+    def from_dict(cls, data) -> "Listing":
+        """Build a listing from a dict with the same keys."""
+        return cls(
+            data.get("title"),
+            data.get("price"),
+            data.get("url"),
+            data.get("marketplace"),
+            data.get("query"),
+            data.get("market_value"),
+            data.get("category"),
+        )
+
+    def to_dict(self) -> dict:
+        """Return the listing as a dict, omitting unset optional fields."""
+        data = {"title": self.title, "price": self.price, "url": self.url}
+        for name in ("marketplace", "query", "market_value", "category"):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def copy(self) -> "Listing":
+        """Return a shallow copy, like ``dict.copy``."""
+        return type(self)(*self._astuple())
+
+    def _astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, Listing):
+            return self._astuple() == other._astuple()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"Listing({fields})"
+
+
+def _listing_field(listing, name, default=None):
+    """Return ``name`` from a dict or attribute style listing."""
+    if isinstance(listing, dict):
+        return listing.get(name, default)
+    return getattr(listing, name, default)
+
+
+# ----------------------------------------------------------------------
+# Marketplace extractors
+#
+# Each marketplace is described by a declarative :class:`MarketplaceSpec`
+# that is compiled once into an extractor per parser backend. Extractors
+# pickle by spec, so they can be shipped to a worker process by
+# :class:`concurrent.futures.ProcessPoolExecutor`.
+# ----------------------------------------------------------------------
+_PRICE_PATTERN = re.compile(r"\$([0-9,.]+)")
+
+
+def parse_price(text) -> float | None:
+    """Return the first dollar amount in ``text`` as a float, or ``None``."""
+    if not text or "$" not in text:
+        return None
+    match = _PRICE_PATTERN.search(text)
+    if match is None:
+        return None
+    amount = match.group(1)
+    if "," in amount:
+        amount = amount.replace(",", "")
+    try:
+        return float(amount)
+    except ValueError:
+        return None
+
+
+class MarketplaceSpec(NamedTuple):
+    """How to search one marketplace and extract listings from its results.
+
+    Selectors are CSS compound selectors matched below each result item: a
+    tag name followed by any number of ``.class``, ``[attr]``,
+    ``[attr='value']`` and ``[attr*='value']`` filters, which every parser
+    backend supports.
+
+    Attributes
+    ----------
+    name : str
+        Marketplace name used in ``marketplaces`` and metrics.
+    base_url : str
+        Site root that search URLs and relative links are resolved
+        against, unless overridden with the engine's ``base_urls``.
+    search_path : str
+        Search URL relative to the site root with a ``{query}`` placeholder.
+    items : str
+        Selector of the result items.
+    title : str | None
+        Selector of the title element, or ``None`` for the item itself.
+    title_attr : str | None
+        Attribute of the title element holding the title. Without it, or
+        when it is empty, the element's text is used; for the item itself
+        that is its first text that does not contain a price.
+    require_title : bool
+        Skip items without a title.
+    price : str | None
+        Selector of the price element. ``None`` uses the item's first text
+        containing ``$``.
+    price_following : bool
+        Look for the price element anywhere after the start of the item,
+        for pages that render it outside the item.
+    link : str | None
+        Selector of the element whose ``href`` is the listing URL, or
+        ``None`` for the item itself.
+    link_contains : str | None
+        Skip items whose link does not contain this text.
+    absolute_links : bool
+        Prefix relative links with the site root (or the engine's
+        ``base_urls`` entry). Disable it to keep links as they appear on
+        the page.
+    """
+
+    name: str
+    base_url: str
+    search_path: str
+    items: str
+    title: str | None = None
+    title_attr: str | None = None
+    require_title: bool = False
+    price: str | None = None
+    price_following: bool = False
+    link: str | None = None
+    link_contains: str | None = None
+    absolute_links: bool = True
+
+
+_CSS_COMPOUND = re.compile(
+    r"(?P<tag>[A-Za-z][\w-]*|\*)?"
+    r"(?P<filters>(?:\.[\w-]+|\[[\w-]+(?:\*?=(?:'[^']*'|\"[^\"]*\"))?\])*)"
+)
+_CSS_FILTER = re.compile(
+    r"\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)(?P<quote>['\"])(?P<value>.*?)(?P=quote))?\]"
+)
+
+
+def _parse_selector(selector: str) -> tuple[str | None, list[tuple[str, str, str | None]]]:
+    """Split a CSS compound selector into its tag and ``(attr, op, value)`` filters.
+
+    Classes become ``("class", "~=", name)`` and a bare ``[attr]`` has
+    neither operator nor value.
+
+    Raises
+    ------
+    ValueError
+        If ``selector`` is not a single compound selector.
+    """
+    match = _CSS_COMPOUND.fullmatch(selector.strip())
+    if match is None or not selector.strip():
+        raise ValueError(f"Unsupported selector: {selector!r}")
+    filters = [
+        ("class", "~=", part["cls"]) if part["cls"] else (part["attr"], part["op"], part["value"])
+        for part in _CSS_FILTER.finditer(match["filters"])
+    ]
+    tag = match["tag"]
+    return (None if tag == "*" else tag), filters
+
+
+def css_to_xpath(selector: str) -> str:
+    """Translate a CSS compound selector to an XPath step without an axis.
+
+    Raises
+    ------
+    ValueError
+        If ``selector`` is not a single compound selector.
+    """
+    tag, filters = _parse_selector(selector)
+    conditions = []
+    for attr, op, value in filters:
+        if op == "~=":
+            conditions.append(f"contains(concat(' ', normalize-space(@{attr}), ' '), ' {value} ')")
+        elif op is None:
+            conditions.append(f"@{attr}")
+        elif op == "=":
+            conditions.append(f"@{attr}='{value}'")
+        else:
+            conditions.append(f"contains(@{attr}, '{value}')")
+    return (tag or "*") + "".join(f"[{condition}]" for condition in conditions)
+
+
+def _css_matcher(selector: str):
+    """Return ``matches(name, attrs)`` testing a tag that is not built yet."""
+    tag, filters = _parse_selector(selector)
+
+    def matches(name, attrs) -> bool:
+        if tag is not None and name != tag:
+            return False
+        for attr, op, value in filters:
+            actual = attrs.get(attr)
+            if actual is None:
+                return False
+            if not isinstance(actual, str):
+                actual = " ".join(actual)
+            if op == "~=":
+                if value not in actual.split():
+                    return False
+            elif op == "=":
+                if actual != value:
+                    return False
+            elif op == "*=" and value not in actual:
+                return False
+        return True
+
+    return matches
+
+
+@functools.lru_cache(maxsize=None)
+def _selector_filter_type():
+    """Return a BeautifulSoup filter building only the subtrees of matching tags.
+
+    Everything else on the page is tokenized but never turned into tree
+    nodes. Returns ``None`` with BeautifulSoup < 4.13, which always builds
+    the whole page.
+    """
+    try:
+        from bs4.filter import ElementFilter
+    except ImportError:
+        return None
+
+    class SelectorFilter(ElementFilter):
+        def __init__(self, selectors):
+            super().__init__()
+            self._matchers = [_css_matcher(selector) for selector in selectors]
+
+        @property
+        def includes_everything(self) -> bool:
+            return False
+
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            attrs = attrs or {}
+            return any(matches(name, attrs) for matches in self._matchers)
+
+        def allow_string_creation(self, string) -> bool:
+            return False
+
+    return SelectorFilter
+
+
+class Extractor:
+    """Listing extractor compiled from a :class:`MarketplaceSpec`.
+
+    Call it with ``(html, base_url=None, limit=None)`` to get the page's
+    listings, at most ``limit`` of them. Selectors are compiled when the
+    extractor is first used, so marketplaces that are never scanned cost
+    nothing. Subclasses implement the node access of one parser backend.
+    """
+
+    backend = None
+
+    def __init__(self, spec: MarketplaceSpec):
+        self.spec = spec
+        self._compiled = False
+
+    def __reduce__(self):
+        # Compiled selectors stay behind; the receiving process compiles its own
+        return compile_extractor, (self.spec, self.backend)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.spec.name}>"
+
+    def __call__(
+        self, html: str, base_url: str | None = None, limit: int | None = None
+    ) -> list[Listing]:
+        self.compile()
+        root = self._root(html)
+        if root is None:
+            return []
+        return self._extract(root, base_url, limit)
+
+    def compile(self) -> "Extractor":
+        """Compile the selectors now rather than on first use."""
+        if not self._compiled:
+            self._compile()
+            self._compiled = True
+        return self
+
+    def stream(self, base_url: str | None = None, limit: int | None = None):
+        """Return an incremental parser fed the page as it downloads.
+
+        Backends that can only parse a complete page return ``None``.
+        """
+        return None
+
+    def _compile(self) -> None:
+        raise NotImplementedError
+
+    def _extract(self, root, base_url, limit) -> list[Listing]:
+        base_url = base_url or self.spec.base_url
+        listings = []
+        for item in self._items(root):
+            listing = self._listing(item, base_url)
+            if listing is not None:
+                listings.append(listing)
+                if len(listings) == limit:
+                    break
+        return listings
+
+    def _listing(self, item, base_url) -> Listing | None:
+        """Return the listing of one result item, or ``None`` to skip it."""
+        spec = self.spec
+        link_el = item if self._link is None else self._first(self._link, item)
+        if link_el is None:
+            return None
+        href = link_el.get("href")
+        if not href or (spec.link_contains and spec.link_contains not in href):
+            return None
+
+        title_el = item if self._title is None else self._first(self._title, item)
+        if title_el is None:
+            return None
+        title = title_el.get(spec.title_attr) if spec.title_attr else None
+        if not title:
+            if title_el is item:
+                title = next((text for text in self._strings(item) if "$" not in text), None)
+            else:
+                title = "".join(self._strings(title_el))
+        if spec.require_title and not title:
+            return None
+
+        if self._price is None:
+            price = parse_price(next((t for t in self._strings(item) if "$" in t), None))
+        else:
+            if spec.price_following:
+                price_el = self._following(self._price, item)
+            else:
+                price_el = self._first(self._price, item)
+            price = None if price_el is None else parse_price(self._text(price_el))
+
+        if spec.absolute_links and not href.startswith("http"):
+            href = f"{base_url}{href}"
+        return Listing(title, price, href)
+
+
+class _SoupExtractor(Extractor):
+    """BeautifulSoup extractor using selectors precompiled by soupsieve.
+
+    Only the result items, and the price elements when prices may follow
+    an item, are built into the tree; the rest of the page is skipped
+    while parsing.
+    """
+
+    backend = "bs4"
+
+    def _compile(self) -> None:
+        import soupsieve
+
+        spec = self.spec
+        self._items_sel = soupsieve.compile(spec.items)
+        self._title, self._price, self._link = (
+            soupsieve.compile(selector) if selector else None
+            for selector in (spec.title, spec.price, spec.link)
+        )
+        self._parse_only = None
+        filter_type = _selector_filter_type()
+        if filter_type is not None:
+            kept = [spec.items, spec.price] if spec.price and spec.price_following else [spec.items]
+            self._parse_only = filter_type(kept)
+
+    def _root(self, html):
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(html, "html.parser", parse_only=self._parse_only)
+
+    def _items(self, root):
+        return self._items_sel.select(root)
+
+    def _first(self, selector, element):
+        return selector.select_one(element)
+
+    def _following(self, selector, element):
+        return element.find_next(selector.match)
+
+    def _strings(self, element):
+        return element.stripped_strings
+
+    def _text(self, element):
+        return element.get_text()
+
+
+class _LxmlExtractor(Extractor):
+    """lxml extractor evaluating precompiled XPath in C.
+
+    Pages are parsed incrementally by :class:`_LxmlPageStream`, which
+    drops everything outside the result items, and the price elements
+    when prices may follow an item, as the page is parsed. ``lxml`` is an
+    optional dependency, which is only imported when the extractor is
+    first used.
+    """
+
+    backend = "lxml"
+
+    def _compile(self) -> None:
+        from lxml import etree
+
+        spec = self.spec
+        item_step = css_to_xpath(spec.items)
+        self._items_xp = etree.XPath("//" + item_step)
+        self._is_item = etree.XPath(f"boolean(self::{item_step})")
+        self._item_tag = _parse_selector(spec.items)[0]
+        self._title, self._link = (
+            etree.XPath(f"descendant::{css_to_xpath(selector)}[1]") if selector else None
+            for selector in (spec.title, spec.link)
+        )
+        self._price = self._price_following = self._holds_price = None
+        if spec.price:
+            step = css_to_xpath(spec.price)
+            self._price = etree.XPath(f"descendant::{step}[1]")
+            self._price_following = etree.XPath(f"following::{step}[1]")
+            if spec.price_following:
+                self._holds_price = etree.XPath(f"boolean(descendant-or-self::{step})")
+        # Text nodes as BeautifulSoup's ``get_text`` sees them
+        self._text_xp = etree.XPath(
+            ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+        )
+
+    def stream(self, base_url=None, limit=None):
+        return _LxmlPageStream(self.compile(), base_url, limit)
+
+    def _root(self, html):
+        if not html or not html.strip():
+            return None
+        stream = _LxmlPageStream(self)
+        for start in range(0, len(html), _LXML_FEED_SIZE):
+            stream.feed(html[start : start + _LXML_FEED_SIZE])
+        return stream.root()
+
+    def _items(self, root):
+        return self._items_xp(root)
+
+    def _first(self, xpath, element):
+        found = xpath(element)
+        return found[0] if found else None
+
+    def _following(self, xpath, element):
+        # A union of both axes is evaluated in full; two steps stop early
+        found = self._first(xpath, element)
+        return found if found is not None else self._first(self._price_following, element)
+
+    def _strings(self, element):
+        return [text.strip() for text in self._text_xp(element) if text.strip()]
+
+    def _text(self, element):
+        return "".join(self._text_xp(element))
+
+
+# Characters of a complete page handed to the lxml parser at a time, so
+# content outside the result items is dropped before the rest is parsed
+_LXML_FEED_SIZE = 16384
+
+
+class _LxmlPageStream:
+    """Incremental lxml parse of a page that arrives in chunks.
+
+    Whenever a result item ends, the content before it that is outside
+    every item is removed from the tree, and the content after the last
+    item once the page ends, keeping the price elements when prices may
+    follow their item. :meth:`feed` reports when ``limit`` listings are
+    complete, so the rest of the body need not be downloaded or parsed.
+    When prices may follow their item, the next item is awaited so the
+    last price is in.
+    """
+
+    def __init__(self, extractor: _LxmlExtractor, base_url=None, limit=None):
+        self.extractor = extractor
+        self.base_url = base_url or extractor.spec.base_url
+        self.limit = limit
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard anything fed so far, e.g. before a retried download."""
+        from lxml import etree
+
+        self._parser = etree.HTMLPullParser(events=("end",), tag=self.extractor._item_tag)
+        # Result items and their ancestors, whose earlier siblings are pruned
+        self._kept = set()
+        self._last = None
+        self._found = 0
+        self._done = False
+        self._empty = True
+
+    def feed(self, text: str) -> bool:
+        """Parse the next chunk, returning ``True`` once enough listings arrived."""
+        if not text:
+            return self._done
+        self._empty = self._empty and text.isspace()
+        self._parser.feed(text)
+        extractor = self.extractor
+        for _, element in self._parser.read_events():
+            if not extractor._is_item(element):
+                continue
+            self._prune(element)
+            if self.limit is None or self._done:
+                continue
+            if self._found >= self.limit:
+                # The item after the last listing; any price before it is in
+                self._done = True
+            elif extractor._listing(element, self.base_url) is not None:
+                self._found += 1
+                self._done = self._found >= self.limit and not extractor.spec.price_following
+        return self._done
+
+    def _removable(self, element) -> bool:
+        holds_price = self.extractor._holds_price
+        if holds_price is not None and holds_price(element):
+            self._kept.add(element)
+            return False
+        return True
+
+    def _prune(self, item) -> None:
+        """Remove what precedes ``item`` outside every result item."""
+        extractor = self.extractor
+        # Only the outermost item and its ancestors border on the page outside
+        for ancestor in item.iterancestors(extractor._item_tag):
+            if extractor._is_item(ancestor):
+                item = ancestor
+        kept = self._kept
+        node = item
+        # Earlier siblings of kept nodes, and of their ancestors, are pruned
+        while node is not None and node not in kept:
+            kept.add(node)
+            previous = node.getprevious()
+            while previous is not None and previous not in kept:
+                before = previous.getprevious()
+                if self._removable(previous):
+                    node.getparent().remove(previous)
+                previous = before
+            node = node.getparent()
+        self._last = item
+
+    def root(self):
+        """Finish parsing and return the pruned tree, or ``None`` without items."""
+        from lxml import etree
+
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            return None
+        if self._empty or self._last is None:
+            return None
+        node = self._last
+        while node.getparent() is not None:
+            following = node.getnext()
+            while following is not None:
+                after = following.getnext()
+                if self._removable(following):
+                    node.getparent().remove(following)
+                following = after
+            node = node.getparent()
+        return node
+
+    def close(self) -> list[Listing]:
+        """Finish parsing and return the listings found."""
+        root = self.root()
+        if root is None:
+            return []
+        return self.extractor._extract(root, self.base_url, self.limit)
+
+
+# Extractor class of each parser backend.
+EXTRACTOR_BACKENDS = {"bs4": _SoupExtractor, "lxml": _LxmlExtractor}
+
+
+@functools.lru_cache(maxsize=None)
+def compile_extractor(spec: MarketplaceSpec, backend: str = "bs4") -> Extractor:
+    """Return the extractor for ``spec`` on ``backend``, compiling it once."""
+    return EXTRACTOR_BACKENDS[backend](spec)
+
+
+# Registered marketplaces, keyed by name.
+MARKETPLACE_SPECS = {}
+
+# Site root of each marketplace; search URLs are built relative to these.
+MARKETPLACE_BASE_URLS = {}
+
+# Extractor for each backend, keyed by marketplace name.
+PARSER_BACKENDS = {backend: {} for backend in EXTRACTOR_BACKENDS}
+
+
+def register_marketplace(spec: MarketplaceSpec) -> None:
+    """Make ``spec`` available to every engine, replacing one of the same name."""
+    MARKETPLACE_SPECS[spec.name] = spec
+    MARKETPLACE_BASE_URLS[spec.name] = spec.base_url
+    for backend, parsers in PARSER_BACKENDS.items():
+        parsers[spec.name] = compile_extractor(spec, backend)
+
+
+for _spec in (
+    MarketplaceSpec(
+        "facebook",
+        "https://www.facebook.com",
+        "/marketplace/search?q={query}",
+        items="a[href]",
+        title_attr="title",
+        link_contains="/marketplace/item/",
+    ),
+    MarketplaceSpec(
+        "ebay",
+        "https://www.ebay.com",
+        "/sch/i.html?_nkw={query}",
+        items="li.s-item",
+        title="h3.s-item__title",
+        price="span.s-item__price",
+        link="a.s-item__link",
+    ),
+    MarketplaceSpec(
+        "craigslist",
+        "https://craigslist.org",
+        "/search/sss?query={query}",
+        items="li.result-row",
+        title="a.result-title",
+        price="span.result-price",
+        link="a.result-title",
+    ),
+    MarketplaceSpec(
+        "aliexpress",
+        "https://www.aliexpress.com",
+        "/wholesale?SearchText={query}",
+        items="a[href][title][target]",
+        title_attr="title",
+        require_title=True,
+        price="span[class*='price']",
+        price_following=True,
+    ),
+    MarketplaceSpec(
+        "mercari",
+        "https://www.mercari.com",
+        "/search/?keyword={query}",
+        items="li[data-testid='ItemCell']",
+        title="p[data-testid='ItemCell__name']",
+        price="p[data-testid='ItemCell__price']",
+        link="a",
+    ),
+):
+    register_marketplace(_spec)
+del _spec
+
+# Names of the per-marketplace parsers before the registry existed.
+parse_facebook_html = PARSER_BACKENDS["bs4"]["facebook"]
+parse_ebay_html = PARSER_BACKENDS["bs4"]["ebay"]
+parse_craigslist_html = PARSER_BACKENDS["bs4"]["craigslist"]
+parse_aliexpress_html = PARSER_BACKENDS["bs4"]["aliexpress"]
+parse_mercari_html = PARSER_BACKENDS["bs4"]["mercari"]
+parse_facebook_lxml = PARSER_BACKENDS["lxml"]["facebook"]
+parse_ebay_lxml = PARSER_BACKENDS["lxml"]["ebay"]
+parse_craigslist_lxml = PARSER_BACKENDS["lxml"]["craigslist"]
+parse_aliexpress_lxml = PARSER_BACKENDS["lxml"]["aliexpress"]
+parse_mercari_lxml = PARSER_BACKENDS["lxml"]["mercari"]
+
+
+# ----------------------------------------------------------------------
+# Scheduling helpers
+# ----------------------------------------------------------------------
+class QueryResult(NamedTuple):
+    """Listings returned by one marketplace for one query."""
+
+    query: str | None
+    marketplace: str
+    listings: list
+
+
+class RateLimiter:
+    """Adaptive token bucket limiting how fast requests start.
+
+    Up to ``burst`` requests may start back to back, after which they are
+    spaced to ``rate`` per second. :meth:`penalize` halves the current rate
+    and can pause the bucket (e.g. for a ``Retry-After`` header);
+    :meth:`reward` raises the rate again in small steps up to ``rate``.
+
+    Parameters
+    ----------
+    rate : float | None
+        Maximum requests per second, or ``None`` for no limit. An unlimited
+        bucket still honours pauses requested through :meth:`penalize`.
+    burst : int, optional
+        Bucket capacity, by default ``1``.
+    """
+
+    def __init__(self, rate: float | None = None, burst: int = 1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 20 if rate else None
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Sleep until the next request is allowed to start."""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate is None:
+                    return
+                if self._updated is not None:
+                    elapsed = now - self._updated
+                    self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self, pause: float | None = None) -> None:
+        """Back off after the marketplace throttled or failed a request."""
+        if self.rate is not None:
+            self.rate = max(self.min_rate, self.rate / 2)
+        if pause:
+            resume = asyncio.get_running_loop().time() + pause
+            self._paused_until = max(self._paused_until, resume)
+
+    def reward(self) -> None:
+        """Recover some of the configured rate after a successful request."""
+        if self.rate is not None and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class RetryPolicy:
+    """How failed requests are retried.
+
+    Parameters
+    ----------
+    max_attempts : int, optional
+        Total attempts per request including the first, by default ``3``.
+    base_delay : float, optional
+        Backoff before the first retry in seconds, by default ``0.5``. Each
+        further retry doubles it.
+    max_delay : float, optional
+        Upper bound for a single backoff or ``Retry-After`` wait, by
+        default ``30``.
+    jitter : bool, optional
+        Randomize each backoff between zero and its nominal value ("full
+        jitter"), by default ``True``.
+    retry_statuses : Iterable[int], optional
+        HTTP statuses that are retried.
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        base_delay=0.5,
+        max_delay=30.0,
+        jitter=True,
+        retry_statuses=(429, 500, 502, 503, 504),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """Return the delay before retry number ``attempt`` (starting at 1)."""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds requested by a ``Retry-After`` header value."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import parsedate_to_datetime
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([a-z0-9_.:-]+)""", re.IGNORECASE)
+
+
+def page_encoding(charset: str | None, head: bytes) -> str:
+    """Return the encoding of an HTML page before its body has been read.
+
+    The ``charset`` of the ``Content-Type`` header wins, then a
+    ``<meta charset>`` declaration in the first kilobyte of the page
+    (``head``), then UTF-8.
+    """
+    match = _META_CHARSET.search(head[:1024])
+    for candidate in (charset, match and match.group(1).decode("ascii")):
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                continue
+    return "utf-8"
+
+
+class LatencyTracker:
+    """Derive a request timeout from observed response times.
+
+    Uses the smoothed mean and deviation estimator TCP uses for its
+    retransmission timeout: ``timeout = mean + 4 * deviation``, clamped to
+    ``[minimum, maximum]``.
+    """
+
+    def __init__(self, initial=5.0, minimum=1.0, maximum=30.0):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = None
+        self.deviation = None
+
+    def observe(self, seconds: float) -> None:
+        """Record the latency of one completed request."""
+        if self.mean is None:
+            self.mean = seconds
+            self.deviation = seconds / 2
+        else:
+            self.deviation = 0.75 * self.deviation + 0.25 * abs(seconds - self.mean)
+            self.mean = 0.875 * self.mean + 0.125 * seconds
+
+    @property
+    def timeout(self) -> float:
+        """Timeout in seconds for the next request."""
+        if self.mean is None:
+            return self.initial
+        return min(self.maximum, max(self.minimum, self.mean + 4 * self.deviation))
+
+
+class PrioritySemaphore:
+    """Semaphore that wakes the highest priority waiter first.
+
+    Waiters with equal priority are served in arrival order.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = []
+        self._counter = itertools.count()
+
+    def locked(self) -> bool:
+        return self._value == 0
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for a free slot, ahead of any lower priority waiters."""
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter or return it to the pool."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class MarketSchedule:
+    """Polling settings for one marketplace or one marketplace query.
+
+    Parameters
+    ----------
+    interval : float | None, optional
+        Seconds between the starts of consecutive scans. Defaults to the
+        engine's ``refresh_interval``.
+    priority : int, optional
+        Scans with a higher priority get a concurrency slot first when the
+        engine is at ``max_concurrency``, by default ``0``.
+    deadline : float | None, optional
+        Seconds a single scan may take before it is abandoned.
+    """
+
+    def __init__(self, interval=None, priority=0, deadline=None):
+        self.interval = interval
+        self.priority = priority
+        self.deadline = deadline
+
+
+class ScheduledJob:
+    """A marketplace query polled periodically by :meth:`ArbitrageEngine.run`."""
+
+    def __init__(self, market, query, terms, interval, priority=0, deadline=None):
+        self.market = market
+        self.query = query
+        self.terms = terms
+        self.interval = interval
+        self.priority = priority
+        self.deadline = deadline
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def __repr__(self):
+        return (
+            f"ScheduledJob(market={self.market!r}, query={self.query!r}, "
+            f"interval={self.interval!r}, runs={self.runs}, skipped={self.skipped})"
+        )
+
+
+class ChurnStats:
+    """Observed churn of one marketplace query.
+
+    ``rate`` is a moving average of the new or repriced listings found per
+    second between consecutive scans, and ``None`` until it can be
+    estimated.
+    """
+
+    __slots__ = (
+        "market", "query", "interval", "scans", "listings", "new", "repriced", "rate", "last_scan"
+    )
+
+    def __init__(self, market, query, interval=None, rate=None):
+        self.market = market
+        self.query = query
+        self.interval = interval
+        self.scans = 0
+        self.listings = 0
+        self.new = 0
+        self.repriced = 0
+        self.rate = rate
+        self.last_scan = None
+
+    @property
+    def fresh_per_scan(self) -> float:
+        """Mean number of new or repriced listings found per scan."""
+        return (self.new + self.repriced) / self.scans if self.scans else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "market": self.market,
+            "query": self.query,
+            "interval": self.interval,
+            "scans": self.scans,
+            "listings": self.listings,
+            "new": self.new,
+            "repriced": self.repriced,
+            "fresh_per_scan": self.fresh_per_scan,
+            "fresh_per_minute": None if self.rate is None else self.rate * 60,
+        }
+
+
+class AdaptivePolling:
+    """Adjust polling intervals to the churn each marketplace query shows.
+
+    Every scan reports how many of its listings were new or repriced, from
+    which a per-query churn rate is estimated. Queries are then polled
+    often enough to find about ``target_fresh`` fresh listings per scan,
+    within ``[min_interval, max_interval]``. When that would exceed
+    ``request_budget`` the budget is shared in proportion to the square
+    root of each query's churn, which minimizes how long fresh listings
+    wait to be found for the requests spent.
+
+    Parameters
+    ----------
+    min_interval : float, optional
+        Shortest polling interval in seconds, by default ``10``.
+    max_interval : float, optional
+        Longest polling interval in seconds, by default ``3600``.
+    request_budget : float | None, optional
+        Maximum number of scans started per minute across all queries.
+        Unlimited when ``None``. ``max_interval`` takes precedence when
+        the budget is too small to honour it.
+    target_fresh : float, optional
+        Number of new or repriced listings a scan should find, by default
+        ``1``.
+    smoothing : float, optional
+        Weight of the latest scan in the moving average of the churn rate,
+        by default ``0.3``.
+    """
+
+    def __init__(
+        self,
+        min_interval=10.0,
+        max_interval=3600.0,
+        request_budget=None,
+        target_fresh=1.0,
+        smoothing=0.3,
+    ):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Expected 0 < min_interval <= max_interval")
+        if request_budget is not None and request_budget <= 0:
+            raise ValueError("request_budget must be positive")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.request_budget = request_budget
+        self.target_fresh = target_fresh
+        self.smoothing = smoothing
+        self.stats = {}
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def register(self, job: ScheduledJob) -> ChurnStats:
+        """Start tracking ``job``, assuming its configured interval fits its churn."""
+        stats = self.stats.get((job.market, job.query))
+        if stats is None:
+            interval = self._clamp(job.interval)
+            stats = ChurnStats(job.market, job.query, interval, self.target_fresh / interval)
+            self.stats[(job.market, job.query)] = stats
+        return stats
+
+    def observe(self, market, query, listings, new, repriced=0, now=None) -> ChurnStats:
+        """Record a scan that returned ``listings`` listings, ``new`` and
+        ``repriced`` of which had not been seen at their price before.
+
+        The first scan of a query only marks the start of the measurement:
+        everything looks new to it.
+        """
+        now = time.monotonic() if now is None else now
+        stats = self.stats.get((market, query))
+        if stats is None:
+            stats = self.stats[(market, query)] = ChurnStats(market, query)
+        if stats.last_scan is not None:
+            stats.scans += 1
+            stats.listings += listings
+            stats.new += new
+            stats.repriced += repriced
+            observed = (new + repriced) / max(now - stats.last_scan, 1e-3)
+            if stats.rate is None:
+                stats.rate = observed
+            else:
+                stats.rate += self.smoothing * (observed - stats.rate)
+        stats.last_scan = now
+        return stats
+
+    def allocate(self) -> dict:
+        """Return the polling interval of every tracked query."""
+        low, high = 1 / self.max_interval, 1 / self.min_interval
+        rates = {key: stats.rate or 0.0 for key, stats in self.stats.items()}
+        frequencies = {
+            key: min(high, max(low, rate / self.target_fresh)) for key, rate in rates.items()
+        }
+        budget = None if self.request_budget is None else self.request_budget / 60
+        if budget is not None and sum(frequencies.values()) > budget:
+            scale = self._water_level(rates, frequencies, low, budget)
+            frequencies = {
+                key: min(cap, max(low, scale * math.sqrt(rates[key])))
+                for key, cap in frequencies.items()
+            }
+        return {key: 1 / frequency for key, frequency in frequencies.items()}
+
+    @staticmethod
+    def _water_level(rates, caps, low, budget) -> float:
+        """Return the share of ``budget`` per unit of sqrt(churn).
+
+        Each query is polled at ``scale * sqrt(rate)`` clamped to
+        ``[low, cap]``, so the total is piecewise linear in ``scale``. Its
+        breakpoints are swept in order until the segment holding ``budget``
+        is found, which is then solved exactly.
+        """
+        fixed = low * len(rates)
+        if fixed >= budget:
+            return 0.0
+        events = []
+        for key, rate in rates.items():
+            if rate > 0 and caps[key] > low:
+                root = math.sqrt(rate)
+                # Leaves the lower bound, then saturates at its cap
+                events.append((low / root, root, -low))
+                events.append((caps[key] / root, -root, caps[key]))
+        events.sort()
+        slope = 0.0
+        for scale, delta_slope, delta_fixed in events:
+            if slope > 0 and fixed + slope * scale >= budget:
+                break
+            slope += delta_slope
+            fixed += delta_fixed
+        return (budget - fixed) / slope if slope > 0 else 0.0
+
+    def rebalance(self, jobs) -> None:
+        """Set the interval of each of ``jobs`` from the observed churn."""
+        for job in jobs:
+            self.register(job)
+        intervals = self.allocate()
+        for job in jobs:
+            key = (job.market, job.query)
+            job.interval = self.stats[key].interval = intervals[key]
+
+    def snapshot(self) -> dict:
+        """Return the churn statistics as a JSON serializable dict."""
+        scans = sum(stats.scans for stats in self.stats.values())
+        fresh = sum(stats.new + stats.repriced for stats in self.stats.values())
+        return {
+            "request_budget": self.request_budget,
+            "scans": scans,
+            "fresh": fresh,
+            "fresh_per_scan": fresh / scans if scans else 0.0,
+            "queries": [
+                stats.to_dict()
+                for _, stats in sorted(self.stats.items(), key=_label_order)
+            ],
+        }
+
+
+# ----------------------------------------------------------------------
+# Response cache
+# ----------------------------------------------------------------------
+class _CacheEntry:
+    __slots__ = ("etag", "last_modified", "body_hash", "listings", "size", "stored_at")
+
+    def __init__(self, etag, last_modified, body_hash, listings, size, stored_at):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.listings = listings
+        self.size = size
+        self.stored_at = stored_at
+
+
+def _estimate_size(listings) -> int:
+    """Return a rough byte count for a list of parsed listings."""
+    size = 64
+    for listing in listings:
+        size += 120
+        for name in ("title", "url"):
+            value = _listing_field(listing, name)
+            if isinstance(value, str):
+                size += 49 + len(value)
+    return size
+
+
+class ResponseCache:
+    """LRU cache of parsed listings keyed by request URL.
+
+    Each entry remembers the page's ``ETag`` and ``Last-Modified`` headers
+    so the next request can be made conditional, plus a hash of the body so
+    an unchanged page can skip parsing even when the server ignores
+    conditional requests. Listings are copied in and out of the cache, so
+    callers may tag the ones they get without touching the cached entry.
+
+    Parameters
+    ----------
+    ttl : float | None, optional
+        Seconds an entry stays valid, by default ``300``. ``None`` keeps
+        entries until they are evicted.
+    max_entries : int, optional
+        Maximum number of cached URLs, by default ``1024``.
+    max_bytes : int, optional
+        Approximate memory bound for all cached listings, by default 64 MiB.
+    """
+
+    def __init__(self, ttl=300, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._validators = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def hash_body(body: str) -> bytes:
+        """Return a digest identifying ``body``."""
+        return hashlib.blake2b(body.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _get_entry(self, url: str) -> _CacheEntry | None:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry.stored_at > self.ttl:
+            self._discard(url)
+            return None
+        self._entries.move_to_end(url)
+        return entry
+
+    def conditional_headers(self, url: str) -> dict:
+        """Return ``If-None-Match``/``If-Modified-Since`` headers for ``url``."""
+        entry = self._get_entry(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def record_validators(self, url: str, etag: str | None, last_modified: str | None) -> None:
+        """Remember the validators of the latest response for ``url``.
+
+        They are attached to the cache entry by the next :meth:`store`, or
+        by a :meth:`lookup` whose body hash matches the entry.
+        """
+        self._validators[url] = (etag, last_modified)
+
+    def lookup(self, url: str, body_hash: bytes | None = None):
+        """Return cached listings for ``url`` or ``None``.
+
+        With ``body_hash`` the entry is only returned when the stored page
+        has the same hash, and then takes over the validators recorded for
+        the response; without it (a ``304 Not Modified`` response) any live
+        entry matches.
+        """
+        entry = self._get_entry(url)
+        if entry is None or (body_hash is not None and entry.body_hash != body_hash):
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.stored_at = time.monotonic()
+        if body_hash is not None and url in self._validators:
+            entry.etag, entry.last_modified = self._validators.pop(url)
+        # Callers tag listings with their query, so they get their own copies
+        return [listing.copy() for listing in entry.listings]
+
+    def store(self, url: str, body_hash: bytes, listings: list) -> None:
+        """Cache ``listings`` parsed from a page whose body hashes to ``body_hash``."""
+        self._discard(url)
+        etag, last_modified = self._validators.pop(url, (None, None))
+        size = _estimate_size(listings)
+        if size > self.max_bytes:
+            return
+        self._entries[url] = _CacheEntry(
+            etag,
+            last_modified,
+            body_hash,
+            [listing.copy() for listing in listings],
+            size,
+            time.monotonic(),
+        )
+        self.total_bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+        self._validators.clear()
+        self.total_bytes = 0
+
+
+# ----------------------------------------------------------------------
+# Seen listing index
+# ----------------------------------------------------------------------
+def normalize_listing_url(url: str) -> str:
+    """Return ``url`` without its query string, fragment or trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}"
+
+
+class SeenListingIndex:
+    """Remember which listings have already been evaluated.
+
+    Listings are keyed by their normalized URL and fingerprinted by price,
+    so :meth:`filter_new` only passes on listings that are new or whose
+    price changed since they were last seen.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of remembered listings, by default ``100_000``. The
+        least recently seen listings are forgotten first.
+    ttl : float | None, optional
+        Seconds after which a listing that has not been seen again is
+        forgotten, by default one week.
+    path : str | os.PathLike | None, optional
+        SQLite database used to persist the index across restarts. The
+        index is kept in memory only when ``None``.
+
+    Attributes
+    ----------
+    repriced : int
+        Number of listings :meth:`filter_new` passed on because their
+        price changed.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=7 * 24 * 3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.repriced = 0
+        self._entries = OrderedDict()
+        self._db = None
+        if path is not None:
+            import sqlite3
+
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS seen_listings "
+                "(key TEXT PRIMARY KEY, price REAL, last_seen REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS seen_listings_last_seen "
+                "ON seen_listings (last_seen)"
+            )
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, listing):
+        return self.listing_key(listing) in self._entries
+
+    @staticmethod
+    def listing_key(listing) -> str:
+        """Return the identity used to deduplicate ``listing``."""
+        url = _listing_field(listing, "url")
+        if url:
+            return normalize_listing_url(url)
+        marketplace = _listing_field(listing, "marketplace") or ""
+        return f"title:{marketplace}:{_listing_field(listing, 'title')}"
+
+    @staticmethod
+    def _fingerprint(price):
+        return None if price is None else round(float(price), 2)
+
+    def _load(self) -> None:
+        cutoff = time.time() - self.ttl if self.ttl is not None else float("-inf")
+        rows = self._db.execute(
+            "SELECT key, price, last_seen FROM seen_listings "
+            "WHERE last_seen >= ? ORDER BY last_seen DESC LIMIT ?",
+            (cutoff, self.max_entries),
+        ).fetchall()
+        for key, price, last_seen in reversed(rows):
+            self._entries[key] = (price, last_seen)
+
+    def filter_new(self, listings, now=None) -> list:
+        """Return the listings that are new or repriced and record them all."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        fresh = []
+        updates = {}
+        for listing in listings:
+            key = self.listing_key(listing)
+            price = self._fingerprint(_listing_field(listing, "price"))
+            previous = self._entries.pop(key, None)
+            if previous is None or previous[0] != price:
+                fresh.append(listing)
+                if previous is not None:
+                    self.repriced += 1
+            self._entries[key] = (price, now)
+            updates[key] = (key, price, now)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            updates.pop(key, None)
+            evicted.append((key,))
+        if self._db is not None:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO seen_listings (key, price, last_seen) "
+                    "VALUES (?, ?, ?)",
+                    updates.values(),
+                )
+                self._db.executemany("DELETE FROM seen_listings WHERE key = ?", evicted)
+        return fresh
+
+    def _expire(self, now: float) -> None:
+        if self.ttl is None:
+            return
+        cutoff = now - self.ttl
+        while self._entries:
+            key, (_, last_seen) = next(iter(self._entries.items()))
+            if last_seen >= cutoff:
+                break
+            del self._entries[key]
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM seen_listings WHERE last_seen < ?", (cutoff,))
+
+    def clear(self) -> None:
+        """Forget every listing."""
+        self._entries.clear()
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM seen_listings")
+
+    def close(self) -> None:
+        """Close the backing database, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# ----------------------------------------------------------------------
+# Listing history
+# ----------------------------------------------------------------------
+class HistoryRecord(NamedTuple):
+    """One observation of a listing stored by :class:`ListingHistory`."""
+
+    seen_at: float
+    marketplace: str | None
+    query: str | None
+    url: str | None
+    title: str | None
+    price: float | None
+    market_value: float | None
+
+
+# The same URLs come back scan after scan, so their normalized form is cached
+_history_url = functools.lru_cache(maxsize=65536)(normalize_listing_url)
+
+
+class ListingHistory:
+    """Append-only SQLite store of every listing observed by the engine.
+
+    :meth:`record` only appends rows to an in-memory buffer; full batches
+    are written by a single background thread in one transaction each, so
+    recording never blocks the event loop on disk I/O. The database runs
+    in WAL mode, letting reads proceed while a batch is being written, and
+    is indexed for per-URL price history and per-query time windows.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        SQLite database file, created if needed. ``":memory:"`` is not
+        supported because reads and writes use separate connections.
+    batch_size : int, optional
+        Buffered rows that trigger a background write, by default
+        ``5000``. Larger batches amortize index updates.
+    flush_interval : float, optional
+        Seconds after which buffered rows are written even if the batch is
+        not full, by default ``5``.
+    """
+
+    _COLUMNS = "seen_at, marketplace, query, url, title, price, market_value"
+
+    def __init__(self, path, batch_size=5000, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        # (future, row count) of every write not yet checked for errors
+        self._pending = []
+        self._error = None
+        self.failures = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arbitrage-history")
+        # Only ever used from the writer thread
+        self._write_db = self._writer.submit(self._open_writer).result()
+        self._read_db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        import sqlite3
+
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def _open_writer(self) -> sqlite3.Connection:
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        # Keep the hot pages of the indexes in memory while appending
+        db.execute("PRAGMA cache_size=-65536")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS listing_history ("
+                "seen_at REAL NOT NULL, marketplace TEXT, query TEXT, url TEXT, "
+                "title TEXT, price REAL, market_value REAL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS listing_history_url "
+                "ON listing_history (url, seen_at)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS listing_history_query "
+                "ON listing_history (query, seen_at)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS listing_history_seen_at "
+                "ON listing_history (seen_at)"
+            )
+        return db
+
+    def _write(self, rows) -> None:
+        with self._write_db:
+            self._write_db.executemany(
+                f"INSERT INTO listing_history ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def record(self, listings, marketplace=None, query=None, now=None) -> None:
+        """Buffer one observation of every listing, tagged with when it was seen.
+
+        Listings carrying their own ``marketplace`` or ``query`` keep them;
+        URLs are stored normalized.
+        """
+        now = time.time() if now is None else now
+        rows = self._buffer
+        for listing in listings:
+            if isinstance(listing, Listing):
+                url = listing.url
+                row = (
+                    now,
+                    listing.marketplace or marketplace,
+                    listing.query or query,
+                    _history_url(url) if url else None,
+                    listing.title,
+                    listing.price,
+                    listing.market_value,
+                )
+            else:
+                url = _listing_field(listing, "url")
+                row = (
+                    now,
+                    _listing_field(listing, "marketplace") or marketplace,
+                    _listing_field(listing, "query") or query,
+                    _history_url(url) if url else None,
+                    _listing_field(listing, "title"),
+                    _listing_field(listing, "price"),
+                    _listing_field(listing, "market_value"),
+                )
+            rows.append(row)
+        if (
+            len(self._buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush(wait=False)
+
+    def flush(self, wait=True) -> None:
+        """Hand buffered rows to the writer thread, optionally waiting for it.
+
+        Rows of failed writes are counted in :attr:`failures`. Waiting
+        re-raises the first error since the last wait, including errors of
+        background writes that finished in the meantime.
+        """
+        rows, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if rows:
+            self._pending.append((self._writer.submit(self._write, rows), len(rows)))
+        pending = []
+        for future, count in self._pending:
+            if not wait and not future.done():
+                pending.append((future, count))
+                continue
+            error = future.exception()
+            if error is not None:
+                self.failures += count
+                if self._error is None:
+                    self._error = error
+        self._pending = pending
+        if wait and self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._read_db.execute("SELECT COUNT(*) FROM listing_history").fetchone()[0]
+
+    def price_history(self, url, since=None, until=None) -> list[tuple[float, float]]:
+        """Return ``(seen_at, price)`` observations of one listing, oldest first."""
+        self.flush()
+        return self._read_db.execute(
+            "SELECT seen_at, price FROM listing_history "
+            "WHERE url = ? AND seen_at >= ? AND seen_at < ? ORDER BY seen_at",
+            (_history_url(url), *self._window(since, until)),
+        ).fetchall()
+
+    def listings(self, since=None, until=None, query=None, marketplace=None) -> list[HistoryRecord]:
+        """Return the observations in ``[since, until)``, oldest first.
+
+        Optionally restricted to one ``query`` and/or ``marketplace``.
+        """
+        self.flush()
+        sql = f"SELECT {self._COLUMNS} FROM listing_history WHERE seen_at >= ? AND seen_at < ?"
+        params = list(self._window(since, until))
+        if query is not None:
+            sql += " AND query = ?"
+            params.append(query)
+        if marketplace is not None:
+            sql += " AND marketplace = ?"
+            params.append(marketplace)
+        rows = self._read_db.execute(sql + " ORDER BY seen_at", params).fetchall()
+        return [HistoryRecord._make(row) for row in rows]
+
+    @staticmethod
+    def _window(since, until) -> tuple[float, float]:
+        return (
+            float("-inf") if since is None else since,
+            float("inf") if until is None else until,
+        )
+
+    def close(self) -> None:
+        """Write any buffered rows and close the database."""
+        if self._read_db is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._writer.submit(self._write_db.close).result()
+            self._writer.shutdown()
+            self._read_db.close()
+            self._read_db = None
+
+
+# ----------------------------------------------------------------------
+# Columnar deal evaluation
+# ----------------------------------------------------------------------
+# Listing fields that carry an externally supplied market value, in order
+# of preference.
+VALUE_KEYS = ("market_value", "predicted_price", "estimated_price")
+
+# Below this many listings the per-listing generator is faster than
+# building NumPy arrays.
+VECTORIZE_MIN_LISTINGS = 256
+
+
+def _import_numpy():
+    """Return the ``numpy`` module or ``None`` if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def listing_columns(listings, np):
+    """Return ``(price, market_value, has_market_value)`` arrays for ``listings``.
+
+    Missing prices and ``None`` market values become ``NaN``;
+    ``has_market_value`` records whether a market value field was present
+    at all, mirroring :meth:`ArbitrageEngine.predict_resale_value`.
+    """
+    types = set(map(type, listings))
+    if types <= {Listing}:
+        return _record_columns(listings, np)
+    if types <= {dict}:
+        return _dict_columns(listings, np)
+    nan = float("nan")
+    prices = []
+    values = []
+    present = []
+    for listing in listings:
+        value = nan
+        found = False
+        if isinstance(listing, Listing):
+            price = listing.price
+            if listing.market_value is not None:
+                value = listing.market_value
+                found = True
+        elif isinstance(listing, dict):
+            price = listing.get("price")
+            for key in VALUE_KEYS:
+                if key in listing:
+                    value = listing[key]
+                    found = True
+                    break
+        else:
+            price = getattr(listing, "price", None)
+            for key in VALUE_KEYS:
+                if hasattr(listing, key):
+                    value = getattr(listing, key)
+                    found = True
+                    break
+        prices.append(nan if price is None else price)
+        values.append(nan if value is None else value)
+        present.append(found)
+    return (
+        np.array(prices, dtype=np.float64),
+        np.array(values, dtype=np.float64),
+        np.array(present, dtype=bool),
+    )
+
+
+def _record_columns(listings, np):
+    """Fast path of :func:`listing_columns` for :class:`Listing` records."""
+    prices = np.array(list(map(attrgetter("price"), listings)), dtype=np.float64)
+    values = np.array(list(map(attrgetter("market_value"), listings)), dtype=np.float64)
+    return prices, values, ~np.isnan(values)
+
+
+def _dict_columns(listings, np):
+    """Fast path of :func:`listing_columns` for plain ``dict`` listings.
+
+    Columns are extracted with ``map`` over unbound ``dict`` methods so the
+    per-listing work stays in C, and market value keys that no listing
+    carries are skipped after a single short-circuiting membership scan.
+    """
+    count = len(listings)
+    prices = np.array(list(map(dict.get, listings, repeat("price", count))), dtype=np.float64)
+    values = np.full(count, np.nan)
+    present = np.zeros(count, dtype=bool)
+    for key in VALUE_KEYS:
+        if not any(map(dict.__contains__, listings, repeat(key, count))):
+            continue
+        has_key = np.array(
+            list(map(dict.__contains__, listings, repeat(key, count))), dtype=bool
+        )
+        has_key &= ~present
+        column = np.array(list(map(dict.get, listings, repeat(key, count))), dtype=np.float64)
+        values[has_key] = column[has_key]
+        present |= has_key
+    return prices, values, present
+
+
+# ----------------------------------------------------------------------
+# Resale value estimation
+# ----------------------------------------------------------------------
+_TITLE_TOKEN = re.compile(r"[a-z0-9]+")
+TITLE_STOPWORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"})
+
+
+def title_keywords(title) -> tuple[str, ...]:
+    """Return the sorted, de-duplicated keywords of a listing title."""
+    if not title:
+        return ()
+    tokens = set(_TITLE_TOKEN.findall(str(title).lower())) - TITLE_STOPWORDS
+    return tuple(sorted(tokens))
+
+
+def estimate_key(listing) -> tuple:
+    """Return the ``(category, keywords)`` key a listing is estimated by.
 
-import aiohttp
-from bs4 import BeautifulSoup
+    Titles differing only in case, punctuation, word order or stopwords
+    share a key, so the same item seen on several marketplaces is only
+    estimated once.
+    """
+    return _listing_field(listing, "category"), title_keywords(_listing_field(listing, "title"))
+
+
+class SoldPriceModel:
+    """Offline resale model built from historical sold prices.
+
+    For every keyword of the sold titles (and for every whole title) the
+    model keeps a quantile of the prices those items sold for. A listing is
+    valued by its whole title when that was sold often enough, otherwise
+    by its most specific keyword: the one with the fewest, but at least
+    ``min_samples``, sales. Categories, when given, are matched before the
+    global index.
+
+    Parameters
+    ----------
+    records : Iterable[tuple], optional
+        ``(title, sold_price)`` or ``(title, sold_price, category)`` tuples.
+    quantile : float, optional
+        Quantile of the sold prices used as the estimate, by default the
+        median. Lower values give more conservative estimates.
+    min_samples : int, optional
+        Sales required before a keyword or title is trusted, by default
+        ``3``.
+    """
+
+    def __init__(self, records=(), quantile=0.5, min_samples=3):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._prices = {}
+        self._index = {}
+        self.fit(records)
+
+    @classmethod
+    def from_csv(cls, path, **kwargs) -> "SoldPriceModel":
+        """Build a model from a CSV file with ``title``, ``price`` and an
+        optional ``category`` column."""
+        import csv
+
+        with open(path, newline="", encoding="utf-8") as handle:
+            records = [
+                (row["title"], float(row["price"]), row.get("category") or None)
+                for row in csv.DictReader(handle)
+                if row.get("price")
+            ]
+        return cls(records, **kwargs)
+
+    def fit(self, records) -> "SoldPriceModel":
+        """Add ``records`` to the sold price history and rebuild the index."""
+        for record in records:
+            title, price = record[0], record[1]
+            category = record[2] if len(record) > 2 else None
+            if price is None:
+                continue
+            keywords = title_keywords(title)
+            if not keywords:
+                continue
+            for scope in {None, category}:
+                self._prices.setdefault((scope, keywords), []).append(price)
+                for keyword in keywords:
+                    self._prices.setdefault((scope, keyword), []).append(price)
+        self._index = {
+            key: (len(prices), self._quantile(sorted(prices)))
+            for key, prices in self._prices.items()
+            if len(prices) >= self.min_samples
+        }
+        return self
+
+    def _quantile(self, ordered) -> float:
+        position = (len(ordered) - 1) * self.quantile
+        lower = math.floor(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def predict(self, key) -> float | None:
+        """Return the estimate for an :func:`estimate_key` or ``None``."""
+        category, keywords = key
+        index = self._index
+        for scope in (category, None) if category is not None else (None,):
+            entry = index.get((scope, keywords))
+            if entry is not None:
+                return entry[1]
+            matches = [index[(scope, keyword)] for keyword in keywords if (scope, keyword) in index]
+            if matches:
+                return min(matches)[1]
+        return None
+
+    def predict_batch(self, keys) -> list:
+        """Return :meth:`predict` for every key."""
+        return [self.predict(key) for key in keys]
+
+
+class ResaleEstimator:
+    """Cache resale estimates of a model by normalized title and category.
+
+    Estimates, including "unknown", are kept in an LRU cache with a TTL so
+    titles repeated across marketplaces and scans do not reach the model
+    again. Cache misses of a batch are predicted with a single
+    ``model.predict_batch`` call.
+
+    Parameters
+    ----------
+    model : object
+        Anything with a ``predict_batch(keys)`` method taking a list of
+        :func:`estimate_key` keys and returning an estimate or ``None``
+        for each, such as :class:`SoldPriceModel`.
+    max_entries : int, optional
+        Maximum number of cached estimates, by default ``10_000``.
+    ttl : float | None, optional
+        Seconds an estimate stays valid, by default one hour. ``None``
+        keeps estimates until they are evicted.
+    """
+
+    def __init__(self, model, max_entries=10_000, ttl=3600):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Forget every cached estimate, e.g. after refitting the model."""
+        self._entries.clear()
+
+    def estimate(self, listing) -> float | None:
+        """Return the estimated resale value of ``listing`` or ``None``."""
+        return self.estimate_batch([listing])[0]
+
+    def estimate_batch(self, listings) -> list:
+        """Return the estimated resale value of each listing, or ``None``."""
+        now = time.monotonic()
+        entries = self._entries
+        keys = [estimate_key(listing) for listing in listings]
+        results = {}
+        missing = []
+        for key in keys:
+            if key in results:
+                continue
+            entry = entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] <= self.ttl):
+                entries.move_to_end(key)
+                results[key] = entry[1]
+                self.hits += 1
+            else:
+                results[key] = None
+                missing.append(key)
+        if missing:
+            self.misses += len(missing)
+            for key, value in zip(missing, self.model.predict_batch(missing)):
+                results[key] = value
+                entries[key] = (now, value)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return [results[key] for key in keys]
+
+
+# ----------------------------------------------------------------------
+# Deal rules
+# ----------------------------------------------------------------------
+# Constraint fields of a DealRule, merged field by field across rules.
+RULE_FIELDS = ("min_price", "max_price", "threshold", "min_margin", "fee_rate", "fixed_fee")
+
+# Rank of a rule scope by whether it names a (marketplace, query); lower
+# ranks are more specific.
+_SCOPE_RANKS = {(True, True): 0, (False, True): 1, (True, False): 2, (False, False): 3}
+
+
+class DealRule(NamedTuple):
+    """Conditions under which a listing is reported as a deal.
+
+    A rule applies to listings from ``marketplace`` found by ``query``
+    (``None`` matches any) whose title contains one of the ``include``
+    keywords, or to all of them when ``include`` is empty. Keywords are
+    matched case insensitively as whole words and may span several words.
+    Constraints left at ``None`` are inherited from less specific rules;
+    see :class:`DealRules`.
+
+    Attributes
+    ----------
+    marketplace : str | None
+        Marketplace the rule is limited to.
+    query : str | None
+        Query the rule is limited to, as passed in ``query_groups`` (or
+        all search terms joined by spaces).
+    include : tuple[str, ...]
+        Keywords of which a title must contain at least one.
+    exclude : tuple[str, ...]
+        Keywords that make a listing never a deal.
+    min_price, max_price : float | None
+        Bounds on the asking price.
+    threshold : float | None
+        Fraction of the predicted value below which a listing is a deal,
+        replacing the engine's ``deal_threshold``.
+    min_margin : float | None
+        Minimum profit: the predicted value less fees, minus the price.
+    fee_rate : float | None
+        Fraction of the resale price paid in fees, by default ``0``.
+    fixed_fee : float | None
+        Fee paid per sale, by default ``0``.
+    """
+
+    marketplace: str | None = None
+    query: str | None = None
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    min_price: float | None = None
+    max_price: float | None = None
+    threshold: float | None = None
+    min_margin: float | None = None
+    fee_rate: float | None = None
+    fixed_fee: float | None = None
+
+    @classmethod
+    def from_dict(cls, data) -> "DealRule":
+        """Build a rule from a mapping, accepting lists or a single keyword."""
+        data = dict(data)
+        for name in ("include", "exclude"):
+            keywords = data.get(name, ())
+            data[name] = (keywords,) if isinstance(keywords, str) else tuple(keywords)
+        return cls(**data)
+
+
+class CompiledRule(NamedTuple):
+    """The merged constraints applying to a listing.
+
+    ``predicate(price, value, threshold)`` tells whether a listing asking
+    ``price`` and valued at ``value`` is a deal, ``threshold`` being the
+    engine's default. ``row`` holds the same constraints as numbers for
+    vectorized evaluation: ``(min_price, max_price, threshold, 1 -
+    fee_rate, fixed_fee, min_margin, allowed)`` with unset bounds infinite
+    and an unset threshold ``NaN``.
+    """
+
+    predicate: object
+    row: tuple
+
+
+def _compile_rule(min_price, max_price, threshold, min_margin, fee_rate, fixed_fee) -> CompiledRule:
+    """Build a predicate over the merged constraints and their numeric row."""
+    low = -math.inf if min_price is None else float(min_price)
+    high = math.inf if max_price is None else float(max_price)
+    own_threshold = None if threshold is None else float(threshold)
+    keep = 1.0 - float(fee_rate or 0.0)
+    fixed = float(fixed_fee or 0.0)
+    margin = -math.inf if min_margin is None else float(min_margin)
+
+    if min_margin is None:
+
+        def predicate(price, value, threshold):
+            if own_threshold is not None:
+                threshold = own_threshold
+            return low <= price <= high and price < value * threshold
+
+    else:
+
+        def predicate(price, value, threshold):
+            if own_threshold is not None:
+                threshold = own_threshold
+            return (
+                low <= price <= high
+                and price < value * threshold
+                and value * keep - fixed - price >= margin
+            )
+
+    row = (low, high, math.nan if own_threshold is None else own_threshold, keep, fixed, margin, 1.0)
+    return CompiledRule(predicate, row)
+
+
+_REJECT = CompiledRule(lambda price, value, threshold: False, (0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0))
+_DEFAULT_RULE_ROW = (-math.inf, math.inf, math.nan, 1.0, 0.0, -math.inf, 1.0)
+
+
+class _RuleLayer:
+    """The rules of one scope sharing one include keyword, merged."""
+
+    __slots__ = ("order", "values", "exclude", "compiled")
+
+    def __init__(self, order):
+        self.order = order
+        self.values = [None] * len(RULE_FIELDS)
+        self.exclude = set()
+        # Compiled rule for each (marketplace, query) the layer applied to
+        self.compiled = {}
+
+    def merge(self, rule: DealRule, exclude) -> None:
+        for i, name in enumerate(RULE_FIELDS):
+            if self.values[i] is None:
+                self.values[i] = getattr(rule, name)
+        self.exclude.update(exclude)
+
+
+class _RuleScope(NamedTuple):
+    """The rules without keywords applying to one (marketplace, query)."""
+
+    names: frozenset
+    values: tuple
+    exclude: frozenset
+    compiled: CompiledRule | None
+
+
+def _merge_values(layers) -> list:
+    values = [None] * len(RULE_FIELDS)
+    for layer in layers:
+        for i, value in enumerate(layer.values):
+            if values[i] is None:
+                values[i] = value
+    return values
+
+
+class DealRules:
+    """Per-marketplace and per-query deal rules compiled for fast evaluation.
+
+    A listing is judged by the most specific rule with ``include``
+    keywords that matches it. Rules naming both a marketplace and a query
+    are the most specific, then rules naming a query, then a marketplace,
+    then neither, and earlier rules come before later ones. Constraints
+    that rule leaves unset, or all of them when no keyword rule matches,
+    are taken from the rules without keywords in the same order. A listing
+    containing the ``exclude`` keywords of any rule that applies to it is
+    rejected, and listings no rule applies to are judged by
+    ``deal_threshold`` alone.
+
+    Every keyword is compiled into one token trie that is walked once per
+    title, rules are indexed by scope and keyword, and each rule is
+    compiled into a predicate the first time it is used for a marketplace
+    and query. Evaluating a listing therefore does not get slower as rules
+    are added.
+
+    Parameters
+    ----------
+    rules : Iterable[DealRule | Mapping], optional
+        The rules, in order of precedence within a scope.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = tuple(
+            rule if isinstance(rule, DealRule) else DealRule.from_dict(rule) for rule in rules
+        )
+        self._keyword_ids = {}
+        self._trie = {}
+        self._defaults = {}
+        self._keyed = {}
+        self._scopes = {}
+        # Keyword id -> ([(scope, layer), ...] in order of precedence,
+        # whether any of those layers excludes keywords)
+        self._by_keyword = {}
+        for index, rule in enumerate(self.rules):
+            scope = (rule.marketplace, rule.query)
+            rank = _SCOPE_RANKS[rule.marketplace is not None, rule.query is not None]
+            exclude = [self._add_keyword(keyword) for keyword in rule.exclude]
+            if not rule.include:
+                layer = self._defaults.get(scope)
+                if layer is None:
+                    layer = self._defaults[scope] = _RuleLayer((rank, index))
+                layer.merge(rule, exclude)
+                continue
+            # Only scopes with keyword rules are registered, so titles are
+            # not matched against the trie for the others
+            keyed = self._keyed.setdefault(scope, {})
+            for keyword in rule.include:
+                keyword_id = self._add_keyword(keyword)
+                layer = keyed.get(keyword_id)
+                if layer is None:
+                    layer = keyed[keyword_id] = _RuleLayer((rank, index, keyword_id))
+                    self._by_keyword.setdefault(keyword_id, []).append((scope, layer))
+                layer.merge(rule, exclude)
+        for keyword_id, layers in self._by_keyword.items():
+            layers.sort(key=lambda entry: entry[1].order)
+            self._by_keyword[keyword_id] = (layers, any(layer.exclude for _, layer in layers))
+
+    @classmethod
+    def from_json(cls, path) -> "DealRules":
+        """Load rules from a JSON file holding a list of rule objects."""
+        import json
+
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def _add_keyword(self, keyword: str) -> int:
+        tokens = tuple(_TITLE_TOKEN.findall(keyword.lower()))
+        if not tokens:
+            raise ValueError(f"Keyword without words: {keyword!r}")
+        keyword_id = self._keyword_ids.setdefault(tokens, len(self._keyword_ids))
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[None] = keyword_id
+        return keyword_id
+
+    def keywords(self, title) -> set:
+        """Return the ids of the rule keywords contained in ``title``."""
+        found = set()
+        if not title or not self._trie:
+            return found
+        tokens = _TITLE_TOKEN.findall(str(title).lower())
+        trie = self._trie
+        for start, token in enumerate(tokens):
+            node = trie.get(token)
+            position = start + 1
+            while node is not None:
+                keyword_id = node.get(None)
+                if keyword_id is not None:
+                    found.add(keyword_id)
+                if position == len(tokens):
+                    break
+                node = node.get(tokens[position])
+                position += 1
+        return found
+
+    def _scope(self, marketplace, query) -> _RuleScope:
+        scope = self._scopes.get((marketplace, query))
+        if scope is None:
+            names = {(marketplace, query), (None, query), (marketplace, None), (None, None)}
+            layers = sorted(
+                (self._defaults[name] for name in names if name in self._defaults),
+                key=attrgetter("order"),
+            )
+            values = _merge_values(layers)
+            scope = self._scopes[(marketplace, query)] = _RuleScope(
+                frozenset(name for name in names if name in self._keyed),
+                tuple(values),
+                frozenset().union(*(layer.exclude for layer in layers)),
+                _compile_rule(*values) if layers else None,
+            )
+        return scope
+
+    def resolve(self, listing, marketplace=None, query=None) -> CompiledRule | None:
+        """Return the constraints for ``listing``, or ``None`` if no rule applies.
+
+        ``marketplace`` and ``query`` default to the listing's own fields.
+        """
+        if marketplace is None:
+            marketplace = _listing_field(listing, "marketplace")
+        if query is None:
+            query = _listing_field(listing, "query")
+        scope = self._scope(marketplace, query)
+        if not scope.names and not scope.exclude:
+            return scope.compiled
+        found = self.keywords(_listing_field(listing, "title"))
+        if not found:
+            return scope.compiled
+        if not scope.exclude.isdisjoint(found):
+            return _REJECT
+        names = scope.names
+        best = None
+        by_keyword = self._by_keyword
+        for keyword_id in found:
+            if keyword_id not in by_keyword:
+                continue
+            layers, excludes = by_keyword[keyword_id]
+            for name, layer in layers:
+                if name not in names:
+                    continue
+                if excludes and not layer.exclude.isdisjoint(found):
+                    return _REJECT
+                if best is None or layer.order < best.order:
+                    best = layer
+                if not excludes:
+                    # Later layers for this keyword cannot take precedence
+                    break
+        if best is None:
+            return scope.compiled
+        compiled = best.compiled.get((marketplace, query))
+        if compiled is None:
+            values = [
+                value if value is not None else default
+                for value, default in zip(best.values, scope.values)
+            ]
+            compiled = best.compiled[(marketplace, query)] = _compile_rule(*values)
+        return compiled
+
+    def columns(self, listings, np, threshold, marketplace=None, query=None) -> tuple:
+        """Return the constraint columns of :attr:`CompiledRule.row` for ``listings``.
+
+        Listings no rule applies to get no constraints beyond ``threshold``,
+        which also replaces unset rule thresholds.
+        """
+        # Few distinct rules apply to a batch: gather their rows by index
+        rows = {None: 0}
+        indices = [
+            rows.setdefault(self.resolve(listing, marketplace, query), len(rows))
+            for listing in listings
+        ]
+        table = np.array(
+            [_DEFAULT_RULE_ROW if compiled is None else compiled.row for compiled in rows],
+            dtype=np.float64,
+        )
+        table[:, 2] = np.where(np.isnan(table[:, 2]), threshold, table[:, 2])
+        return tuple(table[np.array(indices, dtype=np.intp)].T)
+
+
+# ----------------------------------------------------------------------
+# Cross-marketplace price index
+# ----------------------------------------------------------------------
+_UINT64 = (1 << 64) - 1
+
+
+@functools.lru_cache(maxsize=65536)
+def _keyword_hash(keyword: str) -> int:
+    return int.from_bytes(hashlib.blake2b(keyword.encode(), digest_size=8).digest(), "little")
+
+
+class _IndexedListing(NamedTuple):
+    marketplace: str | None
+    price: float | None
+    keywords: frozenset
+    bands: tuple
+    seen_at: float
+    listing: object
+
+
+class CrossMarketIndex:
+    """Find the same item listed on other marketplaces.
+
+    Listings are indexed by a MinHash signature of their title keywords,
+    split into bands for locality sensitive hashing: two titles land in the
+    same bucket of at least one band with high probability when their
+    keyword sets are similar, so a lookup only compares against a handful
+    of candidates instead of every live listing. Candidates are then
+    confirmed by the exact Jaccard similarity of their keywords.
+
+    Parameters
+    ----------
+    similarity : float, optional
+        Jaccard similarity of title keywords at which two listings are
+        considered the same item, by default ``0.6``.
+    bands, rows : int, optional
+        LSH banding of the ``bands * rows`` MinHash signature. With the
+        defaults (10 bands of 3 rows) a match with a similarity of 0.6 is
+        found with a probability of about 91% and one of 0.8 with over
+        99.9%.
+    max_entries : int, optional
+        Maximum number of indexed listings; the least recently seen are
+        dropped first.
+    ttl : float | None, optional
+        Seconds after which a listing that was not seen again in a scan is
+        dropped, by default one hour.
+    max_candidates : int, optional
+        Upper bound on candidates compared for one lookup, which keeps
+        lookups of very common titles fast.
+    seed : int, optional
+        Seed of the MinHash permutations.
+    """
+
+    def __init__(
+        self,
+        similarity=0.6,
+        bands=10,
+        rows=3,
+        max_entries=500_000,
+        ttl=3600,
+        max_candidates=256,
+        seed=0,
+    ):
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = rows
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_candidates = max_candidates
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(bands * rows)]
+        # Odd multipliers combining the rows of a band into its bucket key
+        self._row_multipliers = [rng.getrandbits(64) | 1 for _ in range(rows)]
+        np = _import_numpy()
+        if np is not None:
+            self._mask_array = np.array(self._masks, dtype=np.uint64)
+            self._row_array = np.array(self._row_multipliers, dtype=np.uint64)
+            self._band_array = np.arange(bands, dtype=np.uint64)
+        self._entries = OrderedDict()
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, listing):
+        return SeenListingIndex.listing_key(listing) in self._entries
+
+    def _bands_batch(self, keyword_sets) -> list:
+        """Return the LSH bucket keys of each keyword set.
+
+        Signatures of large batches are computed with NumPy when it is
+        installed; both paths produce identical keys.
+        """
+        np = _import_numpy()
+        if np is None or len(keyword_sets) < 64:
+            return [self._bands(keywords) for keywords in keyword_sets]
+        lengths = np.fromiter(map(len, keyword_sets), dtype=np.intp, count=len(keyword_sets))
+        hashes = np.fromiter(
+            map(_keyword_hash, itertools.chain.from_iterable(keyword_sets)),
+            dtype=np.uint64,
+            count=int(lengths.sum()),
+        )
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures = np.minimum.reduceat(hashes[:, None] ^ self._mask_array, starts, axis=0)
+        signatures = signatures.reshape(len(keyword_sets), self.bands, self.rows)
+        # uint64 arithmetic wraps exactly like the masked Python version
+        keys = (signatures * self._row_array).sum(axis=2, dtype=np.uint64) ^ self._band_array
+        return [tuple(row) for row in keys.tolist()]
+
+    def _bands(self, keywords) -> tuple:
+        hashes = [_keyword_hash(keyword) for keyword in keywords]
+        signature = [min([value ^ mask for value in hashes]) for mask in self._masks]
+        rows = self.rows
+        multipliers = self._row_multipliers
+        return tuple(
+            (sum(map(int.__mul__, signature[band * rows : (band + 1) * rows], multipliers)) ^ band)
+            & _UINT64
+            for band in range(self.bands)
+        )
+
+    def _bucket(self, bucket_key) -> tuple | set:
+        # Most buckets hold a single listing, stored bare to save memory
+        bucket = self._buckets.get(bucket_key, ())
+        return (bucket,) if isinstance(bucket, str) else bucket
+
+    def _add(self, key, bands) -> None:
+        buckets = self._buckets
+        for bucket_key in bands:
+            bucket = buckets.get(bucket_key)
+            if bucket is None:
+                buckets[bucket_key] = key
+            elif isinstance(bucket, str):
+                if bucket != key:
+                    buckets[bucket_key] = {bucket, key}
+            else:
+                bucket.add(key)
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key)
+        buckets = self._buckets
+        for bucket_key in entry.bands or ():
+            bucket = buckets.get(bucket_key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, str):
+                if bucket == key:
+                    del buckets[bucket_key]
+                continue
+            bucket.discard(key)
+            if len(bucket) == 1:
+                buckets[bucket_key] = bucket.pop()
+
+    def update(self, listings, marketplace=None, now=None) -> None:
+        """Add or refresh ``listings``, found on ``marketplace`` unless tagged."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        entries = self._entries
+        pending = {}
+        for listing in listings:
+            keywords = frozenset(title_keywords(_listing_field(listing, "title")))
+            if not keywords:
+                continue
+            key = SeenListingIndex.listing_key(listing)
+            previous = entries.get(key)
+            if previous is not None and (previous.bands is None or previous.keywords != keywords):
+                # A changed title, or an earlier copy in this batch whose
+                # bands are not computed yet: index this copy afresh
+                self._remove(key)
+                previous = None
+            entry = _IndexedListing(
+                _listing_field(listing, "marketplace") or marketplace,
+                _listing_field(listing, "price"),
+                keywords,
+                previous.bands if previous is not None else None,
+                now,
+                listing,
+            )
+            if previous is not None:
+                del entries[key]
+            else:
+                pending[key] = entry
+            entries[key] = entry
+        if pending:
+            keys = list(pending)
+            bands = self._bands_batch([pending[key].keywords for key in keys])
+            for key, key_bands in zip(keys, bands):
+                if entries.get(key) is pending[key]:
+                    entries[key] = pending[key]._replace(bands=key_bands)
+                    self._add(key, key_bands)
+        while len(entries) > self.max_entries:
+            self._remove(next(iter(entries)))
+
+    def _expire(self, now: float) -> None:
+        if self.ttl is None:
+            return
+        cutoff = now - self.ttl
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.seen_at >= cutoff:
+                break
+            self._remove(key)
+
+    def matches(self, listing, marketplace=None) -> list:
+        """Return ``(similarity, listing)`` pairs for the same item elsewhere.
+
+        Only listings from other marketplaces than ``listing``'s are
+        returned, most similar first.
+        """
+        keywords = frozenset(title_keywords(_listing_field(listing, "title")))
+        if not keywords:
+            return []
+        marketplace = _listing_field(listing, "marketplace") or marketplace
+        key = SeenListingIndex.listing_key(listing)
+        entry = self._entries.get(key)
+        bands = entry.bands if entry is not None and entry.keywords == keywords else None
+        candidates = set()
+        for bucket_key in bands or self._bands(keywords):
+            candidates.update(self._bucket(bucket_key))
+            if len(candidates) >= self.max_candidates:
+                break
+        candidates.discard(key)
+        found = []
+        for other_key in candidates:
+            other = self._entries[other_key]
+            if marketplace is not None and other.marketplace == marketplace:
+                continue
+            similarity = len(keywords & other.keywords) / len(keywords | other.keywords)
+            if similarity >= self.similarity:
+                found.append((similarity, other.listing))
+        found.sort(key=lambda match: match[0], reverse=True)
+        return found
+
+    def reference_price(self, listing, marketplace=None) -> float | None:
+        """Return the median price of ``listing``'s matches on other marketplaces."""
+        prices = sorted(
+            price
+            for price in (
+                _listing_field(match, "price") for _, match in self.matches(listing, marketplace)
+            )
+            if price is not None
+        )
+        if not prices:
+            return None
+        middle = len(prices) // 2
+        if len(prices) % 2:
+            return float(prices[middle])
+        return (prices[middle - 1] + prices[middle]) / 2
+
+    def clear(self) -> None:
+        """Forget every listing."""
+        self._entries.clear()
+        self._buckets.clear()
+
+
+# ----------------------------------------------------------------------
+# Instrumentation
+# ----------------------------------------------------------------------
+# Histogram bucket upper bounds in seconds, matching the Prometheus client
+# defaults.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.count = 0
+        self.total = 0.0
+
+
+class MetricsCollector:
+    """Lightweight in-process collector for scan metrics.
+
+    The engine reports stage durations through :meth:`observe` (stages are
+    ``"fetch"``, ``"parse"``, ``"evaluate"`` and ``"alert"``) and event
+    counts through :meth:`increment`, both labelled with the marketplace
+    where there is one. Any object with those two methods can be passed to
+    the engine instead; hooks added with :meth:`add_hook` receive every
+    measurement as it is recorded.
+
+    Parameters
+    ----------
+    buckets : Sequence[float], optional
+        Upper bounds of the latency histogram buckets in seconds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._hooks = []
+
+    def add_hook(self, hook) -> None:
+        """Call ``hook(kind, name, marketplace, value)`` for every measurement.
+
+        ``kind`` is ``"observe"`` for durations and ``"increment"`` for
+        counters.
+        """
+        self._hooks.append(hook)
+
+    def observe(self, stage: str, marketplace: str | None, seconds: float) -> None:
+        """Record that ``stage`` took ``seconds`` for ``marketplace``."""
+        key = (stage, marketplace)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram(len(self.buckets) + 1)
+        histogram.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram.count += 1
+        histogram.total += seconds
+        for hook in self._hooks:
+            hook("observe", stage, marketplace, seconds)
+
+    def increment(self, name: str, marketplace: str | None, amount: float = 1) -> None:
+        """Add ``amount`` to the ``name`` counter for ``marketplace``."""
+        key = (name, marketplace)
+        self._counters[key] = self._counters.get(key, 0) + amount
+        for hook in self._hooks:
+            hook("increment", name, marketplace, amount)
+
+    def counter(self, name: str, marketplace: str | None = None) -> float:
+        """Return the current value of a counter."""
+        return self._counters.get((name, marketplace), 0)
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        self.started = time.time()
+        self._histograms.clear()
+        self._counters.clear()
+
+    def snapshot(self) -> dict:
+        """Return all metrics as a JSON serializable dict."""
+        uptime = max(time.time() - self.started, 1e-9)
+        stages = {}
+        for (stage, market), histogram in sorted(self._histograms.items(), key=_label_order):
+            cumulative = list(itertools.accumulate(histogram.counts))
+            stages.setdefault(stage, {})[market or ""] = {
+                "count": histogram.count,
+                "sum": histogram.total,
+                "mean": histogram.total / histogram.count,
+                "buckets": {
+                    **{str(bound): cumulative[i] for i, bound in enumerate(self.buckets)},
+                    "+Inf": histogram.count,
+                },
+            }
+        counters = {}
+        for (name, market), value in sorted(self._counters.items(), key=_label_order):
+            counters.setdefault(name, {})[market or ""] = value
+        rates = {
+            f"{name}_per_second": sum(counters.get(name, {}).values()) / uptime
+            for name in ("listings", "deals")
+        }
+        return {"uptime_seconds": uptime, "stages": stages, "counters": counters, "rates": rates}
+
+    def to_prometheus(self, prefix: str = "arbitrage") -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        name = f"{prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Time spent per scan stage and marketplace.")
+        lines.append(f"# TYPE {name} histogram")
+        for (stage, market), histogram in sorted(self._histograms.items(), key=_label_order):
+            labels = f'stage="{stage}",marketplace="{market or ""}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        counter_names = sorted({counter for counter, _ in self._counters})
+        for counter in counter_names:
+            metric = f"{prefix}_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (other, market), value in sorted(self._counters.items(), key=_label_order):
+                if other == counter:
+                    lines.append(f'{metric}{{marketplace="{market or ""}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _label_order(item):
+    (name, market), _ = item
+    return name, market or ""
+
+
+def metrics_app(
+    collector: MetricsCollector, churn: AdaptivePolling | None = None
+) -> "aiohttp.web.Application":
+    """Return an aiohttp application exposing ``collector``.
+
+    ``/metrics`` serves the Prometheus text format and ``/metrics.json`` a
+    JSON snapshot. With ``churn`` its statistics are served at
+    ``/churn.json``.
+    """
+    from aiohttp import web
+
+    async def prometheus(request):
+        return web.Response(text=collector.to_prometheus(), content_type="text/plain")
+
+    async def snapshot(request):
+        return web.json_response(collector.snapshot())
+
+    app = web.Application()
+    app.router.add_get("/metrics", prometheus)
+    app.router.add_get("/metrics.json", snapshot)
+    if churn is not None:
+
+        async def churn_snapshot(request):
+            return web.json_response(churn.snapshot())
+
+        app.router.add_get("/churn.json", churn_snapshot)
+    return app
+
+
+# ----------------------------------------------------------------------
+# Alert delivery
+# ----------------------------------------------------------------------
+ALERT_OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class AlertPipeline:
+    """Bounded queue delivering alerts from background worker tasks.
+
+    Producers :meth:`put` alerts without waiting on delivery. Workers take
+    whatever is queued, wait up to ``batch_window`` seconds for a burst to
+    fill a batch of ``batch_size`` and hand the batch to the sink given to
+    :meth:`start`, so slow notification sinks never hold up deal
+    detection.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Alerts that may wait for delivery before ``overflow`` applies.
+    batch_size : int, optional
+        Largest number of alerts delivered in one batch.
+    batch_window : float, optional
+        Seconds a worker waits after the first alert of a batch for more
+        to arrive. ``0`` delivers whatever is already queued.
+    workers : int, optional
+        Number of concurrent delivery tasks. With more than one, batches
+        may be delivered out of order.
+    overflow : str, optional
+        What :meth:`put` does when the queue is full: ``"drop_oldest"``
+        discards the longest waiting alert, ``"drop_newest"`` discards the
+        new one and ``"block"`` waits for room, slowing the producer down
+        to the pace of the sinks.
+    drain_timeout : float | None, optional
+        Default number of seconds :meth:`stop` spends delivering alerts
+        that are still queued.
+    """
+
+    def __init__(
+        self,
+        maxsize=1000,
+        batch_size=50,
+        batch_window=0.5,
+        workers=1,
+        overflow="drop_oldest",
+        drain_timeout=10.0,
+    ):
+        if overflow not in ALERT_OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        self.maxsize = maxsize
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.workers = max(1, workers)
+        self.overflow = overflow
+        self.drain_timeout = drain_timeout
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0
+        self._queue = None
+        self._tasks = []
+        self._sink = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self, sink) -> None:
+        """Start the workers, delivering each batch with ``await sink(batch)``."""
+        if self.running:
+            return
+        self._sink = sink
+        self._queue = asyncio.Queue(self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, alert) -> bool:
+        """Queue ``alert``, returning ``False`` if an alert was dropped."""
+        queue = self._queue
+        if not queue.full():
+            queue.put_nowait(alert)
+            return True
+        if self.overflow == "block":
+            await queue.put(alert)
+            return True
+        self.dropped += 1
+        if self.overflow == "drop_oldest":
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(alert)
+        return False
+
+    async def stop(self, timeout=...) -> None:
+        """Deliver queued alerts for up to ``timeout`` seconds and stop.
+
+        ``timeout`` defaults to ``drain_timeout``; ``None`` waits for every
+        queued alert. Alerts still queued when it expires are counted as
+        dropped.
+        """
+        if not self.running:
+            return
+        if timeout is ...:
+            timeout = self.drain_timeout
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += self._queue.qsize()
+        finally:
+            tasks, self._tasks = self._tasks, []
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._queue = None
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._sink(batch)
+                self.delivered += len(batch)
+            except Exception:
+                # A failing sink must not stop delivery of later alerts
+                self.failures += len(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
 
 
 class ArbitrageEngine:
-    """High level pseudocode for the arbitrage detection engine."""
+    """Scan marketplaces for the search terms and alert on deals.
+
+    Each marketplace (and query group) is polled on its own schedule over
+    a shared HTTP session. Parsed listings are filtered against the seen
+    index, scored with :attr:`rules` and the resale estimator, and deals
+    are delivered through :attr:`alert_pipeline` to ``alert_callback``.
+    See :meth:`run` for the polling loop and :meth:`close` for releasing
+    its resources.
+    """
 
     def __init__(
         self,
@@ -22,6 +2905,35 @@ class ArbitrageEngine:
         alert_callback=None,
         marketplaces=None,
         deal_threshold=0.5,
+        connection_limit=100,
+        connection_limit_per_host=10,
+        dns_cache_ttl=300,
+        keepalive_timeout=30,
+        parse_executor="thread",
+        parse_workers=None,
+        parser_backend="bs4",
+        query_groups=None,
+        max_concurrency=10,
+        rate_limits=None,
+        response_cache=True,
+        seen_index=True,
+        retry_policy=None,
+        request_timeout=5.0,
+        adaptive_timeout=True,
+        schedules=None,
+        metrics=True,
+        metrics_port=None,
+        base_urls=None,
+        alert_pipeline=True,
+        alert_batch_callback=None,
+        resale_estimator=None,
+        price_index=False,
+        history=None,
+        max_page_bytes=None,
+        max_listings=None,
+        adaptive_polling=False,
+        rules=None,
+        categories=None,
     ):
         """Create a new engine instance.
 
@@ -32,10 +2944,131 @@ class ArbitrageEngine:
         refresh_interval : int, optional
             How often to poll the marketplaces, by default ``60``.
         alert_callback : callable | None, optional
-            Optional callback invoked when a deal is found.
+            Optional callback invoked with ``(listing, predicted_price)``
+            when a deal is found. It may be a coroutine function.
         marketplaces : Iterable[str] | None, optional
             Restrict queries to these marketplaces. If ``None`` all
             known marketplaces will be queried.
+        deal_threshold : float, optional
+            Fraction of the predicted value below which a listing is
+            reported as a deal, by default ``0.5``.
+        connection_limit : int, optional
+            Total number of simultaneous connections kept by the pooled
+            HTTP session, by default ``100``.
+        connection_limit_per_host : int, optional
+            Simultaneous connections allowed to a single marketplace host,
+            by default ``10``.
+        dns_cache_ttl : int | None, optional
+            Seconds to cache resolved host names, by default ``300``.
+        keepalive_timeout : float, optional
+            Seconds an idle connection is kept open for reuse, by default
+            ``30``.
+        parse_executor : {"thread", "process"} | Executor | None, optional
+            Where HTML parsing runs. ``"thread"`` (the default) and
+            ``"process"`` create a pool owned by the engine, an existing
+            :class:`concurrent.futures.Executor` is used as is, and ``None``
+            parses inline on the event loop.
+        parse_workers : int | None, optional
+            Worker count for an engine owned parse pool. Defaults to the
+            number of CPUs.
+        parser_backend : {"bs4", "lxml"}, optional
+            HTML parser implementation. ``"bs4"`` (the default) uses
+            BeautifulSoup with ``html.parser``; ``"lxml"`` uses precompiled
+            XPath queries and requires the optional ``lxml`` package.
+        query_groups : Iterable[str | Iterable[str]] | None, optional
+            Run each entry as its own query on every marketplace instead of
+            joining all ``search_terms`` into one. A string is a single
+            term query; an iterable of strings is combined into one query.
+        max_concurrency : int, optional
+            Maximum number of marketplace queries in flight at once across
+            all query groups, by default ``10``.
+        rate_limits : Mapping[str, float] | None, optional
+            Maximum requests per second for each named marketplace. The
+            rate is lowered automatically while a marketplace throttles
+            requests and recovers as they succeed again. Marketplaces
+            without an entry are only paused when they send
+            ``Retry-After``.
+        response_cache : ResponseCache | bool, optional
+            Cache used to make conditional requests and to reuse parsed
+            listings for unchanged pages. ``True`` (the default) creates a
+            :class:`ResponseCache` with default limits and ``False``
+            disables caching.
+        seen_index : SeenListingIndex | bool, optional
+            Index of listings already evaluated by :meth:`run`, so only new
+            or repriced listings are evaluated and alerted on. ``True``
+            (the default) creates an in-memory :class:`SeenListingIndex`
+            and ``False`` evaluates every listing on every scan.
+        retry_policy : RetryPolicy | None, optional
+            How throttled, failed or timed out requests are retried. The
+            default retries twice with jittered exponential backoff.
+        request_timeout : float, optional
+            Timeout for a single request in seconds, by default ``5``. With
+            ``adaptive_timeout`` this is only the starting value.
+        adaptive_timeout : bool, optional
+            Adjust each marketplace's request timeout to its observed
+            latency, by default ``True``.
+        schedules : Mapping[str | tuple[str, str], MarketSchedule] | None, optional
+            Polling interval, priority and deadline per marketplace name,
+            or per ``(marketplace, query)`` pair when ``query_groups`` is
+            used. Anything not listed is polled every ``refresh_interval``.
+        metrics : MetricsCollector | bool, optional
+            Collector receiving per-stage timings and event counts. ``True``
+            (the default) creates a :class:`MetricsCollector`; ``False``
+            turns instrumentation off.
+        metrics_port : int | None, optional
+            Serve the collector over HTTP on this port while :meth:`run`
+            is active: ``/metrics`` in Prometheus text format and
+            ``/metrics.json`` as a JSON snapshot.
+        base_urls : Mapping[str, str] | None, optional
+            Override the site root requested for named marketplaces, e.g.
+            to route through a mirror or a local test server.
+        alert_pipeline : AlertPipeline | bool, optional
+            Queue through which :meth:`run` delivers alerts from background
+            workers, so slow callbacks do not delay scanning. ``True`` (the
+            default) creates an :class:`AlertPipeline` with default limits
+            and ``False`` calls the callback inline.
+        alert_batch_callback : callable | None, optional
+            Called with a list of ``(listing, predicted_price)`` pairs for
+            each batch of alerts coalesced by ``alert_pipeline``, instead
+            of calling ``alert_callback`` once per deal. It may be a
+            coroutine function.
+        resale_estimator : ResaleEstimator | None, optional
+            Estimates the resale value of listings that do not carry a
+            market value, e.g. from a :class:`SoldPriceModel`. Listings it
+            cannot value, or every listing when ``None``, are valued at
+            150% of their price.
+        price_index : CrossMarketIndex | bool, optional
+            Index of the listings seen on every marketplace. When set, a
+            listing priced below ``deal_threshold`` of the same item on
+            the other marketplaces is a deal too. ``True`` creates a
+            :class:`CrossMarketIndex` with default settings; the default
+            ``False`` disables cross-marketplace matching.
+        history : ListingHistory | None, optional
+            Store receiving every scanned listing with its marketplace,
+            query, price and the time it was seen.
+        max_page_bytes : int | None, optional
+            Stop downloading a results page after this many bytes and
+            extract the listings from what arrived.
+        max_listings : int | None, optional
+            Extract at most this many listings from each results page.
+            With the ``"lxml"`` backend the page is parsed while it
+            downloads and the download stops once enough listings arrived.
+        adaptive_polling : AdaptivePolling | bool, optional
+            Adjust the polling interval of every marketplace query while
+            :meth:`run` is active to the rate at which it turns up new or
+            repriced listings, starting from the interval given by
+            ``schedules`` or ``refresh_interval``. ``True`` creates an
+            :class:`AdaptivePolling` with default bounds; the default
+            ``False`` keeps intervals fixed. Requires ``seen_index``.
+        rules : DealRules | Iterable[DealRule] | None, optional
+            Per-marketplace and per-query deal rules (price bounds,
+            thresholds, margins after fees and keywords) applied on top of
+            ``deal_threshold``.
+        categories : Mapping[str | None, str] | None, optional
+            Category of the listings each query finds, keyed by its label
+            as in ``query_groups``. The ``None`` entry applies to every
+            other query, including the single combined one. Listings are
+            valued by ``resale_estimator`` within their category first.
         """
 
         # Store search settings supplied by the user
@@ -44,244 +3077,739 @@ class ArbitrageEngine:
         self.alert_callback = alert_callback  # function to run on a detected deal
         self.deal_threshold = deal_threshold  # percentage of value to trigger deal alert
 
-        default_markets = [
-            "facebook",
-            "ebay",
-            "craigslist",
-            "aliexpress",
-            "mercari",
-        ]
-        self.marketplaces = list(marketplaces) if marketplaces else default_markets
+        self.marketplaces = list(marketplaces) if marketplaces else list(MARKETPLACE_SPECS)
+
+        # Connection pool settings shared by every scan of this engine
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+        if parse_executor not in (None, "thread", "process") and not isinstance(
+            parse_executor, Executor
+        ):
+            raise ValueError(f"Unknown parse executor: {parse_executor!r}")
+        self.parse_executor = parse_executor
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self._parse_pool = None
+
+        if parser_backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {parser_backend!r}")
+        self.parser_backend = parser_backend
+        self._parsers = PARSER_BACKENDS[parser_backend]
+        self.max_page_bytes = max_page_bytes
+        self.max_listings = max_listings
+
+        # Batch scanning: one query per group, bounded by a shared semaphore
+        if query_groups is not None:
+            query_groups = [
+                (group,) if isinstance(group, str) else tuple(group)
+                for group in query_groups
+            ]
+        self.query_groups = query_groups
+        self.max_concurrency = max_concurrency
+        self._request_semaphore = None
+        rate_limits = rate_limits or {}
+        self._rate_limiters = {
+            market: RateLimiter(rate_limits.get(market))
+            for market in set(self.marketplaces) | set(rate_limits)
+        }
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.request_timeout = request_timeout
+        self.adaptive_timeout = adaptive_timeout
+        self._latency = {}
+        self.schedules = dict(schedules or {})
+        self.scheduled_jobs = []
+
+        if metrics is True:
+            metrics = MetricsCollector()
+        elif metrics is False:
+            metrics = None
+        self.metrics = metrics
+        self.metrics_port = metrics_port
+        self.base_urls = {**MARKETPLACE_BASE_URLS, **(base_urls or {})}
+
+        if response_cache is True:
+            response_cache = ResponseCache()
+        elif response_cache is False:
+            response_cache = None
+        self.response_cache = response_cache
+
+        if seen_index is True:
+            seen_index = SeenListingIndex()
+        elif seen_index is False:
+            seen_index = None
+        self.seen_index = seen_index
+
+        if alert_pipeline is True:
+            alert_pipeline = AlertPipeline()
+        elif alert_pipeline is False:
+            alert_pipeline = None
+        self.alert_pipeline = alert_pipeline
+        self.alert_batch_callback = alert_batch_callback
+        self.resale_estimator = resale_estimator
+
+        if price_index is True:
+            price_index = CrossMarketIndex()
+        elif price_index is False:
+            price_index = None
+        self.price_index = price_index
+        self.history = history
+
+        if adaptive_polling is True:
+            adaptive_polling = AdaptivePolling()
+        elif adaptive_polling is False:
+            adaptive_polling = None
+        if adaptive_polling is not None and seen_index is None:
+            raise ValueError("adaptive_polling needs a seen_index to measure churn")
+        self.adaptive_polling = adaptive_polling
+
+        if rules is not None and not isinstance(rules, DealRules):
+            rules = DealRules(rules)
+        self.rules = rules
+        self.categories = dict(categories) if categories else {}
+
+    # ------------------------------------------------------------------
+    # HTTP session management
+    # ------------------------------------------------------------------
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Return a new session backed by a pooled, keep-alive connector."""
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=self.dns_cache_ttl is not None,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    async def open_session(self) -> aiohttp.ClientSession:
+        """Return the engine's pooled session, creating it if needed.
+
+        The session is reused by every call to :meth:`fetch_listings`
+        until :meth:`close` is awaited, so DNS lookups and TCP/TLS
+        handshakes are only paid once per host.
+        """
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    @asynccontextmanager
+    async def _session_scope(self, session: aiohttp.ClientSession | None = None):
+        """Yield ``session``, the pooled session or a temporary one."""
+        if session is None and self._session is not None and not self._session.closed:
+            session = self._session
+        if session is not None:
+            yield session
+            return
+        async with self._create_session() as temp_session:
+            yield temp_session
+
+    async def close(self) -> None:
+        """Close the pooled session and any engine owned parse pool.
+
+        Listings buffered by :attr:`history` are written out as well.
+        """
+        self._request_semaphore = None
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+        pool, self._parse_pool = self._parse_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.history is not None:
+            # Last, so a failed write does not keep the rest open
+            await asyncio.to_thread(self.history.flush)
+
+    def _get_parse_executor(self) -> Executor | None:
+        """Return the executor used for parsing, creating it lazily."""
+        if self.parse_executor is None or isinstance(self.parse_executor, Executor):
+            return self.parse_executor
+        if self._parse_pool is None:
+            if self.parse_executor == "process":
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            else:
+                self._parse_pool = ThreadPoolExecutor(
+                    max_workers=self.parse_workers,
+                    thread_name_prefix="arbitrage-parse",
+                )
+        return self._parse_pool
+
+    async def __aenter__(self):
+        await self.open_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
     # ------------------------------------------------------------------
     # Marketplace query helpers
     # ------------------------------------------------------------------
-    def _build_query(self):
-        """Return a URL encoded query string from the search terms."""
-        return "+".join(quote_plus(term) for term in self.search_terms)
+    def _build_query(self, terms=None):
+        """Return a URL encoded query string from ``terms``.
+
+        ``terms`` defaults to the engine's ``search_terms``.
+        """
+        if terms is None:
+            terms = self.search_terms
+        return "+".join(quote_plus(term) for term in terms)
 
-    async def _async_get(self, url: str, session: aiohttp.ClientSession) -> str:
+    async def _async_get(
+        self, url: str, session: aiohttp.ClientSession, timeout: float = 5, market=None, stream=None
+    ) -> str | None:
         """Fetch the response body for ``url`` using ``session``.
 
+        When a response cache is configured the request is made conditional
+        on the validators of the cached page. With ``max_page_bytes`` or a
+        ``stream`` the body is read in chunks and may be cut short.
+
         Parameters
         ----------
         url : str
             The URL to request.
         session : :class:`aiohttp.ClientSession`
             An active HTTP session used to perform the request.
+        timeout : float, optional
+            Total timeout for the request in seconds, by default ``5``.
+        market : str | None, optional
+            Marketplace the request belongs to, used to label metrics.
+        stream : object | None, optional
+            Incremental parser from :meth:`Extractor.stream` fed each chunk
+            of the body as it arrives.
 
         Returns
         -------
-        str
-            The text body of the response.
+        str | None
+            The text body of the response, or ``None`` if the server
+            answered ``304 Not Modified``.
+
+        Raises
+        ------
+        aiohttp.ClientResponseError
+            If the response status is one the retry policy retries.
         """
-        async with session.get(url, timeout=5) as resp:
-            return await resp.text()
+        import aiohttp
 
-    async def query_facebook(self, session: aiohttp.ClientSession):
-        query = self._build_query()
-        url = f"https://www.facebook.com/marketplace/search?q={query}"
-        try:
-            html = await self._async_get(url, session)
-        except aiohttp.ClientError:
-            return []
-        return self.parse_facebook(html, base_url="https://www.facebook.com")
+        cache = self.response_cache
+        headers = cache.conditional_headers(url) if cache is not None else None
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with session.get(url, timeout=client_timeout, headers=headers or None) as resp:
+            if resp.status == 304 and headers:
+                return None
+            if resp.status in self.retry_policy.retry_statuses:
+                raise aiohttp.ClientResponseError(
+                    resp.request_info,
+                    resp.history,
+                    status=resp.status,
+                    message=resp.reason or "",
+                    headers=resp.headers,
+                )
+            if cache is not None:
+                cache.record_validators(
+                    url, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+                )
+            if self.max_page_bytes is not None or stream is not None:
+                return await self._read_partial(resp, market, stream)
+            body = await resp.read()
+            if self.metrics is not None:
+                self.metrics.increment("bytes_fetched", market, len(body))
+            return body.decode(page_encoding(resp.charset, body), errors="strict")
+
+    async def _read_partial(self, resp: aiohttp.ClientResponse, market=None, stream=None) -> str:
+        """Read ``resp`` in chunks, stopping early when the page is long enough.
+
+        Reading stops after ``max_page_bytes`` or once ``stream`` reports
+        that it has enough listings. The connection is then closed instead
+        of draining the rest of the body.
+        """
+        limit = self.max_page_bytes
+        decoder = None
+        if stream is not None:
+            stream.reset()
+        parts = []
+        received = 0
+        complete = True
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            if limit is not None and received + len(chunk) > limit:
+                chunk = chunk[: limit - received]
+                complete = False
+            received += len(chunk)
+            if decoder is None:
+                encoding = page_encoding(resp.charset, chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if stream is not None and stream.feed(text):
+                complete = False
+            if not complete:
+                break
+        if complete and decoder is not None:
+            text = decoder.decode(b"", final=True)
+            parts.append(text)
+            if stream is not None:
+                stream.feed(text)
+        else:
+            resp.close()
+        if self.metrics is not None:
+            self.metrics.increment("bytes_fetched", market, received)
+            if not complete:
+                self.metrics.increment("truncated_pages", market)
+        return "".join(parts)
+
+    async def _request(self, url: str, session: aiohttp.ClientSession, market=None, stream=None):
+        """Fetch ``url`` under ``market``'s rate limit, retrying failures.
+
+        Throttled (``429``/``503`` and friends), failed and timed out
+        requests are retried according to :attr:`retry_policy`, waiting
+        for ``Retry-After`` when the marketplace sends it and jittered
+        exponential backoff otherwise. Every failure also slows the
+        marketplace's rate limiter down (pausing it for ``Retry-After``);
+        successes let it recover.
+        """
+        import aiohttp
 
-    async def query_ebay(self, session: aiohttp.ClientSession):
-        query = self._build_query()
-        url = f"https://www.ebay.com/sch/i.html?_nkw={query}"
+        policy = self.retry_policy
+        limiter = self._rate_limiters.get(market)
+        tracker = self._latency.get(market)
+        if tracker is None:
+            tracker = self._latency[market] = LatencyTracker(initial=self.request_timeout)
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            attempt += 1
+            if limiter is not None:
+                await limiter.wait()
+            timeout = tracker.timeout if self.adaptive_timeout else self.request_timeout
+            started = loop.time()
+            try:
+                if stream is None:
+                    html = await self._async_get(url, session, timeout=timeout, market=market)
+                else:
+                    html = await self._async_get(
+                        url, session, timeout=timeout, market=market, stream=stream
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if self.metrics is not None:
+                    self.metrics.increment("request_errors", market)
+                retry_after = None
+                if isinstance(exc, aiohttp.ClientResponseError):
+                    if exc.status not in policy.retry_statuses:
+                        raise
+                    retry_after = parse_retry_after((exc.headers or {}).get("Retry-After"))
+                elif isinstance(exc, asyncio.TimeoutError):
+                    tracker.observe(timeout)
+                if attempt >= policy.max_attempts:
+                    if limiter is not None:
+                        limiter.penalize(retry_after)
+                    raise
+                if limiter is not None:
+                    limiter.penalize(retry_after)
+                if self.metrics is not None:
+                    self.metrics.increment("retries", market)
+                await asyncio.sleep(policy.backoff(attempt, retry_after))
+                continue
+            elapsed = loop.time() - started
+            tracker.observe(elapsed)
+            if self.metrics is not None:
+                self.metrics.observe("fetch", market, elapsed)
+            if limiter is not None:
+                limiter.reward()
+            return html
+
+    async def _fetch_and_parse(self, url, session, parser, *args, market=None) -> list[Listing]:
+        """Fetch ``url`` and return ``parser(html, *args)``.
+
+        Pages the response cache reports as unchanged, either through a
+        ``304`` response or an identical body hash, reuse the listings
+        parsed last time instead of being parsed again. When the engine
+        limits page size or listing count, extractors that parse
+        incrementally do so while the page downloads.
+        """
+        import aiohttp
+
+        cache = self.response_cache
+        stream = None
+        if isinstance(parser, Extractor) and (
+            self.max_page_bytes is not None or self.max_listings is not None
+        ):
+            stream = parser.stream(*args)
         try:
-            html = await self._async_get(url, session)
-        except aiohttp.ClientError:
+            html = await self._request(url, session, market, stream)
+            if html is None:
+                cached = cache.lookup(url)
+                if cached is not None:
+                    if self.metrics is not None:
+                        self.metrics.increment("cache_hits", market)
+                    return cached
+                # The entry expired while the request was in flight
+                html = await self._request(url, session, market, stream)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if self.metrics is not None:
+                self.metrics.increment("request_failures", market)
             return []
-        soup = BeautifulSoup(html, "html.parser")
+        body_hash = None
+        if cache is not None:
+            body_hash = cache.hash_body(html)
+            cached = cache.lookup(url, body_hash)
+            if cached is not None:
+                if self.metrics is not None:
+                    self.metrics.increment("cache_hits", market)
+                return cached
+        if stream is None:
+            listings = await self._parse(parser, html, *args, market=market)
+        else:
+            # Most of the page was parsed as it arrived; finish inline
+            started = time.perf_counter()
+            listings = stream.close()
+            if self.metrics is not None:
+                self.metrics.observe("parse", market, time.perf_counter() - started)
+        if cache is not None:
+            cache.store(url, body_hash, listings)
+        return listings
+
+    async def _parse(self, parser, *args, market=None) -> list[Listing]:
+        """Run ``parser(*args)`` on the configured parse executor.
+
+        When the engine was created with ``parse_executor=None`` the parser
+        runs inline on the event loop instead.
+        """
+        started = time.perf_counter()
+        executor = self._get_parse_executor()
+        if executor is None:
+            listings = parser(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            listings = await loop.run_in_executor(executor, parser, *args)
+        if self.metrics is not None:
+            self.metrics.observe("parse", market, time.perf_counter() - started)
+        return listings
+
+    async def query_marketplace(self, session: aiohttp.ClientSession, market: str, terms=None):
+        """Search ``market`` as described by its registered :class:`MarketplaceSpec`.
+
+        Relative listing links are resolved against the marketplace's
+        entry in ``base_urls``.
+        """
+        base_url = self.base_urls[market]
+        path = MARKETPLACE_SPECS[market].search_path.format(query=self._build_query(terms))
+        return await self._fetch_and_parse(
+            f"{base_url}{path}",
+            session,
+            self._parsers[market],
+            base_url,
+            self.max_listings,
+            market=market,
+        )
+
+    async def query_facebook(self, session: aiohttp.ClientSession, terms=None):
+        return await self.query_marketplace(session, "facebook", terms)
+
+    async def query_ebay(self, session: aiohttp.ClientSession, terms=None):
+        return await self.query_marketplace(session, "ebay", terms)
+
+    async def query_craigslist(self, session: aiohttp.ClientSession, terms=None):
+        return await self.query_marketplace(session, "craigslist", terms)
+
+    async def query_aliexpress(self, session: aiohttp.ClientSession, terms=None):
+        return await self.query_marketplace(session, "aliexpress", terms)
+
+    async def query_mercari(self, session: aiohttp.ClientSession, terms=None):
+        return await self.query_marketplace(session, "mercari", terms)
+
+    # ------------------------------------------------------------------
+    # HTML parsers
+    # ------------------------------------------------------------------
+    def parse_facebook(self, html: str, base_url: str) -> list[Listing]:
+        """Extract listings from a Facebook Marketplace search page."""
+        return self._parsers["facebook"](html, base_url)
+
+    def parse_ebay(self, html: str) -> list[Listing]:
+        """Extract listings from an eBay search results page."""
+        return self._parsers["ebay"](html)
+
+    def parse_craigslist(self, html: str) -> list[Listing]:
+        """Extract listings from a Craigslist search results page."""
+        return self._parsers["craigslist"](html)
+
+    def parse_aliexpress(self, html: str) -> list[Listing]:
+        """Extract listings from an AliExpress wholesale search page."""
+        return self._parsers["aliexpress"](html)
+
+    def parse_mercari(self, html: str) -> list[Listing]:
+        """Extract listings from a Mercari search results page."""
+        return self._parsers["mercari"](html)
+
+    async def fetch_listings(self, session: aiohttp.ClientSession | None = None):
+        """Fetch listings from each marketplace concurrently.
+
+        Parameters
+        ----------
+        session : :class:`aiohttp.ClientSession` | None, optional
+            Session used for the requests. Defaults to the engine's pooled
+            session when one is open, otherwise a temporary session is
+            created and closed once the scan completes.
+
+        Returns
+        -------
+        list[Listing]
+            Listings from every marketplace. When ``query_groups`` is set
+            each listing also carries the ``query`` and ``marketplace`` it
+            came from.
+        """
+        async with self._session_scope(session) as session:
+            results = await asyncio.gather(
+                *(self._run_job(*job) for job in self._scan_jobs(session))
+            )
         listings = []
-        for item in soup.select("li.s-item"):
-            title_el = item.select_one("h3.s-item__title")
-            price_el = item.select_one("span.s-item__price")
-            link_el = item.select_one("a.s-item__link")
-            if not (title_el and link_el):
-                continue
-            title = title_el.get_text(strip=True)
-            price = None
-            if price_el:
-                match = re.search(r"\$([0-9,.]+)", price_el.get_text())
-                if match:
-                    try:
-                        price = float(match.group(1).replace(",", ""))
-                    except ValueError:
-                        price = None
-            listings.append({"title": title, "price": price, "url": link_el["href"]})
+        for result in results:
+            if result is not None:
+                listings.extend(result.listings)
         return listings
 
-    async def query_craigslist(self, session: aiohttp.ClientSession):
-        query = self._build_query()
-        url = f"https://craigslist.org/search/sss?query={query}"
-        try:
-            html = await self._async_get(url, session)
-        except aiohttp.ClientError:
-            return []
-        soup = BeautifulSoup(html, "html.parser")
-        listings = []
-        for item in soup.select("li.result-row"):
-            title_el = item.select_one("a.result-title")
-            price_el = item.select_one("span.result-price")
-            if not title_el:
-                continue
-            title = title_el.get_text(strip=True)
-            price = None
-            if price_el:
-                match = re.search(r"\$([0-9,.]+)", price_el.get_text())
-                if match:
-                    try:
-                        price = float(match.group(1).replace(",", ""))
-                    except ValueError:
-                        price = None
-            url_item = title_el["href"]
-            listings.append({"title": title, "price": price, "url": url_item})
-        return listings
+    async def stream_listings(self, session: aiohttp.ClientSession | None = None):
+        """Yield each marketplace's listings as soon as they arrive.
+
+        This is the streaming counterpart of :meth:`fetch_listings`: rather
+        than waiting for the slowest marketplace, a list of listings is
+        yielded per marketplace (and per query group) in completion order.
+        """
+        async for result in self.stream_query_results(session):
+            yield result.listings
+
+    async def stream_query_results(self, session: aiohttp.ClientSession | None = None):
+        """Yield a :class:`QueryResult` for each query as soon as it completes.
+
+        Every query group is run against every marketplace under the
+        engine's concurrency limit and per-marketplace rate limits. Failed
+        queries are skipped.
+        """
+        async with self._session_scope(session) as session:
+            tasks = [
+                asyncio.ensure_future(self._run_job(*job))
+                for job in self._scan_jobs(session)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    if result is not None:
+                        yield result
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _scan_jobs(self, session: aiohttp.ClientSession):
+        """Yield ``(query, marketplace, coroutine)`` for one scan."""
+        for label, market, terms in self._job_specs():
+            yield label, market, self._start_query(session, market, terms)
+
+    def _job_specs(self):
+        """Yield ``(query, marketplace, terms)`` for every marketplace query."""
+        groups = self.query_groups if self.query_groups is not None else [None]
+        for terms in groups:
+            label = " ".join(terms) if terms is not None else None
+            for market in self.marketplaces:
+                if market in MARKETPLACE_SPECS or hasattr(self, f"query_{market}"):
+                    yield label, market, terms
+
+    def _start_query(self, session, market, terms):
+        """Return the query coroutine for ``market`` and ``terms``.
 
-    async def query_aliexpress(self, session: aiohttp.ClientSession):
-        query = self._build_query()
-        url = f"https://www.aliexpress.com/wholesale?SearchText={query}"
-        try:
-            html = await self._async_get(url, session)
-        except aiohttp.ClientError:
-            return []
-        soup = BeautifulSoup(html, "html.parser")
-        listings = []
-        for item in soup.select("a[href][title][target]"):
-            title = item.get("title")
-            href = item.get("href")
-            price_el = item.find_next("span", class_=lambda c: c and "price" in c)
-            price = None
-            if price_el:
-                match = re.search(r"\$([0-9,.]+)", price_el.get_text())
-                if match:
-                    try:
-                        price = float(match.group(1).replace(",", ""))
-                    except ValueError:
-                        price = None
-            if title and href:
-                listings.append({"title": title, "price": price, "url": href})
-        return listings
+        A ``query_<market>`` method takes precedence over the registered
+        spec, so subclasses can still customise a single marketplace.
+        """
+        query_func = getattr(self, f"query_{market}", None)
+        if query_func is None:
+            return self.query_marketplace(session, market, terms)
+        if terms is None:
+            return query_func(session)
+        return query_func(session, terms=terms)
 
-    async def query_mercari(self, session: aiohttp.ClientSession):
-        query = self._build_query()
-        url = f"https://www.mercari.com/search/?keyword={query}"
+    def _get_request_semaphore(self) -> PrioritySemaphore:
+        """Return the semaphore bounding concurrent marketplace queries."""
+        if self._request_semaphore is None:
+            self._request_semaphore = PrioritySemaphore(self.max_concurrency)
+        return self._request_semaphore
+
+    async def _run_job(self, query, market, coro, priority=0) -> QueryResult | None:
+        """Await one marketplace query, returning ``None`` if it fails."""
+        semaphore = self._get_request_semaphore()
         try:
-            html = await self._async_get(url, session)
-        except aiohttp.ClientError:
-            return []
-        soup = BeautifulSoup(html, "html.parser")
-        listings = []
-        for item in soup.select("li[data-testid='ItemCell']"):
-            title_el = item.select_one("p[data-testid='ItemCell__name']")
-            price_el = item.select_one("p[data-testid='ItemCell__price']")
-            link_el = item.select_one("a")
-            if not (title_el and link_el):
-                continue
-            title = title_el.get_text(strip=True)
-            price = None
-            if price_el:
-                match = re.search(r"\$([0-9,.]+)", price_el.get_text())
-                if match:
-                    try:
-                        price = float(match.group(1).replace(",", ""))
-                    except ValueError:
-                        price = None
-            href = link_el.get("href")
-            if href and not href.startswith("http"):
-                href = f"https://www.mercari.com{href}"
-            listings.append({"title": title, "price": price, "url": href})
-        return listings
+            await semaphore.acquire(priority)
+            try:
+                result = await coro
+            finally:
+                semaphore.release()
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.increment("query_failures", market)
+            return None
+        finally:
+            # Closes the coroutine if the job was cancelled before it started
+            coro.close()
+        listings = [
+            listing if isinstance(listing, Listing) else Listing.from_dict(listing)
+            for listing in result
+        ]
+        if query is not None:
+            for listing in listings:
+                listing.query = query
+                listing.marketplace = market
+        category = self.categories.get(query, self.categories.get(None))
+        if category is not None:
+            for listing in listings:
+                if listing.category is None:
+                    listing.category = category
+        return QueryResult(query, market, listings)
 
-    # ------------------------------------------------------------------
-    # HTML parsers
-    # ------------------------------------------------------------------
-    def parse_facebook(self, html: str, base_url: str) -> list[dict]:
-        """Extract listings from a Facebook Marketplace search page."""
-        soup = BeautifulSoup(html, "html.parser")
-        listings = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if "/marketplace/item/" not in href:
-                continue
-            title = a.get("title")
-            if not title:
-                for text in a.stripped_strings:
-                    if "$" not in text:
-                        title = text
-                        break
-            price = None
-            price_text = a.find(string=lambda t: t and "$" in t)
-            if price_text:
-                match = re.search(r"\$([0-9,.]+)", price_text)
-                if match:
-                    try:
-                        price = float(match.group(1).replace(",", ""))
-                    except ValueError:
-                        price = None
-            if not href.startswith("http"):
-                href = f"{base_url}{href}"
-            listings.append({"title": title, "price": price, "url": href})
-        return listings
+    def evaluate_deals(self, listings, marketplace=None, query=None):
+        """Evaluate listings to find underpriced items.
 
-    async def fetch_listings(self):
-        """Fetch listings from each marketplace concurrently."""
-        tasks = []
-        async with aiohttp.ClientSession() as session:
-            for market in self.marketplaces:
-                query_func = getattr(self, f"query_{market}", None)
-                if query_func:
-                    tasks.append(asyncio.create_task(query_func(session)))
-
-            listings = []
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for result in results:
-                    if isinstance(result, Exception):
-                        continue
-                    for listing in result:
-                        normalized = {
-                            "title": listing.get("title"),
-                            "price": listing.get("price"),
-                            "url": listing.get("url"),
-                        }
-                        listings.append(normalized)
-            return listings
-
-    def evaluate_deals(self, listings):
-        """Evaluate listings to find underpriced items."""
+        ``marketplace`` and ``query`` select the :attr:`rules` that apply
+        and default to each listing's own fields.
+        """
         # Iterate over listings and estimate each one's fair market value.
         # If a listing's asking price is lower than the configured threshold
         # of the predicted value, yield it as a potential deal.
+        rules = self.rules
         for listing in listings:
             predicted_price = self.predict_resale_value(listing)
-            price = listing.get("price") if isinstance(listing, dict) else getattr(listing, "price", None)
+            price = listing.get("price") if isinstance(listing, (dict, Listing)) else getattr(listing, "price", None)
 
             if price is None or predicted_price is None:
                 continue
 
-            if price < predicted_price * self.deal_threshold:
+            rule = None if rules is None else rules.resolve(listing, marketplace, query)
+            if rule is None:
+                if price < predicted_price * self.deal_threshold:
+                    yield listing, predicted_price
+            elif rule.predicate(price, predicted_price, self.deal_threshold):
                 yield listing, predicted_price
 
+    def evaluate_deals_batch(self, listings, marketplace=None, query=None) -> list:
+        """Return the same ``(listing, predicted_price)`` pairs as :meth:`evaluate_deals`.
+
+        Predicted prices are returned as floats. Large batches are
+        converted to columnar NumPy arrays (price, market value, predicted
+        value and a validity mask) and compared against ``deal_threshold``,
+        or the constraint columns of :attr:`rules`, in one vectorized
+        operation. Small batches, or environments without
+        NumPy, use the per-listing generator. Either way listings without a
+        market value are valued by :attr:`resale_estimator` in a single
+        batch.
+        """
+        listings = listings if isinstance(listings, list) else list(listings)
+        estimator = self.resale_estimator
+        default_predict = type(self).predict_resale_value is ArbitrageEngine.predict_resale_value
+        default_evaluate = type(self).evaluate_deals is ArbitrageEngine.evaluate_deals
+        if (
+            len(listings) < VECTORIZE_MIN_LISTINGS
+            or not default_evaluate
+            or (np := _import_numpy()) is None
+        ):
+            if estimator is not None and default_predict:
+                # Warm the cache so the generator's lookups are all hits
+                estimator.estimate_batch(listings)
+            if not default_evaluate:
+                return list(self.evaluate_deals(listings))
+            return list(self.evaluate_deals(listings, marketplace, query))
+
+        prices, values, has_value = listing_columns(listings, np)
+        if default_predict:
+            fallback = prices * 1.5
+            if estimator is not None:
+                missing = np.flatnonzero(~has_value)
+                estimates = np.array(
+                    estimator.estimate_batch([listings[i] for i in missing.tolist()]),
+                    dtype=np.float64,
+                )
+                known = ~np.isnan(estimates)
+                fallback[missing[known]] = estimates[known]
+            predicted = np.where(has_value, values, fallback)
+        else:
+            predicted = np.array(
+                [self.predict_resale_value(listing) for listing in listings],
+                dtype=np.float64,
+            )
+        valid = ~(np.isnan(prices) | np.isnan(predicted))
+        with np.errstate(invalid="ignore"):
+            if self.rules is None:
+                is_deal = valid & (prices < predicted * self.deal_threshold)
+            else:
+                low, high, threshold, keep, fixed, margin, allowed = self.rules.columns(
+                    listings, np, self.deal_threshold, marketplace, query
+                )
+                is_deal = (
+                    valid
+                    & (allowed > 0)
+                    & (prices >= low)
+                    & (prices <= high)
+                    & (prices < predicted * threshold)
+                    & (predicted * keep - fixed - prices >= margin)
+                )
+        hits = np.flatnonzero(is_deal)
+        return list(zip(map(listings.__getitem__, hits.tolist()), predicted[hits].tolist()))
+
+    def evaluate_cross_market(self, listings, marketplace=None, exclude=(), query=None) -> list:
+        """Return ``(listing, reference_price)`` pairs priced below other sites.
+
+        A listing is a deal when its price is below ``deal_threshold`` of
+        the median price of the same item on the other marketplaces in
+        :attr:`price_index`, or meets the :attr:`rules` that apply to it
+        when valued at that price. Listings in ``exclude`` (``(listing,
+        price)`` pairs already found) are skipped.
+        """
+        index = self.price_index
+        if index is None:
+            return []
+        rules = self.rules
+        skip = {id(listing) for listing, _ in exclude}
+        found = []
+        for listing in listings:
+            price = _listing_field(listing, "price")
+            if price is None or id(listing) in skip:
+                continue
+            reference = index.reference_price(listing, marketplace)
+            if reference is None:
+                continue
+            rule = None if rules is None else rules.resolve(listing, marketplace, query)
+            if rule is None:
+                if price < reference * self.deal_threshold:
+                    found.append((listing, reference))
+            elif rule.predicate(price, reference, self.deal_threshold):
+                found.append((listing, reference))
+        return found
+
     def predict_resale_value(self, listing):
-        """Return a naive estimate of the listing's resale value."""
-        # This stub demonstrates where one could integrate an API call or a
-        # machine learning model.  If the listing already contains a market
-        # value field, prefer that.  Otherwise fall back to a simple heuristic.
-        if isinstance(listing, dict):
-            for key in ("market_value", "predicted_price", "estimated_price"):
+        """Return an estimate of the listing's resale value.
+
+        A market value supplied with the listing wins, then the estimate of
+        :attr:`resale_estimator`, then a simple heuristic.
+        """
+        if isinstance(listing, Listing):
+            if listing.market_value is not None:
+                return listing.market_value
+            price = listing.price
+        elif isinstance(listing, dict):
+            for key in VALUE_KEYS:
                 if key in listing:
                     return listing[key]
             price = listing.get("price")
         else:
-            for key in ("market_value", "predicted_price", "estimated_price"):
+            for key in VALUE_KEYS:
                 if hasattr(listing, key):
                     return getattr(listing, key)
             price = getattr(listing, "price", None)
 
+        if self.resale_estimator is not None:
+            estimate = self.resale_estimator.estimate(listing)
+            if estimate is not None:
+                return estimate
+
         if price is None:
             return None
 
@@ -289,34 +3817,835 @@ class ArbitrageEngine:
         return price * 1.5
 
     def alert(self, listing, predicted_price):
-        """Notify the user about a potential arbitrage opportunity."""
+        """Notify the user about a potential arbitrage opportunity.
+
+        Returns whatever ``alert_callback`` returns, which is awaitable for
+        coroutine callbacks.
+        """
         # Basic placeholder: print the deal. In a real application, this could
         # send an email, push notification, etc.
         if self.alert_callback:
-            self.alert_callback(listing, predicted_price)
+            return self.alert_callback(listing, predicted_price)
+        print(f"Deal found: {listing} (est. value ${predicted_price})")
+
+    def _alert_batch(self, batch) -> list:
+        """Call the alert callbacks for ``batch``, returning any awaitables."""
+        if self.alert_batch_callback is not None:
+            results = [self.alert_batch_callback(batch)]
+        else:
+            results = [self.alert(listing, price) for listing, price in batch]
+        return [result for result in results if inspect.isawaitable(result)]
+
+    async def _deliver_alerts(self, batch) -> None:
+        """Sink of :attr:`alert_pipeline`: deliver one batch of alerts.
+
+        Plain callbacks run in a worker thread so blocking I/O in them does
+        not stall the event loop.
+        """
+        started = time.perf_counter()
+        callback = self.alert_batch_callback or self.alert_callback
+        try:
+            if inspect.iscoroutinefunction(callback):
+                pending = self._alert_batch(batch)
+            else:
+                pending = await asyncio.to_thread(self._alert_batch, batch)
+            for result in pending:
+                await result
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.increment("alert_failures", None, len(batch))
+            raise
+        if self.metrics is not None:
+            self.metrics.observe("alert", None, time.perf_counter() - started)
+            self.metrics.increment("alerts", None, len(batch))
+
+    async def start_metrics_server(self, host="127.0.0.1", port=9464):
+        """Serve :attr:`metrics` over HTTP and return the aiohttp runner.
+
+        Call ``await runner.cleanup()`` to stop the server.
+        """
+        from aiohttp import web
+
+        runner = web.AppRunner(metrics_app(self.metrics, self.adaptive_polling))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    async def _process_listings(self, listings, market=None, query=None) -> int:
+        """Evaluate new listings and alert on deals, returning the deal count.
+
+        While :attr:`alert_pipeline` is running deals are only queued for
+        delivery; otherwise the callback is called, and awaited, inline.
+        """
+        started = time.perf_counter()
+        scanned = len(listings)
+        label = query if query is not None else " ".join(self.search_terms)
+        if self.history is not None:
+            failures = self.history.failures
+            self.history.record(listings, market, label)
+            if self.metrics is not None and self.history.failures > failures:
+                self.metrics.increment("history_failures", market, self.history.failures - failures)
+        if self.price_index is not None:
+            self.price_index.update(listings, market)
+        repriced = 0
+        if self.seen_index is not None:
+            repriced = self.seen_index.repriced
+            listings = self.seen_index.filter_new(listings)
+            repriced = self.seen_index.repriced - repriced
+            if self.adaptive_polling is not None:
+                self.adaptive_polling.observe(
+                    market, query, scanned, len(listings) - repriced, repriced
+                )
+        found = self.evaluate_deals_batch(listings, market, label)
+        if self.price_index is not None:
+            cross_market = self.evaluate_cross_market(listings, market, exclude=found, query=label)
+            found.extend(cross_market)
+            if self.metrics is not None:
+                self.metrics.increment("cross_market_deals", market, len(cross_market))
+        if self.metrics is not None:
+            self.metrics.observe("evaluate", market, time.perf_counter() - started)
+            self.metrics.increment("scans", market)
+            self.metrics.increment("listings", market, scanned)
+            self.metrics.increment("new_listings", market, len(listings))
+            self.metrics.increment("repriced_listings", market, repriced)
+            self.metrics.increment("deals", market, len(found))
+        pipeline = self.alert_pipeline
+        if pipeline is not None and pipeline.running:
+            for deal in found:
+                if not await pipeline.put(deal) and self.metrics is not None:
+                    self.metrics.increment("alerts_dropped", market)
         else:
-            print(f"Deal found: {listing} (est. value ${predicted_price})")
+            for listing, price in found:
+                result = self.alert(listing, price)
+                if inspect.isawaitable(result):
+                    await result
+        return len(found)
+
+    async def scan(self) -> int:
+        """Scan every marketplace once, alerting on deals as results arrive.
+
+        Each marketplace's listings are evaluated as soon as that
+        marketplace responds, so one slow site does not hold back alerts
+        from the others. Listings already evaluated in an earlier scan are
+        skipped unless their price changed.
+
+        Returns
+        -------
+        int
+            The number of deals alerted on.
+        """
+        deals = 0
+        async for result in self.stream_query_results():
+            deals += await self._process_listings(
+                result.listings, result.marketplace, result.query
+            )
+        return deals
+
+    def build_schedule(self) -> list[ScheduledJob]:
+        """Return a :class:`ScheduledJob` for every marketplace query."""
+        jobs = []
+        for label, market, terms in self._job_specs():
+            schedule = self.schedules.get((market, label)) or self.schedules.get(market)
+            schedule = schedule or MarketSchedule()
+            interval = schedule.interval
+            if interval is None:
+                interval = self.refresh_interval
+            jobs.append(
+                ScheduledJob(market, label, terms, interval, schedule.priority, schedule.deadline)
+            )
+        return jobs
+
+    async def _run_scheduled(self, job: ScheduledJob) -> None:
+        """Scan one scheduled job and handle its listings."""
+        session = await self.open_session()
+        coro = self._start_query(session, job.market, job.terms)
+        run = self._run_job(job.query, job.market, coro, job.priority)
+        try:
+            result = await asyncio.wait_for(run, job.deadline)
+        except asyncio.TimeoutError:
+            result = None
+        if result is None:
+            job.failures += 1
+            return
+        await self._process_listings(result.listings, result.marketplace, result.query)
+
+    async def _run_periodic(self, job: ScheduledJob, iterations=None) -> None:
+        """Start ``job`` every ``job.interval`` seconds.
+
+        Start times are anchored to the first run so they do not drift, a
+        tick that comes round while the previous run is still in flight is
+        skipped, and ticks missed entirely are not made up. With a
+        non-positive interval runs follow each other back to back. When
+        ``job.interval`` is changed while the job runs, the following start
+        is re-anchored to the last one.
+        """
+        loop = asyncio.get_running_loop()
+        start = started = loop.time()
+        interval = job.interval
+        tick = 0
+        in_flight = None
+        try:
+            while True:
+                if in_flight is not None and not in_flight.done():
+                    job.skipped += 1
+                else:
+                    if in_flight is not None:
+                        # Re-raise anything the previous run did not handle
+                        in_flight.result()
+                    in_flight = asyncio.create_task(self._run_scheduled(job))
+                    started = loop.time()
+                    job.runs += 1
+                    if iterations is not None and job.runs >= iterations:
+                        break
+                if job.interval <= 0:
+                    await asyncio.wait({in_flight})
+                    continue
+                if job.interval != interval:
+                    start, interval, tick = started, job.interval, 0
+                now = loop.time()
+                tick = max(tick + 1, math.floor((now - start) / job.interval) + 1)
+                await asyncio.sleep(start + tick * job.interval - now)
+            await in_flight
+        finally:
+            if in_flight is not None and not in_flight.done():
+                in_flight.cancel()
+
+    async def _rebalance_periodically(self) -> None:
+        """Rebalance the scheduled jobs every ``min_interval`` seconds.
+
+        Intervals are reallocated on a timer rather than after every scan,
+        so the cost does not grow with how often queries complete.
+        """
+        polling = self.adaptive_polling
+        while True:
+            await asyncio.sleep(polling.min_interval)
+            polling.rebalance(self.scheduled_jobs)
 
     async def run(self, iterations=None):
         """Continuously monitor marketplaces for deals.
 
-        This coroutine repeatedly polls the configured marketplaces,
-        evaluates any discovered listings and then waits for the
-        configured refresh interval before the next scan.
+        Every marketplace (and query group) is polled by its own periodic
+        task on the interval given by ``schedules``, falling back to
+        ``refresh_interval``, so fast moving marketplaces can be polled
+        more often than slow ones. With :attr:`adaptive_polling` the
+        intervals are rebalanced every ``min_interval`` seconds to follow
+        each query's observed churn. Listings are evaluated and alerted on
+        as each scan completes and deals are handed to
+        :attr:`alert_pipeline`, whose workers deliver them in the
+        background; queued alerts are flushed before returning. A single
+        pooled HTTP session is kept open for the lifetime of the call and
+        closed when it returns or is cancelled.
+
+        Parameters
+        ----------
+        iterations : int | None, optional
+            Stop once every marketplace query has been started this many
+            times. Runs forever when ``None``.
         """
-        runs = 0
-        while True:
-            listings = await self.fetch_listings()
-            for listing, price in self.evaluate_deals(listings):
-                self.alert(listing, price)
-            runs += 1
-            if iterations is not None and runs >= iterations:
-                break
-            await asyncio.sleep(self.refresh_interval)
+        await self.open_session()
+        metrics_runner = None
+        if self.metrics_port is not None and self.metrics is not None:
+            metrics_runner = await self.start_metrics_server(port=self.metrics_port)
+        if self.alert_pipeline is not None:
+            self.alert_pipeline.start(self._deliver_alerts)
+        self.scheduled_jobs = self.build_schedule()
+        rebalancer = None
+        if self.adaptive_polling is not None:
+            self.adaptive_polling.rebalance(self.scheduled_jobs)
+            rebalancer = asyncio.create_task(self._rebalance_periodically())
+        tasks = [
+            asyncio.create_task(self._run_periodic(job, iterations))
+            for job in self.scheduled_jobs
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if rebalancer is not None:
+                tasks.append(rebalancer)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.alert_pipeline is not None:
+                await self.alert_pipeline.stop()
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+            await self.close()
+
+
+# ----------------------------------------------------------------------
+# Multiprocess coordinator
+# ----------------------------------------------------------------------
+class Shard(NamedTuple):
+    """Search terms and marketplaces scanned by one worker process."""
+
+    search_terms: tuple
+    marketplaces: tuple
+
+
+def _split(items, count) -> list:
+    """Split ``items`` into ``count`` contiguous chunks of near equal size."""
+    size, extra = divmod(len(items), count)
+    chunks = []
+    start = 0
+    for index in range(count):
+        end = start + size + (index < extra)
+        chunks.append(tuple(items[start:end]))
+        start = end
+    return chunks
+
+
+def shard_work(search_terms, marketplaces, workers, separate_queries=False) -> list[Shard]:
+    """Partition search terms x marketplaces into at most ``workers`` shards.
+
+    Search terms queried separately are split first, so every worker sees
+    all marketplaces for its terms and cross-marketplace matching keeps
+    working within a shard. Marketplaces are split further when there are
+    more workers than term groups. Combined queries are never split.
+    """
+    terms = list(search_terms)
+    markets = list(marketplaces)
+    workers = max(1, workers)
+    if separate_queries and terms:
+        term_groups = _split(terms, min(workers, len(terms)))
+    else:
+        term_groups = [tuple(terms)]
+    market_chunks = max(1, min(workers // len(term_groups), len(markets)))
+    return [
+        Shard(term_group, market_group)
+        for term_group in term_groups
+        for market_group in _split(markets, market_chunks)
+    ]
+
+
+def run_shard_worker(shard_id, shard, options, events, iterations=None) -> None:
+    """Entry point of a worker process started by :class:`ShardCoordinator`.
+
+    Runs an :class:`ArbitrageEngine` over ``shard`` and reports every deal
+    as ``("deal", shard_id, listing, price)`` and every metric as
+    ``("metric", kind, name, marketplace, value)`` on the ``events`` queue.
+    ``options`` are engine keyword arguments plus ``separate_queries``,
+    ``sold_prices``, ``history_db`` and ``rules_file``, which are turned
+    into the objects that cannot be sent to a process.
+    """
+    options = dict(options)
+    if options.pop("separate_queries", False):
+        options["query_groups"] = list(shard.search_terms)
+    sold_prices = options.pop("sold_prices", None)
+    if sold_prices:
+        options["resale_estimator"] = ResaleEstimator(SoldPriceModel.from_csv(sold_prices))
+    history_db = options.pop("history_db", None)
+    if history_db:
+        options["history"] = ListingHistory(history_db)
+    rules_file = options.pop("rules_file", None)
+    if rules_file:
+        options["rules"] = DealRules.from_json(rules_file)
+
+    engine = ArbitrageEngine(
+        list(shard.search_terms),
+        marketplaces=shard.marketplaces,
+        alert_callback=lambda listing, price: events.put(("deal", shard_id, listing, price)),
+        **options,
+    )
+    if engine.metrics is not None:
+        engine.metrics.add_hook(
+            lambda kind, name, market, value: events.put(("metric", kind, name, market, value))
+        )
+    try:
+        asyncio.run(engine.run(iterations=iterations))
+    finally:
+        if engine.history is not None:
+            engine.history.close()
+
+
+class ShardCoordinator:
+    """Scan shards in worker processes and merge their alert streams.
+
+    Each :class:`Shard` runs its own engine and event loop in a separate
+    process, so fetching, parsing and evaluation use one core per worker.
+    Deals reported by the workers are deduplicated globally before
+    :meth:`alert` is called, worker metrics are merged into one collector,
+    and a worker that dies with an error is restarted.
+
+    Parameters
+    ----------
+    shards : Sequence[Shard]
+        Work of each worker process, e.g. from :func:`shard_work`.
+    options : Mapping | None, optional
+        Options passed to :func:`run_shard_worker`; they must be picklable.
+    iterations : int | None, optional
+        Passed to each worker's :meth:`ArbitrageEngine.run`.
+    alert_callback : callable | None, optional
+        Called with ``(listing, predicted_price)`` for each unique deal. It
+        may be a coroutine function. Deals are printed when ``None``.
+    seen_index : SeenListingIndex | bool, optional
+        Index deduplicating deals across workers and restarts. ``True``
+        (the default) creates an in-memory :class:`SeenListingIndex`.
+    metrics : MetricsCollector | bool, optional
+        Collector receiving the merged worker metrics.
+    metrics_port : int | None, optional
+        Serve the merged metrics over HTTP on this port while running.
+    max_restarts : int, optional
+        Times each shard's worker is restarted after crashing before the
+        shard is given up, by default ``5``.
+    restart_delay : float, optional
+        Seconds to wait before restarting a crashed worker.
+    worker : callable, optional
+        Process target, called like :func:`run_shard_worker`.
+    start_method : str, optional
+        :mod:`multiprocessing` start method, by default ``"spawn"`` so
+        workers never inherit the coordinator's event loop or threads.
+    """
+
+    def __init__(
+        self,
+        shards,
+        options=None,
+        iterations=None,
+        alert_callback=None,
+        seen_index=True,
+        metrics=True,
+        metrics_port=None,
+        max_restarts=5,
+        restart_delay=1.0,
+        worker=run_shard_worker,
+        start_method="spawn",
+    ):
+        self.shards = list(shards)
+        self.options = dict(options or {})
+        self.iterations = iterations
+        self.alert_callback = alert_callback
+        if seen_index is True:
+            seen_index = SeenListingIndex()
+        elif seen_index is False:
+            seen_index = None
+        self.seen_index = seen_index
+        if metrics is True:
+            metrics = MetricsCollector()
+        elif metrics is False:
+            metrics = None
+        self.metrics = metrics
+        self.metrics_port = metrics_port
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.worker = worker
+        self.start_method = start_method
+        self.restarts = [0] * len(self.shards)
+        self.failed = []
+        self.deals = 0
+        self.duplicates = 0
+        self._events = None
+
+    def alert(self, listing, predicted_price):
+        """Report a unique deal; see :meth:`ArbitrageEngine.alert`."""
+        if self.alert_callback:
+            return self.alert_callback(listing, predicted_price)
+        print(f"Deal found: {listing} (est. value ${predicted_price})")
+
+    def _start(self, context, shard_id):
+        process = context.Process(
+            target=self.worker,
+            args=(shard_id, self.shards[shard_id], self.options, self._events, self.iterations),
+            name=f"arbitrage-shard-{shard_id}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _receive(self, timeout) -> list:
+        """Return queued events, waiting up to ``timeout`` for the first."""
+        from queue import Empty
+
+        events = []
+        try:
+            events.append(self._events.get(timeout=timeout))
+            while True:
+                events.append(self._events.get_nowait())
+        except Empty:
+            pass
+        return events
+
+    async def _handle(self, events) -> None:
+        for event in events:
+            if event[0] == "deal":
+                _, _, listing, price = event
+                if self.seen_index is not None and not self.seen_index.filter_new([listing]):
+                    self.duplicates += 1
+                    continue
+                self.deals += 1
+                result = self.alert(listing, price)
+                if inspect.isawaitable(result):
+                    await result
+            elif event[0] == "metric" and self.metrics is not None:
+                _, kind, name, market, value = event
+                if kind == "observe":
+                    self.metrics.observe(name, market, value)
+                else:
+                    self.metrics.increment(name, market, value)
+
+    async def run(self) -> None:
+        """Run every shard until its worker finishes or is given up."""
+        import multiprocessing
+
+        context = multiprocessing.get_context(self.start_method)
+        self._events = context.Queue()
+        metrics_runner = None
+        if self.metrics_port is not None and self.metrics is not None:
+            from aiohttp import web
+
+            metrics_runner = web.AppRunner(metrics_app(self.metrics))
+            await metrics_runner.setup()
+            await web.TCPSite(metrics_runner, "127.0.0.1", self.metrics_port).start()
+        loop = asyncio.get_running_loop()
+        running = {shard_id: self._start(context, shard_id) for shard_id in range(len(self.shards))}
+        restart_at = {}
+        try:
+            while running or restart_at:
+                await self._handle(await asyncio.to_thread(self._receive, 0.1))
+                for shard_id, process in list(running.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    del running[shard_id]
+                    if process.exitcode == 0:
+                        continue
+                    if self.restarts[shard_id] >= self.max_restarts:
+                        self.failed.append(shard_id)
+                        continue
+                    self.restarts[shard_id] += 1
+                    if self.metrics is not None:
+                        self.metrics.increment("worker_restarts", None)
+                    restart_at[shard_id] = loop.time() + self.restart_delay
+                for shard_id, when in list(restart_at.items()):
+                    if loop.time() >= when:
+                        del restart_at[shard_id]
+                        running[shard_id] = self._start(context, shard_id)
+            # Events sent just before the last workers exited
+            await self._handle(await asyncio.to_thread(self._receive, 0.1))
+        finally:
+            for process in running.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+            self._events.close()
+            self._events = None
+
+
+# ----------------------------------------------------------------------
+# Warm start
+#
+# Short-lived CLI runs, e.g. from cron, can hand their arguments to a
+# long-lived worker process that already has the dependencies imported and
+# every extractor compiled, instead of paying for both on each invocation.
+# The worker listens on a per-user Unix socket, runs one command line at a
+# time and exits after being idle for a while.
+# ----------------------------------------------------------------------
+def default_warm_socket() -> str:
+    """Return the per-user Unix socket path of the warm start worker.
+
+    The socket lives in a directory only the current user can access,
+    created on first use.
+
+    Raises
+    ------
+    PermissionError
+        If the directory exists but is not private to the current user.
+    """
+    import stat
+    import tempfile
+
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        directory = os.path.join(runtime, "arbitrage-engine")
+    else:
+        directory = os.path.join(tempfile.gettempdir(), f"arbitrage-engine-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    mode = _check_owner(directory).st_mode
+    if not stat.S_ISDIR(mode) or stat.S_IMODE(mode) & 0o077:
+        raise PermissionError(f"{directory} is not a private directory")
+    return os.path.join(directory, "worker.sock")
+
 
+def _check_owner(path) -> os.stat_result:
+    """Raise :class:`PermissionError` unless the current user owns ``path``."""
+    stat = os.lstat(path)
+    if stat.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    return stat
 
-def main() -> None:
-    """Simple command line interface for :class:`ArbitrageEngine`."""
+
+def _source_stamp() -> str:
+    """Identify this version of the module, so outdated workers are replaced."""
+    stat = os.stat(__file__)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def preload() -> None:
+    """Import the engine's dependencies and compile every extractor now.
+
+    Backends whose optional dependency is missing are skipped.
+    """
+    import aiohttp  # noqa: F401
+    from bs4 import BeautifulSoup  # noqa: F401
+
+    for parsers in PARSER_BACKENDS.values():
+        try:
+            for extractor in parsers.values():
+                extractor.compile()
+        except ImportError:
+            continue
+
+
+class _WarmOutput:
+    """File-like object relaying text to a warm start client."""
+
+    def __init__(self, stream, name):
+        self._stream = stream
+        self._name = name
+
+    def write(self, text) -> int:
+        if text:
+            _send_message(self._stream, {self._name: text})
+        return len(text)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+
+def _send_message(stream, message) -> None:
+    import json
+
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+class WarmWorker:
+    """Long-lived process running CLI invocations with the engine preloaded.
+
+    Parameters
+    ----------
+    path : str | None, optional
+        Unix socket to listen on, by default :func:`default_warm_socket`.
+    idle_timeout : float, optional
+        Exit after this many seconds without a request, by default ``600``.
+    """
+
+    def __init__(self, path=None, idle_timeout=600.0):
+        self.path = path or default_warm_socket()
+        self.idle_timeout = idle_timeout
+        self.stamp = _source_stamp()
+        self.requests = 0
+
+    def serve(self) -> None:
+        """Preload the engine, then run requests until idle or outdated."""
+        preload()
+        listener = self._listen()
+        if listener is None:
+            return
+        try:
+            listener.settimeout(self.idle_timeout)
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except TimeoutError:
+                    break
+                with conn:
+                    conn.settimeout(None)
+                    if not self._handle(conn, listener):
+                        break
+        finally:
+            self._close(listener)
+
+    def _listen(self):
+        """Bind the socket, or return ``None`` if another worker or user owns it."""
+        import socket
+
+        if os.path.lexists(self.path):
+            try:
+                _check_owner(self.path)
+            except PermissionError:
+                return None
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                return None
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        except OSError:
+            listener.close()
+            return None
+        finally:
+            os.umask(umask)
+        listener.listen()
+        return listener
+
+    def _close(self, listener) -> None:
+        if listener.fileno() == -1:
+            return
+        listener.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _handle(self, conn, listener) -> bool:
+        """Run one request; returns ``False`` when the worker should exit."""
+        import contextlib
+        import json
+        import traceback
+
+        stream = conn.makefile("rwb")
+        line = stream.readline()
+        if not line:
+            return True
+        request = json.loads(line)
+        if request.get("stamp") != self.stamp:
+            # Stop listening first, so the client starts a current worker
+            self._close(listener)
+            _send_message(stream, {"stale": True})
+            return False
+        self.requests += 1
+        out, err = _WarmOutput(stream, "out"), _WarmOutput(stream, "err")
+        cwd = os.getcwd()
+        status = 0
+        try:
+            os.chdir(request.get("cwd") or cwd)
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                try:
+                    main(request["argv"])
+                except SystemExit as exc:
+                    if isinstance(exc.code, str):
+                        print(exc.code, file=err)
+                        status = 1
+                    else:
+                        status = exc.code or 0
+                except Exception:
+                    traceback.print_exc(file=err)
+                    status = 1
+        finally:
+            os.chdir(cwd)
+        _send_message(stream, {"exit": status})
+        return True
+
+
+def _spawn_warm_worker(path, idle_timeout) -> None:
+    import subprocess
+    import sys
+
+    directory, filename = os.path.split(os.path.abspath(__file__))
+    module = os.path.splitext(filename)[0]
+    code = (
+        f"import sys; sys.argv[0] = {filename!r}; sys.path.insert(0, {directory!r}); "
+        f"import {module}; {module}.WarmWorker({path!r}, {idle_timeout!r}).serve()"
+    )
+    subprocess.Popen(
+        [sys.executable, "-c", code],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _connect_warm_worker(path, idle_timeout, timeout):
+    """Connect to the worker at ``path``, starting one if none is running.
+
+    Raises :class:`PermissionError` if ``path`` belongs to another user.
+    """
+    import socket
+
+    deadline = time.monotonic() + timeout
+    spawned = False
+    while True:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            _check_owner(path)
+            conn.connect(path)
+            return conn
+        except PermissionError:
+            conn.close()
+            raise
+        except (FileNotFoundError, ConnectionRefusedError):
+            conn.close()
+            if not spawned:
+                _spawn_warm_worker(path, idle_timeout)
+                spawned = True
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Warm start worker did not start at {path}")
+            time.sleep(0.02)
+
+
+def warm_start(argv, path=None, idle_timeout=600.0, timeout=30.0) -> int:
+    """Run the command line ``argv`` in the warm start worker.
+
+    A worker is started in the background when none is listening on
+    ``path`` or the running one is from an older version of this module.
+    Its output is relayed to this process's stdout and stderr.
+
+    Parameters
+    ----------
+    argv : Sequence[str]
+        Command line arguments, as passed to :func:`main`.
+    path : str | None, optional
+        Worker socket, by default :func:`default_warm_socket`.
+    idle_timeout : float, optional
+        Idle time after which a newly started worker exits.
+    timeout : float, optional
+        Seconds to wait for a newly started worker to accept requests.
+
+    Returns
+    -------
+    int
+        Exit status of the command, ``1`` when the socket or its directory
+        belongs to another user.
+    """
+    import json
+    import sys
+
+    request = {"argv": list(argv), "cwd": os.getcwd(), "stamp": _source_stamp()}
+    for _ in range(2):
+        try:
+            conn = _connect_warm_worker(path or default_warm_socket(), idle_timeout, timeout)
+        except PermissionError as exc:
+            print(f"Refusing to use warm start worker: {exc}", file=sys.stderr)
+            return 1
+        with conn:
+            stream = conn.makefile("rwb")
+            _send_message(stream, request)
+            for line in stream:
+                message = json.loads(line)
+                if "out" in message:
+                    sys.stdout.write(message["out"])
+                elif "err" in message:
+                    sys.stderr.write(message["err"])
+                elif "exit" in message:
+                    sys.stdout.flush()
+                    return message["exit"]
+                elif message.get("stale"):
+                    break
+            else:
+                print("Warm start worker exited unexpectedly", file=sys.stderr)
+                return 1
+    print("Warm start worker could not be replaced", file=sys.stderr)
+    return 1
+
+
+def main(argv=None) -> None:
+    """Simple command line interface for :class:`ArbitrageEngine`.
+
+    ``argv`` defaults to the process's command line arguments.
+    """
     import argparse
 
     parser = argparse.ArgumentParser(description="Run the Arbitrage Engine")
@@ -345,13 +4674,149 @@ def main() -> None:
         default=0.5,
         help="Percentage of predicted value below which a listing is considered a deal.",
     )
+    parser.add_argument(
+        "--rules",
+        default=None,
+        metavar="JSON",
+        help="JSON file of per-marketplace and per-query deal rules.",
+    )
     parser.add_argument(
         "--iterations",
         type=int,
         default=None,
         help="Number of scan iterations to run before exiting.",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--separate-queries",
+        action="store_true",
+        help="Search for each term on its own instead of combining them into one query.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of marketplace queries in flight at once.",
+    )
+    parser.add_argument(
+        "--seen-db",
+        default=None,
+        help="SQLite file used to remember evaluated listings across restarts.",
+    )
+    parser.add_argument(
+        "--market-interval",
+        action="append",
+        default=[],
+        metavar="MARKET=SECONDS",
+        help="Poll one marketplace on its own interval. Can be given multiple times.",
+    )
+    parser.add_argument(
+        "--adaptive-polling",
+        action="store_true",
+        help="Poll each marketplace query more or less often as its listings change.",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=10.0,
+        metavar="SECONDS",
+        help="Shortest polling interval with --adaptive-polling.",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=3600.0,
+        metavar="SECONDS",
+        help="Longest polling interval with --adaptive-polling.",
+    )
+    parser.add_argument(
+        "--request-budget",
+        type=float,
+        default=None,
+        metavar="SCANS",
+        help="Maximum marketplace scans per minute with --adaptive-polling.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve scan metrics on this port at /metrics and /metrics.json.",
+    )
+    parser.add_argument(
+        "--sold-prices",
+        default=None,
+        metavar="CSV",
+        help="CSV of sold listings (title, price[, category]) used to estimate resale values.",
+    )
+    parser.add_argument(
+        "--category",
+        action="append",
+        default=[],
+        metavar="[TERM=]CATEGORY",
+        help=(
+            "Category of the listings found, matched against the category column of "
+            "--sold-prices. Prefix with a --separate-queries TERM to set it for that "
+            "term only. Can be given multiple times."
+        ),
+    )
+    parser.add_argument(
+        "--cross-market",
+        action="store_true",
+        help="Also alert on listings priced well below the same item on other marketplaces.",
+    )
+    parser.add_argument(
+        "--history-db",
+        default=None,
+        help="SQLite file recording every scanned listing for later analysis.",
+    )
+    parser.add_argument(
+        "--max-page-bytes",
+        type=int,
+        default=None,
+        help="Stop downloading a results page after this many bytes.",
+    )
+    parser.add_argument(
+        "--max-listings",
+        type=int,
+        default=None,
+        help="Extract at most this many listings from each results page.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Split search terms and marketplaces across this many worker "
+            "processes, merging and deduplicating their alerts."
+        ),
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help=(
+            "Run in a background worker that stays loaded between invocations, "
+            "starting one if none is running."
+        ),
+    )
+    parser.add_argument(
+        "--warm-socket",
+        default=None,
+        metavar="PATH",
+        help="Unix socket of the warm start worker.",
+    )
+    parser.add_argument(
+        "--warm-idle",
+        type=float,
+        default=600.0,
+        metavar="SECONDS",
+        help="Idle time after which a warm start worker exits.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.warm_start:
+        import sys
+
+        forwarded = [arg for arg in (sys.argv[1:] if argv is None else argv) if arg != "--warm-start"]
+        raise SystemExit(warm_start(forwarded, args.warm_socket, args.warm_idle))
 
     marketplaces = None
     if args.marketplaces:
@@ -359,13 +4824,113 @@ def main() -> None:
         for entry in args.marketplaces:
             marketplaces.extend([m for m in entry.split(",") if m])
 
+    schedules = {}
+    for entry in args.market_interval:
+        market, sep, seconds = entry.partition("=")
+        try:
+            interval = float(seconds)
+        except ValueError:
+            interval = None
+        if not sep or interval is None:
+            parser.error(f"--market-interval expects MARKET=SECONDS, got {entry!r}")
+        schedules[market] = MarketSchedule(interval=interval)
+
+    categories = {}
+    for entry in args.category:
+        term, sep, category = entry.rpartition("=")
+        if not category:
+            parser.error(f"--category expects [TERM=]CATEGORY, got {entry!r}")
+        categories[term if sep else None] = category
+
+    seen_index = SeenListingIndex(path=args.seen_db) if args.seen_db else True
+
+    adaptive_polling = False
+    if args.adaptive_polling:
+        budget = args.request_budget
+        try:
+            adaptive_polling = AdaptivePolling(
+                args.min_interval,
+                args.max_interval,
+                # Every worker process polls its own share of the queries
+                budget / args.workers if budget is not None and args.workers > 1 else budget,
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    if args.workers > 1:
+        shards = shard_work(
+            args.search_terms,
+            marketplaces or list(MARKETPLACE_SPECS),
+            args.workers,
+            separate_queries=args.separate_queries,
+        )
+        options = {
+            "refresh_interval": args.refresh_interval,
+            "deal_threshold": args.deal_threshold,
+            "max_concurrency": args.max_concurrency,
+            "schedules": schedules,
+            "price_index": args.cross_market,
+            "separate_queries": args.separate_queries,
+            "sold_prices": args.sold_prices,
+            "history_db": args.history_db,
+            "max_page_bytes": args.max_page_bytes,
+            "max_listings": args.max_listings,
+            "adaptive_polling": adaptive_polling,
+            "rules_file": args.rules,
+            "categories": categories,
+        }
+        coordinator = ShardCoordinator(
+            shards,
+            options,
+            iterations=args.iterations,
+            seen_index=seen_index,
+            metrics_port=args.metrics_port,
+        )
+        try:
+            asyncio.run(coordinator.run())
+        finally:
+            if coordinator.seen_index is not None:
+                coordinator.seen_index.close()
+        if coordinator.failed:
+            import sys
+
+            failed = ", ".join(str(shard_id) for shard_id in sorted(coordinator.failed))
+            print(
+                f"Gave up on shard(s) {failed} after {coordinator.max_restarts} restarts",
+                file=sys.stderr,
+            )
+            raise SystemExit(1)
+        return
+
     engine = ArbitrageEngine(
         args.search_terms,
         refresh_interval=args.refresh_interval,
         marketplaces=marketplaces,
         deal_threshold=args.deal_threshold,
+        query_groups=args.search_terms if args.separate_queries else None,
+        max_concurrency=args.max_concurrency,
+        seen_index=seen_index,
+        schedules=schedules,
+        metrics_port=args.metrics_port,
+        resale_estimator=(
+            ResaleEstimator(SoldPriceModel.from_csv(args.sold_prices)) if args.sold_prices else None
+        ),
+        price_index=args.cross_market,
+        history=ListingHistory(args.history_db) if args.history_db else None,
+        max_page_bytes=args.max_page_bytes,
+        max_listings=args.max_listings,
+        adaptive_polling=adaptive_polling,
+        rules=DealRules.from_json(args.rules) if args.rules else None,
+        categories=categories,
     )
-    asyncio.run(engine.run(iterations=args.iterations))
+    try:
+        asyncio.run(engine.run(iterations=args.iterations))
+    finally:
+        # A warm start worker calls main() again for every request
+        if engine.history is not None:
+            engine.history.close()
+        if engine.seen_index is not None:
+            engine.seen_index.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+"""Offline throughput benchmarks for the engine.
+
+Every harness runs against the generated pages in
+``benchmarks/fixtures.py``; the network harnesses serve them from the local
+mock server in ``benchmarks/mock_server.py``. Each reports throughput,
+p50/p99 latency and peak traced memory.
+
+Usage::
+
+    python benchmarks/bench_engine.py parsers [--backend lxml] [--repeat 20]
+    python benchmarks/bench_engine.py evaluate [--listings 100000] [--rules 5000]
+    python benchmarks/bench_engine.py fetch [--latency 0.05] [--error-rate 0.1] [--max-listings 20]
+    python benchmarks/bench_engine.py run [--iterations 5]
+    python benchmarks/bench_engine.py all
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ArbitrageEngine import PARSER_BACKENDS, ArbitrageEngine, DealRule, RetryPolicy  # noqa: E402
+from benchmarks.bench_evaluate_deals import make_listings  # noqa: E402
+from benchmarks.fixtures import MARKETPLACES, build_pages  # noqa: E402
+from benchmarks.mock_server import STATS, base_urls, create_app  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Return the ``fraction`` percentile of ``values`` (nearest rank)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name, timings, items, peak_bytes=None):
+    """Print one result line: throughput, p50/p99 latency and peak memory."""
+    total = sum(timings)
+    throughput = items / total if total else float("inf")
+    line = (
+        f"{name:<28} {throughput:>12,.0f} items/s"
+        f"  p50 {percentile(timings, 0.5) * 1000:8.2f} ms"
+        f"  p99 {percentile(timings, 0.99) * 1000:8.2f} ms"
+    )
+    if peak_bytes is not None:
+        line += f"  peak {peak_bytes / 2**20:7.1f} MiB"
+    print(line)
+
+
+def traced_peak(func):
+    """Return the peak traced memory in bytes while calling ``func()``."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_parsers(args):
+    pages = build_pages(args.items, args.padding_kb)
+    parsers = PARSER_BACKENDS[args.backend]
+    for market in MARKETPLACES:
+        call_args = (pages[market], None, args.max_listings)
+        parser = parsers[market]
+        timings = []
+        count = 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            count += len(parser(*call_args))
+            timings.append(time.perf_counter() - start)
+        peak = traced_peak(lambda: parser(*call_args))
+        report(f"parse {market} ({args.backend})", timings, count, peak)
+
+
+def make_rules(count, words, seed=0):
+    """Return ``count`` rules over a few marketplaces, queries and ``words``."""
+    rng = random.Random(seed)
+    rules = []
+    for _ in range(count):
+        rules.append(
+            DealRule(
+                marketplace=rng.choice([None, *MARKETPLACES]),
+                query=rng.choice([None, "phone", "lamp"]),
+                include=tuple(rng.sample(words, 2)) if rng.random() < 0.8 else (),
+                exclude=(rng.choice(words),) if rng.random() < 0.1 else (),
+                max_price=rng.uniform(100, 500),
+                min_margin=rng.uniform(0, 50),
+                fee_rate=0.1,
+            )
+        )
+    return rules
+
+
+def bench_evaluate(args):
+    listings = make_listings(args.listings)
+    rules = None
+    if args.rules:
+        # Titles carry two rule keywords among four other words, drawn from
+        # the same vocabulary however many rules there are
+        rng = random.Random(1)
+        words = [f"word{i}" for i in range(max(args.rules, 1000))]
+        filler = [f"filler{i}" for i in range(1000)]
+        for listing in listings:
+            listing.title = " ".join(rng.choices(filler, k=4) + rng.choices(words[:1000], k=2))
+            listing.marketplace = rng.choice(MARKETPLACES)
+            listing.query = rng.choice(["phone", "lamp"])
+        rules = make_rules(args.rules, words)
+    engine = ArbitrageEngine(search_terms=[], rules=rules)
+    for name, func in (
+        ("evaluate_deals", lambda: list(engine.evaluate_deals(listings))),
+        ("evaluate_deals_batch", lambda: engine.evaluate_deals_batch(listings)),
+    ):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        report(name, timings, len(listings) * args.repeat, traced_peak(func))
+
+
+def _engine(args, server, **kwargs):
+    return ArbitrageEngine(
+        search_terms=["phone"],
+        base_urls=base_urls(str(server.make_url("/"))),
+        parser_backend=args.backend,
+        response_cache=not args.no_cache,
+        retry_policy=RetryPolicy(base_delay=0.01),
+        max_page_bytes=args.max_page_bytes,
+        max_listings=args.max_listings,
+        **kwargs,
+    )
+
+
+async def _serve(args):
+    app = create_app(
+        build_pages(args.items, args.padding_kb), args.latency, args.jitter, args.error_rate
+    )
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def bench_fetch(args):
+    server = await _serve(args)
+    try:
+        async def scans(repeat):
+            timings = []
+            count = 0
+            engine = _engine(args, server)
+            async with engine:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    count += len(await engine.fetch_listings())
+                    timings.append(time.perf_counter() - start)
+            return timings, count
+
+        timings, count = await scans(args.repeat)
+        tracemalloc.start()
+        await scans(1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report("fetch_listings", timings, count, peak)
+        stats = server.app[STATS]
+        print(f"{'':<28} {stats['requests']} requests, {stats['errors']} injected errors")
+    finally:
+        await server.close()
+
+
+async def bench_run(args):
+    server = await _serve(args)
+    try:
+        async def run_once():
+            samples = {}
+            engine = _engine(
+                args, server, refresh_interval=0, seen_index=False, alert_callback=lambda *a: None
+            )
+            engine.metrics.add_hook(
+                lambda kind, name, market, value: kind == "observe"
+                and samples.setdefault(name, []).append(value)
+            )
+            start = time.perf_counter()
+            await engine.run(iterations=args.iterations)
+            return time.perf_counter() - start, engine.metrics, samples
+
+        elapsed, metrics, samples = await run_once()
+        tracemalloc.start()
+        await run_once()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        listings = sum(metrics.counter("listings", market) for market in MARKETPLACES)
+        print(
+            f"{f'run(iterations={args.iterations})':<28} {listings / elapsed:>12,.0f} listings/s"
+            f"  total {elapsed:6.2f} s  peak {peak / 2**20:7.1f} MiB"
+        )
+        for stage in ("fetch", "parse", "evaluate"):
+            timings = samples.get(stage)
+            if timings:
+                print(
+                    f"{f'  stage {stage}':<28} {len(timings):>12} samples "
+                    f"  p50 {percentile(timings, 0.5) * 1000:8.2f} ms"
+                    f"  p99 {percentile(timings, 0.99) * 1000:8.2f} ms"
+                    f"  mean {statistics.mean(timings) * 1000:8.2f} ms"
+                )
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("harness", choices=("parsers", "evaluate", "fetch", "run", "all"))
+    parser.add_argument("--backend", choices=sorted(PARSER_BACKENDS), default="bs4")
+    parser.add_argument("--items", type=int, default=120, help="Listings per page.")
+    parser.add_argument("--padding-kb", type=int, default=512, help="Page chrome size.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--rules", type=int, default=0, help="Deal rules to evaluate with.")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache.")
+    parser.add_argument("--max-page-bytes", type=int, help="Stop reading pages after this many bytes.")
+    parser.add_argument("--max-listings", type=int, help="Extract at most this many listings per page.")
+    args = parser.parse_args()
+
+    if args.harness in ("parsers", "all"):
+        bench_parsers(args)
+    if args.harness in ("evaluate", "all"):
+        bench_evaluate(args)
+    if args.harness in ("fetch", "all"):
+        asyncio.run(bench_fetch(args))
+    if args.harness in ("run", "all"):
+        asyncio.run(bench_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare per-listing and vectorized deal evaluation.
+
+Usage::
+
+    python benchmarks/bench_evaluate_deals.py [--listings N] [--repeat R]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ArbitrageEngine import ArbitrageEngine, Listing  # noqa: E402
+
+
+def make_listings(count, market_value_share=0.0, as_dicts=False, seed=0):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        listing = {
+            "title": f"item {i}",
+            "price": rng.uniform(1, 500),
+            "url": f"https://example.com/{i}",
+        }
+        if rng.random() < market_value_share:
+            listing["market_value"] = rng.uniform(1, 1000)
+        listings.append(listing if as_dicts else Listing.from_dict(listing))
+    return listings
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--market-value-share",
+        type=float,
+        default=0.0,
+        help="Fraction of listings carrying a market_value field.",
+    )
+    parser.add_argument(
+        "--dicts",
+        action="store_true",
+        help="Evaluate plain dict listings instead of Listing records.",
+    )
+    args = parser.parse_args()
+
+    engine = ArbitrageEngine(search_terms=[])
+    listings = make_listings(args.listings, args.market_value_share, args.dicts)
+
+    loop_time = best_of(lambda: list(engine.evaluate_deals(listings)), args.repeat)
+    batch_time = best_of(lambda: engine.evaluate_deals_batch(listings), args.repeat)
+
+    print(f"listings:            {args.listings}")
+    print(f"evaluate_deals:       {loop_time * 1000:8.1f} ms")
+    print(f"evaluate_deals_batch: {batch_time * 1000:8.1f} ms")
+    print(f"speedup:              {loop_time / batch_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
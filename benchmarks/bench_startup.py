@@ -0,0 +1,91 @@
+"""Cold and warm start times of short-lived command line runs.
+
+Every sample is a fresh interpreter, as when the engine is started from
+cron. A single scan with no marketplaces isolates startup and shutdown
+from network time; ``--warm-start`` runs the same scan in a preloaded
+background worker.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--repeat 10] [--importtime 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_engine import percentile  # noqa: E402
+
+SCAN = ["-m", "ArbitrageEngine", "item", "--iterations", "1", "--marketplaces", "none"]
+
+
+def sample(args, repeat):
+    """Return the wall times of running the interpreter with ``args``."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    print(
+        f"{name:<28} p50 {percentile(timings, 0.5) * 1000:8.1f} ms"
+        f"  p99 {percentile(timings, 0.99) * 1000:8.1f} ms"
+        f"  min {min(timings) * 1000:8.1f} ms"
+    )
+
+
+def import_breakdown(count):
+    """Print the ``count`` slowest imports by cumulative time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ArbitrageEngine"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines()[1:]:
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("|", ":").split(":"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:count]:
+        print(f"  {name:<40} {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:.1f} ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Show the N slowest imports.")
+    args = parser.parse_args()
+
+    if os.environ.get("PYTHONDONTWRITEBYTECODE"):
+        print("note: PYTHONDONTWRITEBYTECODE is set, so every run recompiles the module")
+    # Make sure the bytecode cache is current before timing anything
+    sample(["-c", "import ArbitrageEngine"], 1)
+
+    report("interpreter", sample(["-c", "pass"], args.repeat))
+    report("import ArbitrageEngine", sample(["-c", "import ArbitrageEngine"], args.repeat))
+    report("--help", sample(["-m", "ArbitrageEngine", "--help"], args.repeat))
+    report("single scan (cold)", sample(SCAN, args.repeat))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        warm = SCAN + ["--warm-start", "--warm-socket", os.path.join(tmp, "warm.sock"), "--warm-idle", "5"]
+        first = sample(warm, 1)
+        print(f"{'first warm start':<28} {first[0] * 1000:8.1f} ms  (starts the worker)")
+        report("single scan (warm)", sample(warm, args.repeat))
+
+    if args.importtime:
+        print("slowest imports:")
+        import_breakdown(args.importtime)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Generated search result pages for offline benchmarks.
+
+The pages mirror the structure of real marketplace search results: a large
+``<head>`` with inline state scripts, navigation and footer chrome, and a
+result container holding ``items`` listings in each site's markup. They are
+generated deterministically from a seed instead of being checked in, so a
+multi-megabyte capture for every marketplace costs nothing in the repo.
+
+Usage::
+
+    python benchmarks/fixtures.py --write DIR [--items N] [--padding-kb KB]
+"""
+
+import argparse
+import json
+import os
+import random
+
+MARKETPLACES = ("facebook", "ebay", "craigslist", "aliexpress", "mercari")
+
+_ADJECTIVES = ("Vintage", "New", "Used", "Refurbished", "Sealed", "Rare", "Mint", "Boxed")
+_NOUNS = (
+    "iPhone 12", "Canon EOS R6", "Nintendo Switch", "Herman Miller Chair", "Road Bike",
+    "PS5 Console", "Leica M6", "KitchenAid Mixer", "Dyson V11", "AirPods Pro",
+)
+
+
+def _title(rng):
+    return f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {rng.randint(1, 9999)}"
+
+
+def _price(rng):
+    return f"${rng.randint(5, 2500):,}.{rng.randint(0, 99):02d}"
+
+
+def _head(rng, padding_kb):
+    state = {
+        "experiments": {f"exp_{i}": rng.random() for i in range(50)},
+        "tracking": ["".join(rng.choices("abcdef0123456789", k=64)) for _ in range(padding_kb * 15)],
+    }
+    blob = json.dumps(state)
+    scripts = "".join(
+        f'<script type="application/json" id="state-{i}">{blob[i::4]}</script>' for i in range(4)
+    )
+    styles = "".join(f".c{i}{{margin:{i % 7}px;color:#{i:06x}}}" for i in range(400))
+    return f"<head><meta charset='utf-8'><title>Search</title><style>{styles}</style>{scripts}</head>"
+
+
+def _chrome(rng, count=150):
+    links = "".join(
+        f'<li class="nav-item"><a href="/category/{i}">Category {i}</a></li>' for i in range(count)
+    )
+    return f'<nav class="site-nav"><ul>{links}</ul></nav>'
+
+
+def _facebook_item(rng, i):
+    return (
+        f'<div class="x9f619 x78zum5"><a href="/marketplace/item/{1000000 + i}/?ref=search" role="link">'
+        f'<div class="img"><img src="https://scontent.example/{i}.jpg" alt=""></div>'
+        f'<div><span dir="auto">{_price(rng)}</span></div>'
+        f'<div><span dir="auto">{_title(rng)}</span></div>'
+        f'<div><span class="loc">Oakland, CA</span></div></a></div>'
+    )
+
+
+def _ebay_item(rng, i):
+    return (
+        '<li class="s-item s-item__pl-on-bottom"><div class="s-item__wrapper clearfix">'
+        f'<div class="s-item__image-section"><img src="https://i.ebayimg.example/{i}.jpg"></div>'
+        f'<div class="s-item__info clearfix"><a class="s-item__link" href="https://www.ebay.com/itm/{2000000 + i}?hash=item{i:x}">'
+        f'<h3 class="s-item__title">{_title(rng)}</h3></a>'
+        '<div class="s-item__details clearfix">'
+        f'<span class="s-item__price">{_price(rng)}</span>'
+        '<span class="s-item__shipping">+$9.99 shipping</span></div></div></div></li>'
+    )
+
+
+def _craigslist_item(rng, i):
+    return (
+        f'<li class="result-row" data-pid="{3000000 + i}">'
+        f'<a href="https://sfbay.craigslist.org/sfc/for/d/{3000000 + i}.html" class="result-image gallery"></a>'
+        '<div class="result-info"><time class="result-date">Jan 1</time>'
+        f'<h3 class="result-heading"><a href="https://sfbay.craigslist.org/sfc/for/d/{3000000 + i}.html" '
+        f'class="result-title hdrlnk">{_title(rng)}</a></h3>'
+        f'<span class="result-meta"><span class="result-price">{_price(rng)}</span>'
+        '<span class="result-hood"> (mission district)</span></span></div></li>'
+    )
+
+
+def _aliexpress_item(rng, i):
+    return (
+        '<div class="search-item-card-wrapper-gallery">'
+        f'<a class="search-card-item" href="https://www.aliexpress.com/item/{4000000 + i}.html" '
+        f'title="{_title(rng)}" target="_blank"><div class="images"><img src="//ae.example/{i}.jpg"></div></a>'
+        '<div class="multi--content"><div class="multi--price">'
+        f'<span class="multi--price-sale">US {_price(rng)}</span></div>'
+        '<span class="multi--trade">1,000+ sold</span></div></div>'
+    )
+
+
+def _mercari_item(rng, i):
+    return (
+        f'<li data-testid="ItemCell"><a href="/item/m{5000000 + i}/" data-testid="ItemContainer">'
+        f'<div class="thumb"><img alt="thumbnail" src="https://static.mercdn.example/{i}.jpg"></div>'
+        f'<p data-testid="ItemCell__name">{_title(rng)}</p>'
+        f'<p data-testid="ItemCell__price">{_price(rng)}</p></a></li>'
+    )
+
+
+_ITEMS = {
+    "facebook": (_facebook_item, '<div role="main" class="feed">', "</div>"),
+    "ebay": (_ebay_item, '<ul class="srp-results srp-list clearfix">', "</ul>"),
+    "craigslist": (_craigslist_item, '<ul class="rows" id="search-results">', "</ul>"),
+    "aliexpress": (_aliexpress_item, '<div class="list--gallery--C2f2tvm">', "</div>"),
+    "mercari": (_mercari_item, '<ul data-testid="SearchResults">', "</ul>"),
+}
+
+
+def build_page(market: str, items: int = 120, padding_kb: int = 512, seed: int = 0) -> str:
+    """Return a search results page for ``market`` with ``items`` listings."""
+    rng = random.Random(f"{market}-{seed}")
+    make_item, open_tag, close_tag = _ITEMS[market]
+    results = "".join(make_item(rng, i) for i in range(items))
+    footer = "".join(f'<a href="/help/{i}">Help topic {i}</a>' for i in range(80))
+    return (
+        f"<!DOCTYPE html><html>{_head(rng, padding_kb)}<body>{_chrome(rng)}"
+        f"<main>{open_tag}{results}{close_tag}</main>"
+        f'<footer class="site-footer">{footer}</footer>'
+        f"<script>window.__INIT__={{}};</script></body></html>"
+    )
+
+
+def build_pages(items: int = 120, padding_kb: int = 512, seed: int = 0) -> dict:
+    """Return ``{marketplace: page}`` for every marketplace."""
+    return {market: build_page(market, items, padding_kb, seed) for market in MARKETPLACES}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write benchmark fixture pages to disk.")
+    parser.add_argument("--write", required=True, metavar="DIR")
+    parser.add_argument("--items", type=int, default=120)
+    parser.add_argument("--padding-kb", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.write, exist_ok=True)
+    for market, page in build_pages(args.items, args.padding_kb, args.seed).items():
+        path = os.path.join(args.write, f"{market}.html")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(page)
+        print(f"{path}: {len(page) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Local aiohttp stand-in for the marketplaces.
+
+Each marketplace is served under its own prefix, e.g. ``/ebay/sch/i.html``,
+so an engine created with ``base_urls=base_urls(server_url)`` sends every
+request here. Responses can be delayed and a share of them replaced with
+``503`` errors to exercise the retry path.
+
+Usage::
+
+    python benchmarks/mock_server.py [--port 8080] [--latency 0.05] [--error-rate 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import MARKETPLACES, build_pages  # noqa: E402
+
+from ArbitrageEngine import MARKETPLACE_SPECS  # noqa: E402
+
+# Search path of each marketplace, without the query string.
+SEARCH_PATHS = {
+    market: MARKETPLACE_SPECS[market].search_path.partition("?")[0] for market in MARKETPLACES
+}
+
+# Request and injected-error counts of a running server.
+STATS = web.AppKey("stats", dict)
+
+
+def base_urls(server_url: str) -> dict:
+    """Return engine ``base_urls`` pointing every marketplace at the server."""
+    server_url = server_url.rstrip("/")
+    return {market: f"{server_url}/{market}" for market in MARKETPLACES}
+
+
+def create_app(pages=None, latency=0.0, jitter=0.0, error_rate=0.0, seed=0) -> web.Application:
+    """Return an application serving ``pages`` (``{marketplace: html}``).
+
+    Parameters
+    ----------
+    pages : Mapping[str, str] | None, optional
+        Page served for each marketplace. Defaults to
+        :func:`benchmarks.fixtures.build_pages`.
+    latency : float, optional
+        Seconds every response is delayed by.
+    jitter : float, optional
+        Extra random delay of up to this many seconds.
+    error_rate : float, optional
+        Share of requests answered with ``503 Service Unavailable``.
+    """
+    pages = pages if pages is not None else build_pages()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    def handler_for(market):
+        body = pages[market].encode("utf-8")
+
+        async def handler(request):
+            stats["requests"] += 1
+            delay = latency + (rng.uniform(0, jitter) if jitter else 0.0)
+            if delay:
+                await asyncio.sleep(delay)
+            if error_rate and rng.random() < error_rate:
+                stats["errors"] += 1
+                return web.Response(status=503, headers={"Retry-After": "0"})
+            return web.Response(body=body, content_type="text/html", charset="utf-8")
+
+        return handler
+
+    app = web.Application()
+    app[STATS] = stats
+    for market in pages:
+        app.router.add_get(f"/{market}{SEARCH_PATHS[market]}", handler_for(market))
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve generated marketplace pages locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--items", type=int, default=120)
+    args = parser.parse_args()
+
+    app = create_app(build_pages(args.items), args.latency, args.jitter, args.error_rate)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import unittest
+
+import pytest
+
+from ArbitrageEngine import AdaptivePolling, ArbitrageEngine, ScheduledJob, SeenListingIndex
+
+
+class ChurnEstimateTest(unittest.TestCase):
+    def test_first_scan_is_only_a_baseline(self):
+        polling = AdaptivePolling()
+        stats = polling.observe("ebay", None, listings=50, new=50, now=0)
+        self.assertIsNone(stats.rate)
+        self.assertEqual(stats.scans, 0)
+
+        polling.observe("ebay", None, listings=50, new=4, repriced=1, now=10)
+        self.assertAlmostEqual(stats.rate, 0.5)
+        polling.observe("ebay", None, listings=50, new=0, now=20)
+        self.assertAlmostEqual(stats.rate, 0.35)
+        self.assertEqual((stats.scans, stats.new, stats.repriced), (2, 4, 1))
+        self.assertEqual(stats.fresh_per_scan, 2.5)
+
+    def test_seen_index_counts_repriced_listings(self):
+        index = SeenListingIndex()
+        index.filter_new([{"url": "a", "price": 1}, {"url": "b", "price": 2}])
+        fresh = index.filter_new([{"url": "a", "price": 1}, {"url": "b", "price": 3}, {"url": "c"}])
+        self.assertEqual(len(fresh), 2)
+        self.assertEqual(index.repriced, 1)
+
+
+class AllocationTest(unittest.TestCase):
+    def polling(self, rates, **kwargs):
+        polling = AdaptivePolling(min_interval=10, max_interval=600, **kwargs)
+        for market, rate in rates.items():
+            polling.observe(market, None, 0, 0, now=0)
+            polling.observe(market, None, 0, rate * 100, now=100)
+        return polling
+
+    def test_intervals_follow_churn_within_bounds(self):
+        intervals = self.polling({"hot": 1.0, "warm": 0.05, "quiet": 0.0}).allocate()
+        self.assertEqual(intervals[("hot", None)], 10)
+        self.assertAlmostEqual(intervals[("warm", None)], 20)
+        self.assertEqual(intervals[("quiet", None)], 600)
+
+    def test_budget_is_shared_by_square_root_of_churn(self):
+        polling = self.polling({"a": 0.4, "b": 0.1, "c": 0.0}, request_budget=3)
+        intervals = polling.allocate()
+        per_minute = {key[0]: 60 / interval for key, interval in intervals.items()}
+        self.assertAlmostEqual(sum(per_minute.values()), 3, places=6)
+        self.assertAlmostEqual(per_minute["c"], 0.1)
+        self.assertAlmostEqual(per_minute["a"] / per_minute["b"], 2, places=6)
+
+    def test_max_interval_wins_over_tiny_budget(self):
+        intervals = self.polling({"a": 0.0, "b": 0.0}, request_budget=0.01).allocate()
+        self.assertEqual(set(intervals.values()), {600})
+
+    def test_rebalance_updates_jobs(self):
+        polling = self.polling({"hot": 1.0})
+        jobs = [ScheduledJob("hot", None, None, 60), ScheduledJob("new", None, None, 1)]
+        polling.rebalance(jobs)
+        self.assertEqual([job.interval for job in jobs], [10, 10])
+        snapshot = polling.snapshot()
+        self.assertEqual([entry["market"] for entry in snapshot["queries"]], ["hot", "new"])
+        self.assertEqual(snapshot["queries"][0]["fresh_per_minute"], 60)
+
+    def test_budget_allocation_is_exact_with_clamped_queries(self):
+        rates = {"hot": 5.0, "a": 0.04, "b": 0.01, "c": 0.0004, "d": 0.0}
+        polling = self.polling(rates, request_budget=4)
+        per_second = {key[0]: 1 / interval for key, interval in polling.allocate().items()}
+        self.assertAlmostEqual(sum(per_second.values()), 4 / 60, places=9)
+        self.assertAlmostEqual(per_second["hot"] / per_second["a"], (5.0 / 0.04) ** 0.5)
+        self.assertAlmostEqual(per_second["a"] / per_second["b"], 2)
+        self.assertAlmostEqual(per_second["c"], 1 / 600)
+        self.assertAlmostEqual(per_second["d"], 1 / 600)
+
+    def test_rejects_bad_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptivePolling(min_interval=60, max_interval=10)
+        with self.assertRaises(ValueError):
+            ArbitrageEngine(search_terms=[], seen_index=False, adaptive_polling=True)
+
+
+@pytest.mark.asyncio
+async def test_run_polls_churning_queries_more_often(monkeypatch):
+    counter = itertools.count()
+    calls = {"ebay": 0, "mercari": 0}
+
+    async def churning_ebay(self, session):
+        calls["ebay"] += 1
+        return [
+            {"title": "lamp", "price": 10, "url": f"https://ebay.example/{next(counter)}"}
+            for _ in range(10)
+        ]
+
+    async def static_mercari(self, session):
+        calls["mercari"] += 1
+        return [{"title": "lamp", "price": 10, "url": "https://mercari.example/1"}]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", churning_ebay)
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", static_mercari)
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay", "mercari"],
+        refresh_interval=0.05,
+        adaptive_polling=AdaptivePolling(min_interval=0.01, max_interval=0.2),
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(engine.run(), timeout=0.5)
+
+    jobs = {job.market: job for job in engine.scheduled_jobs}
+    assert jobs["ebay"].interval < 0.02
+    assert jobs["mercari"].interval > 0.1
+    assert calls["ebay"] > 3 * calls["mercari"]
+    stats = engine.adaptive_polling.stats
+    assert stats[("ebay", None)].new == 10 * stats[("ebay", None)].scans > 0
+    assert stats[("mercari", None)].new == 0
+
+
+@pytest.mark.asyncio
+async def test_churn_endpoint():
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from ArbitrageEngine import MetricsCollector, metrics_app
+
+    polling = AdaptivePolling()
+    polling.observe("ebay", "lamp", 10, 10, now=0)
+    polling.observe("ebay", "lamp", 10, 2, repriced=1, now=60)
+    async with TestClient(TestServer(metrics_app(MetricsCollector(), polling))) as client:
+        snapshot = await (await client.get("/churn.json")).json()
+    assert snapshot["fresh"] == 3
+    assert snapshot["queries"][0]["query"] == "lamp"
+    assert snapshot["queries"][0]["fresh_per_minute"] == pytest.approx(3)
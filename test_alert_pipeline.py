@@ -0,0 +1,160 @@
+import asyncio
+import time
+import unittest
+
+import pytest
+
+from ArbitrageEngine import AlertPipeline, ArbitrageEngine
+
+
+def deal(i):
+    return {"title": f"steal {i}", "price": 1, "url": f"https://www.ebay.com/itm/{i}"}
+
+
+class AlertPipelineOptionsTest(unittest.TestCase):
+    def test_unknown_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            AlertPipeline(overflow="explode")
+
+    def test_engine_pipeline_option(self):
+        self.assertIsInstance(ArbitrageEngine(search_terms=[]).alert_pipeline, AlertPipeline)
+        self.assertIsNone(ArbitrageEngine(search_terms=[], alert_pipeline=False).alert_pipeline)
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_batch():
+    batches = []
+
+    async def sink(batch):
+        batches.append(batch)
+
+    pipeline = AlertPipeline(batch_size=10, batch_window=0.05)
+    pipeline.start(sink)
+    for i in range(5):
+        await pipeline.put(i)
+    await pipeline.stop()
+    assert batches == [[0, 1, 2, 3, 4]]
+    assert pipeline.delivered == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "overflow, expected", [("drop_oldest", [1, 2]), ("drop_newest", [0, 1])]
+)
+async def test_drop_policies(overflow, expected):
+    delivered = []
+
+    async def sink(batch):
+        delivered.extend(batch)
+
+    pipeline = AlertPipeline(maxsize=2, batch_window=0, overflow=overflow)
+    pipeline.start(sink)
+    results = [await pipeline.put(i) for i in range(3)]
+    await pipeline.stop()
+    assert results == [True, True, False]
+    assert delivered == expected
+    assert pipeline.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room():
+    release = asyncio.Event()
+    delivered = []
+
+    async def sink(batch):
+        await release.wait()
+        delivered.extend(batch)
+
+    pipeline = AlertPipeline(maxsize=1, batch_size=1, batch_window=0, overflow="block")
+    pipeline.start(sink)
+    await pipeline.put(0)
+    await pipeline.put(1)  # the worker has taken 0, so there is room
+    blocked = asyncio.create_task(pipeline.put(2))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    release.set()
+    assert await blocked is True
+    await pipeline.stop()
+    assert delivered == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failing_sink_does_not_stop_delivery():
+    delivered = []
+
+    async def sink(batch):
+        if batch == [0]:
+            raise RuntimeError("webhook down")
+        delivered.extend(batch)
+
+    pipeline = AlertPipeline(batch_size=1, batch_window=0)
+    pipeline.start(sink)
+    await pipeline.put(0)
+    await pipeline.put(1)
+    await pipeline.stop()
+    assert delivered == [1]
+    assert pipeline.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_drops_alerts_left_after_timeout():
+    async def sink(batch):
+        await asyncio.sleep(10)
+
+    pipeline = AlertPipeline(batch_size=1, batch_window=0)
+    pipeline.start(sink)
+    for i in range(3):
+        await pipeline.put(i)
+    await pipeline.stop(timeout=0.01)
+    assert not pipeline.running
+    assert pipeline.dropped == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("blocking", [False, True])
+async def test_slow_callback_does_not_delay_detection(blocking):
+    alerts = []
+
+    if blocking:
+        def on_alert(listing, price):
+            time.sleep(0.2)
+            alerts.append(listing["title"])
+    else:
+        async def on_alert(listing, price):
+            await asyncio.sleep(0.2)
+            alerts.append(listing["title"])
+
+    engine = ArbitrageEngine(search_terms=[], deal_threshold=0.9, alert_callback=on_alert)
+    engine.alert_pipeline.batch_window = 0
+    engine.alert_pipeline.start(engine._deliver_alerts)
+
+    started = time.perf_counter()
+    assert await engine._process_listings([deal(1)], "ebay") == 1
+    assert await engine._process_listings([deal(2)], "ebay") == 1
+    assert time.perf_counter() - started < 0.1
+
+    await engine.alert_pipeline.stop()
+    assert sorted(alerts) == ["steal 1", "steal 2"]
+    assert engine.metrics.counter("alerts") == 2
+
+
+@pytest.mark.asyncio
+async def test_run_delivers_batches(monkeypatch):
+    async def fake_ebay(self, session):
+        return [deal(i) for i in range(3)]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", fake_ebay)
+    batches = []
+
+    async def on_batch(batch):
+        batches.append([listing["title"] for listing, _ in batch])
+
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay"],
+        refresh_interval=0,
+        deal_threshold=0.9,
+        alert_batch_callback=on_batch,
+    )
+    await engine.run(iterations=1)
+    assert batches == [["steal 0", "steal 1", "steal 2"]]
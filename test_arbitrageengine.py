@@ -148,5 +148,279 @@ class CLIIterationsTest(unittest.TestCase):
                     aiorun.assert_called_once_with(instance.run.return_value)
 
 
+class CLISeparateQueriesTest(unittest.TestCase):
+    def test_cli_separate_queries(self):
+        import sys
+        from unittest import mock
+
+        argv = [
+            "prog",
+            "phone",
+            "lens",
+            "--separate-queries",
+            "--max-concurrency",
+            "4",
+        ]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run") as aiorun:
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    main()
+                    AE.assert_called_once()
+                    _, kwargs = AE.call_args
+                    self.assertEqual(kwargs.get("query_groups"), ["phone", "lens"])
+                    self.assertEqual(kwargs.get("max_concurrency"), 4)
+                    aiorun.assert_called_once_with(AE.return_value.run.return_value)
+
+
+class CLISeenDbTest(unittest.TestCase):
+    def test_cli_seen_db_creates_persistent_index(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--seen-db", "seen.db"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    with mock.patch("ArbitrageEngine.SeenListingIndex") as index:
+                        from ArbitrageEngine import main
+
+                        main()
+                        index.assert_called_once_with(path="seen.db")
+                        _, kwargs = AE.call_args
+                        self.assertIs(kwargs.get("seen_index"), index.return_value)
+
+
+class CLIMarketIntervalTest(unittest.TestCase):
+    def test_cli_parses_market_intervals(self):
+        import sys
+        from unittest import mock
+
+        argv = [
+            "prog",
+            "item",
+            "--market-interval",
+            "facebook=15",
+            "--market-interval",
+            "aliexpress=600",
+        ]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    main()
+                    _, kwargs = AE.call_args
+                    schedules = kwargs.get("schedules")
+                    self.assertEqual(schedules["facebook"].interval, 15)
+                    self.assertEqual(schedules["aliexpress"].interval, 600)
+
+    def test_cli_rejects_malformed_market_interval(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--market-interval", "facebook"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                from ArbitrageEngine import main
+
+                with mock.patch("sys.stderr"):
+                    with self.assertRaises(SystemExit):
+                        main()
+
+
+class CLISoldPricesTest(unittest.TestCase):
+    def test_cli_sold_prices_builds_estimator(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--sold-prices", "sold.csv"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    with mock.patch("ArbitrageEngine.SoldPriceModel") as model:
+                        from ArbitrageEngine import ResaleEstimator, main
+
+                        main()
+                        model.from_csv.assert_called_once_with("sold.csv")
+                        _, kwargs = AE.call_args
+                        estimator = kwargs.get("resale_estimator")
+                        self.assertIsInstance(estimator, ResaleEstimator)
+                        self.assertIs(estimator.model, model.from_csv.return_value)
+
+
+class CLICrossMarketTest(unittest.TestCase):
+    def test_cli_cross_market_enables_price_index(self):
+        import sys
+        from unittest import mock
+
+        for argv, expected in ((["prog", "item"], False), (["prog", "item", "--cross-market"], True)):
+            with mock.patch.object(sys, "argv", argv):
+                with mock.patch("ArbitrageEngine.asyncio.run"):
+                    with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                        from ArbitrageEngine import main
+
+                        main()
+                        _, kwargs = AE.call_args
+                        self.assertIs(kwargs.get("price_index"), expected)
+
+
+class CLIHistoryDbTest(unittest.TestCase):
+    def test_cli_history_db_creates_store(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--history-db", "history.db"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    with mock.patch("ArbitrageEngine.ListingHistory") as history:
+                        from ArbitrageEngine import main
+
+                        main()
+                        history.assert_called_once_with("history.db")
+                        _, kwargs = AE.call_args
+                        self.assertIs(kwargs.get("history"), history.return_value)
+
+    def test_cli_closes_stores_when_the_run_fails(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--history-db", "history.db", "--seen-db", "seen.db"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run", side_effect=KeyboardInterrupt):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    with self.assertRaises(KeyboardInterrupt):
+                        main()
+                    AE.return_value.history.close.assert_called_once_with()
+                    AE.return_value.seen_index.close.assert_called_once_with()
+
+
+class CLIPartialPagesTest(unittest.TestCase):
+    def test_cli_forwards_page_limits(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--max-page-bytes", "500000", "--max-listings", "50"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    main()
+                    _, kwargs = AE.call_args
+                    self.assertEqual(kwargs.get("max_page_bytes"), 500000)
+                    self.assertEqual(kwargs.get("max_listings"), 50)
+
+
+class CLIAdaptivePollingTest(unittest.TestCase):
+    def test_cli_configures_adaptive_polling(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--adaptive-polling", "--min-interval", "30", "--request-budget", "20"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    main()
+                    _, kwargs = AE.call_args
+                    polling = kwargs.get("adaptive_polling")
+                    self.assertEqual(polling.min_interval, 30)
+                    self.assertEqual(polling.max_interval, 3600)
+                    self.assertEqual(polling.request_budget, 20)
+
+
+class CLIRulesTest(unittest.TestCase):
+    def test_cli_loads_rules(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "item", "--rules", "rules.json"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    with mock.patch("ArbitrageEngine.DealRules") as rules:
+                        from ArbitrageEngine import main
+
+                        main()
+                        rules.from_json.assert_called_once_with("rules.json")
+                        _, kwargs = AE.call_args
+                        self.assertIs(kwargs.get("rules"), rules.from_json.return_value)
+
+
+class CLICategoryTest(unittest.TestCase):
+    def test_cli_parses_categories(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "lens", "--category", "camera", "--category", "lens=optics"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    from ArbitrageEngine import main
+
+                    main()
+                    _, kwargs = AE.call_args
+                    self.assertEqual(kwargs.get("categories"), {None: "camera", "lens": "optics"})
+
+
+class CLIWorkersTest(unittest.TestCase):
+    def test_cli_workers_runs_coordinator(self):
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "phone", "lens", "--workers", "2", "--separate-queries", "--marketplaces", "ebay"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run") as aiorun:
+                with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                    with mock.patch("ArbitrageEngine.ShardCoordinator") as coordinator:
+                        from ArbitrageEngine import Shard, main
+
+                        coordinator.return_value.failed = []
+                        main()
+                        AE.assert_not_called()
+                        args, kwargs = coordinator.call_args
+                        self.assertEqual(args[0], [Shard(("phone",), ("ebay",)), Shard(("lens",), ("ebay",))])
+                        self.assertTrue(args[1]["separate_queries"])
+                        aiorun.assert_called_once_with(coordinator.return_value.run.return_value)
+
+    def test_cli_workers_exits_nonzero_when_shards_fail(self):
+        import io
+        import sys
+        from unittest import mock
+
+        argv = ["prog", "phone", "lens", "--workers", "2", "--separate-queries", "--marketplaces", "ebay"]
+
+        with mock.patch.object(sys, "argv", argv):
+            with mock.patch("ArbitrageEngine.asyncio.run"):
+                with mock.patch("ArbitrageEngine.ShardCoordinator") as coordinator:
+                    with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                        from ArbitrageEngine import main
+
+                        coordinator.return_value.failed = [1]
+                        coordinator.return_value.max_restarts = 3
+                        with self.assertRaises(SystemExit) as raised:
+                            main()
+        self.assertEqual(raised.exception.code, 1)
+        self.assertIn("shard(s) 1 after 3 restarts", stderr.getvalue())
+
+
 if __name__ == "__main__":
     unittest.main()
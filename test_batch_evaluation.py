@@ -0,0 +1,60 @@
+import importlib.util
+import random
+import unittest
+from types import SimpleNamespace
+
+from ArbitrageEngine import VECTORIZE_MIN_LISTINGS, ArbitrageEngine
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def make_listings(count, seed=0):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        listing = {"title": f"item {i}", "price": rng.choice([None, rng.randint(1, 500)])}
+        roll = rng.random()
+        if roll < 0.3:
+            listing["market_value"] = rng.choice([None, rng.uniform(1, 1000)])
+        elif roll < 0.4:
+            listing["estimated_price"] = rng.randint(1, 1000)
+        if roll > 0.9:
+            listing = SimpleNamespace(**listing)
+        listings.append(listing)
+    return listings
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class BatchEvaluationParityTest(unittest.TestCase):
+    def assert_same_deals(self, engine, listings):
+        expected = list(engine.evaluate_deals(listings))
+        actual = engine.evaluate_deals_batch(listings)
+        self.assertEqual(
+            [(id(listing), price) for listing, price in actual],
+            [(id(listing), price) for listing, price in expected],
+        )
+
+    def test_matches_generator(self):
+        listings = make_listings(5000)
+        for threshold in (0.3, 0.5, 0.9):
+            with self.subTest(threshold=threshold):
+                engine = ArbitrageEngine(search_terms=[], deal_threshold=threshold)
+                self.assert_same_deals(engine, listings)
+
+    def test_respects_overridden_predictor(self):
+        class FixedValueEngine(ArbitrageEngine):
+            def predict_resale_value(self, listing):
+                title = listing["title"] if isinstance(listing, dict) else listing.title
+                return None if title.endswith("7") else 300
+
+        self.assert_same_deals(FixedValueEngine(search_terms=[]), make_listings(2000))
+
+    def test_small_batches_use_generator(self):
+        listings = [{"title": "cheap", "price": 50, "market_value": 200}]
+        self.assertLess(len(listings), VECTORIZE_MIN_LISTINGS)
+        engine = ArbitrageEngine(search_terms=[])
+        self.assertEqual(engine.evaluate_deals_batch(listings), [(listings[0], 200)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, QueryResult, RateLimiter
+
+
+def _fake_query(calls, market, delay=0):
+    async def query(self, session, terms=None):
+        calls.append((market, terms))
+        await asyncio.sleep(delay)
+        return [{"title": f"{market} {' '.join(terms or ['all'])}", "price": 1.0, "url": None}]
+
+    return query
+
+
+@pytest.mark.asyncio
+async def test_query_groups_run_separately_and_tag_listings(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", _fake_query(calls, "ebay"))
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", _fake_query(calls, "mercari"))
+    engine = ArbitrageEngine(
+        search_terms=["unused"],
+        marketplaces=["ebay", "mercari"],
+        query_groups=["phone", ["lens", "cap"]],
+    )
+
+    listings = await engine.fetch_listings(session=object())
+
+    assert sorted(calls) == [
+        ("ebay", ("lens", "cap")),
+        ("ebay", ("phone",)),
+        ("mercari", ("lens", "cap")),
+        ("mercari", ("phone",)),
+    ]
+    assert {"title": "ebay lens cap", "price": 1.0, "url": None,
+            "query": "lens cap", "marketplace": "ebay"} in listings
+    assert len(listings) == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_results_as_they_complete(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", _fake_query(calls, "ebay", 0.05))
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", _fake_query(calls, "mercari"))
+    engine = ArbitrageEngine(
+        search_terms=[], marketplaces=["ebay", "mercari"], query_groups=["phone"]
+    )
+
+    results = [r async for r in engine.stream_query_results(session=object())]
+
+    assert [r.marketplace for r in results] == ["mercari", "ebay"]
+    assert all(isinstance(r, QueryResult) and r.query == "phone" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_bounds_in_flight_queries(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def query(self, session, terms=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return []
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", query)
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay"],
+        query_groups=[f"term{i}" for i in range(12)],
+        max_concurrency=3,
+    )
+
+    await engine.fetch_listings(session=object())
+
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_query_is_skipped(monkeypatch):
+    async def broken(self, session, terms=None):
+        raise RuntimeError("boom")
+
+    calls = []
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", broken)
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", _fake_query(calls, "mercari"))
+    engine = ArbitrageEngine(
+        search_terms=[], marketplaces=["ebay", "mercari"], query_groups=["phone"]
+    )
+
+    listings = await engine.fetch_listings(session=object())
+
+    assert [l["marketplace"] for l in listings] == ["mercari"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(rate=50)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(4):
+        await limiter.wait()
+    assert loop.time() - start >= 3 / 50 * 0.9
@@ -0,0 +1,46 @@
+import unittest
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import PARSER_BACKENDS, ArbitrageEngine, RetryPolicy
+from benchmarks.bench_engine import percentile
+from benchmarks.fixtures import MARKETPLACES, build_page, build_pages
+from benchmarks.mock_server import STATS, base_urls, create_app
+
+
+class FixturesTest(unittest.TestCase):
+    def test_pages_are_deterministic(self):
+        self.assertEqual(build_page("ebay", items=5, padding_kb=1), build_page("ebay", items=5, padding_kb=1))
+
+    def test_backends_agree_on_fixture_pages(self):
+        pages = build_pages(items=10, padding_kb=1)
+        for market in MARKETPLACES:
+            args = (pages[market],)
+            if market == "facebook":
+                args += ("https://www.facebook.com",)
+            bs4 = PARSER_BACKENDS["bs4"][market](*args)
+            self.assertEqual(len(bs4), 10, market)
+            self.assertEqual(PARSER_BACKENDS["lxml"][market](*args), bs4, market)
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(1, 101), 0.5), 50)
+        self.assertEqual(percentile(range(1, 101), 0.99), 99)
+
+
+@pytest.mark.asyncio
+async def test_engine_scans_mock_server():
+    server = TestServer(create_app(build_pages(items=3, padding_kb=1), error_rate=0.2, seed=1))
+    await server.start_server()
+    try:
+        engine = ArbitrageEngine(
+            search_terms=["phone"],
+            base_urls=base_urls(str(server.make_url("/"))),
+            retry_policy=RetryPolicy(base_delay=0.001),
+        )
+        async with engine:
+            listings = await engine.fetch_listings()
+    finally:
+        await server.close()
+    assert len(listings) == 3 * len(MARKETPLACES)
+    assert server.app[STATS]["requests"] >= len(MARKETPLACES)
@@ -0,0 +1,114 @@
+import os
+import unittest
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import Shard, ShardCoordinator, run_shard_worker, shard_work
+from benchmarks.fixtures import build_pages
+from benchmarks.mock_server import base_urls, create_app
+
+MARKETS = ["facebook", "ebay", "craigslist", "aliexpress", "mercari"]
+
+
+def crashing_worker(shard_id, shard, options, events, iterations=None):
+    os._exit(3)
+
+
+def flaky_worker(shard_id, shard, options, events, iterations=None):
+    """Crash the first time each shard starts, then scan normally."""
+    options = dict(options)
+    marker = os.path.join(options.pop("marker_dir"), str(shard_id))
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    run_shard_worker(shard_id, shard, options, events, iterations)
+
+
+class ShardWorkTest(unittest.TestCase):
+    def test_separate_terms_are_split_before_marketplaces(self):
+        shards = shard_work(["a", "b"], MARKETS, 2, separate_queries=True)
+        self.assertEqual(shards, [Shard(("a",), tuple(MARKETS)), Shard(("b",), tuple(MARKETS))])
+
+    def test_marketplaces_are_split_for_extra_workers(self):
+        shards = shard_work(["a", "b"], ["ebay", "mercari"], 4, separate_queries=True)
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(
+            {(s.search_terms, s.marketplaces) for s in shards},
+            {((t,), (m,)) for t in "ab" for m in ("ebay", "mercari")},
+        )
+
+    def test_combined_query_is_never_split(self):
+        shards = shard_work(["a", "b"], MARKETS, 2)
+        self.assertEqual([s.search_terms for s in shards], [("a", "b"), ("a", "b")])
+        self.assertEqual(sum(len(s.marketplaces) for s in shards), len(MARKETS))
+
+    def test_at_most_one_shard_per_pair(self):
+        self.assertEqual(len(shard_work(["a"], ["ebay"], 8, separate_queries=True)), 1)
+
+
+async def _serve():
+    server = TestServer(create_app(build_pages(items=3, padding_kb=1)))
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_coordinator_merges_and_deduplicates_alerts():
+    server = await _serve()
+    alerts = []
+    try:
+        coordinator = ShardCoordinator(
+            # Two workers scanning the same listings
+            [Shard(("phone",), ("ebay",)), Shard(("phone",), ("ebay",)), Shard(("phone",), ("mercari",))],
+            {"base_urls": base_urls(str(server.make_url("/"))), "deal_threshold": 1.0},
+            iterations=1,
+            alert_callback=lambda listing, price: alerts.append(listing.url),
+        )
+        await coordinator.run()
+    finally:
+        await server.close()
+    assert len(alerts) == len(set(alerts)) == 6
+    assert sum("ebay.com" in url for url in alerts) == 3
+    assert coordinator.duplicates == 3
+    assert coordinator.metrics.counter("listings", "ebay") == 6
+    assert coordinator.failed == []
+
+
+@pytest.mark.asyncio
+async def test_crashed_workers_are_restarted(tmp_path):
+    server = await _serve()
+    alerts = []
+    try:
+        coordinator = ShardCoordinator(
+            shard_work(["phone"], ["ebay", "craigslist"], 2),
+            {
+                "base_urls": base_urls(str(server.make_url("/"))),
+                "deal_threshold": 1.0,
+                "marker_dir": str(tmp_path),
+            },
+            iterations=1,
+            alert_callback=lambda listing, price: alerts.append(listing.url),
+            restart_delay=0,
+            worker=flaky_worker,
+        )
+        await coordinator.run()
+    finally:
+        await server.close()
+    assert coordinator.restarts == [1, 1]
+    assert coordinator.metrics.counter("worker_restarts") == 2
+    assert len(alerts) == 6
+
+
+@pytest.mark.asyncio
+async def test_shard_is_given_up_after_max_restarts():
+    coordinator = ShardCoordinator(
+        [Shard(("phone",), ("ebay",))],
+        iterations=1,
+        max_restarts=1,
+        restart_delay=0,
+        worker=crashing_worker,
+    )
+    await coordinator.run()
+    assert coordinator.restarts == [1]
+    assert coordinator.failed == [0]
@@ -0,0 +1,111 @@
+import unittest
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, CrossMarketIndex, Listing
+
+
+def listing(title, price, market, i):
+    return Listing(title, price, f"https://{market}.example/{i}", market)
+
+
+class CrossMarketIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CrossMarketIndex()
+        self.index.update(
+            [
+                listing("Apple iPhone 12 Pro 128GB", 500, "ebay", 1),
+                listing("iPhone 12 Pro 128GB Apple unlocked", 520, "mercari", 2),
+                listing("Nintendo Switch OLED", 300, "ebay", 3),
+            ]
+        )
+
+    def test_matches_near_duplicates_on_other_marketplaces(self):
+        query = listing("apple iphone 12 pro 128gb!", 100, "craigslist", 4)
+        matches = self.index.matches(query)
+        self.assertEqual([match.url for _, match in matches][:1], ["https://ebay.example/1"])
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(self.index.reference_price(query), 510)
+
+    def test_same_marketplace_is_ignored(self):
+        query = listing("Apple iPhone 12 Pro 128GB", 100, "ebay", 5)
+        self.assertEqual([match.url for _, match in self.index.matches(query)], ["https://mercari.example/2"])
+
+    def test_dissimilar_titles_do_not_match(self):
+        self.assertEqual(self.index.matches(listing("Nintendo Switch game", 10, "craigslist", 6)), [])
+        self.assertIsNone(self.index.reference_price(listing("bicycle", 10, "craigslist", 7)))
+
+    def test_untagged_listings_use_the_marketplace_argument(self):
+        index = CrossMarketIndex()
+        index.update([{"title": "Nintendo Switch OLED", "price": 300, "url": "https://a/1"}], "ebay")
+        query = {"title": "Nintendo Switch OLED", "price": 50, "url": "https://b/1"}
+        self.assertEqual(index.reference_price(query, "mercari"), 300)
+        self.assertIsNone(index.reference_price(query, "ebay"))
+
+    def test_update_replaces_and_expires_entries(self):
+        index = CrossMarketIndex(ttl=10)
+        index.update([listing("Nintendo Switch OLED", 300, "ebay", 1)], now=0)
+        index.update([listing("Sony camera", 300, "ebay", 1)], now=5)
+        self.assertEqual(len(index), 1)
+        query = listing("Nintendo Switch OLED", 10, "mercari", 2)
+        self.assertEqual(index.matches(query), [])
+        index.update([], now=20)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index._buckets, {})
+
+    def test_duplicate_keys_in_one_batch(self):
+        index = CrossMarketIndex(ttl=10)
+        index.update(
+            [
+                Listing("Nintendo Switch OLED", 300, "https://e/1?a", "ebay"),
+                Listing("Nintendo Switch OLED", 290, "https://e/1?b", "ebay"),
+                Listing("Sony camera", 200, "https://e/2?a", "ebay"),
+                Listing("Canon camera", 210, "https://e/2?b", "ebay"),
+            ],
+            now=0,
+        )
+        self.assertEqual(len(index), 2)
+        query = listing("Nintendo Switch OLED", 10, "mercari", 3)
+        self.assertEqual(index.reference_price(query), 290)
+        self.assertEqual(index.matches(listing("Sony camera", 10, "mercari", 4)), [])
+        index.update([], now=20)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index._buckets, {})
+
+    def test_max_entries(self):
+        index = CrossMarketIndex(max_entries=2)
+        index.update([listing(f"item {i} thing", 1, "ebay", i) for i in range(3)])
+        self.assertEqual(len(index), 2)
+        self.assertNotIn(listing("item 0 thing", 1, "ebay", 0), index)
+
+    def test_batched_and_single_signatures_agree(self):
+        keywords = [frozenset({"nintendo", "switch", str(i)}) for i in range(100)]
+        self.assertEqual(
+            self.index._bands_batch(keywords), [self.index._bands(k) for k in keywords]
+        )
+
+    def test_large_index_lookup_finds_duplicates(self):
+        index = CrossMarketIndex()
+        index.update(
+            listing(f"brand{i} model{i} gadget{i % 7}", 100 + i, "ebay", i) for i in range(5000)
+        )
+        query = listing("brand4321 model4321 gadget2", 10, "mercari", 1)
+        self.assertEqual(index.reference_price(query), 4421)
+
+
+@pytest.mark.asyncio
+async def test_listing_below_cross_market_price_is_a_deal():
+    alerts = []
+    engine = ArbitrageEngine(
+        search_terms=[],
+        price_index=True,
+        alert_callback=lambda listing, price: alerts.append((listing.url, price)),
+    )
+    await engine._process_listings([listing("Sony A7 III body", 1000, "ebay", 1)], "ebay")
+    await engine._process_listings([listing("Sony A7 III camera body", 900, "mercari", 1)], "mercari")
+    found = await engine._process_listings(
+        [listing("sony a7 iii body", 300, "craigslist", 1)], "craigslist"
+    )
+    assert found == 1
+    assert alerts == [("https://craigslist.example/1", 950)]
+    assert engine.metrics.counter("cross_market_deals", "craigslist") == 1
@@ -0,0 +1,192 @@
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, DealRule, DealRules, Listing
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def deals(engine, listings, marketplace=None, query=None):
+    return [listing.title for listing, _ in engine.evaluate_deals(listings, marketplace, query)]
+
+
+def listing(title, price, value=100.0, marketplace=None, query=None):
+    return Listing(title, price, marketplace=marketplace, query=query, market_value=value)
+
+
+class DealRulesTest(unittest.TestCase):
+    def test_marketplace_threshold_and_price_bounds(self):
+        engine = ArbitrageEngine(
+            search_terms=[],
+            rules=[
+                DealRule(marketplace="ebay", threshold=0.8),
+                DealRule(min_price=10, max_price=70),
+            ],
+        )
+        listings = [listing("lamp", 75), listing("desk", 60), listing("pen", 5)]
+        self.assertEqual(deals(engine, listings, "ebay"), ["desk"])
+        self.assertEqual(deals(engine, listings, "mercari"), [])
+        self.assertEqual(deals(engine, [listing("chair", 40)], "mercari"), ["chair"])
+
+    def test_margin_after_fees(self):
+        rule = DealRule(min_margin=20, fee_rate=0.1, fixed_fee=5, threshold=1)
+        engine = ArbitrageEngine(search_terms=[], rules=[rule])
+        # 100 * 0.9 - 5 - price >= 20  <=>  price <= 65
+        listings = [listing("a", 65), listing("b", 65.5)]
+        self.assertEqual(deals(engine, listings), ["a"])
+
+    def test_keywords_match_whole_words(self):
+        rules = DealRules(
+            [
+                DealRule(include=("iphone 13", "pixel"), threshold=0.9),
+                DealRule(exclude=("for parts", "broken")),
+            ]
+        )
+        engine = ArbitrageEngine(search_terms=[], rules=rules)
+        listings = [
+            listing("Apple iPhone 13 Pro", 80),
+            listing("iPhone 12", 80),
+            listing("Google Pixel 7 - for parts", 10),
+            listing("Pixelbook", 80),
+            listing("unbroken vase", 10),
+        ]
+        self.assertEqual(deals(engine, listings), ["Apple iPhone 13 Pro", "unbroken vase"])
+        self.assertEqual(rules.keywords("iphone 13 for parts"), {0, 2})
+
+    def test_specific_rules_override_field_by_field(self):
+        engine = ArbitrageEngine(
+            search_terms=[],
+            deal_threshold=0.1,
+            rules=[
+                DealRule(threshold=0.5, max_price=30, exclude=("replica",)),
+                DealRule(marketplace="ebay", threshold=0.9),
+                DealRule(marketplace="ebay", query="watch", max_price=85),
+                DealRule(marketplace="ebay", threshold=0.2),
+            ],
+        )
+        listings = [listing("watch", 80), listing("replica watch", 20), listing("bag", 25)]
+        self.assertEqual(deals(engine, listings, "ebay", "watch"), ["watch", "bag"])
+        self.assertEqual(deals(engine, listings, "ebay", "bag"), ["bag"])
+        self.assertEqual(deals(engine, listings, "mercari"), ["bag"])
+
+    def test_keyword_rules_precede_others_in_scope(self):
+        rules = [
+            DealRule(marketplace="ebay", max_price=10),
+            DealRule(marketplace="ebay", include=("gold", "silver"), max_price=500),
+            DealRule(marketplace="ebay", include=("silver",), min_price=90),
+        ]
+        engine = ArbitrageEngine(search_terms=[], deal_threshold=1, rules=rules)
+        listings = [listing("gold ring", 80), listing("silver ring", 80), listing("tin ring", 80)]
+        self.assertEqual(deals(engine, listings, "ebay"), ["gold ring"])
+        self.assertEqual(deals(engine, listings, "ebay"), ["gold ring"])
+
+    def test_listing_fields_select_rules(self):
+        engine = ArbitrageEngine(search_terms=[], rules=[DealRule(marketplace="ebay", query="lamp", threshold=0.9)])
+        self.assertEqual(deals(engine, [listing("lamp", 80, marketplace="ebay", query="lamp")]), ["lamp"])
+        self.assertEqual(deals(engine, [listing("lamp", 80, marketplace="ebay", query="desk")]), [])
+
+    def test_from_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, "w") as fh:
+                json.dump([{"marketplace": "ebay", "include": "lamp", "max_price": 20}], fh)
+            rules = DealRules.from_json(path)
+        self.assertEqual(list(rules), [DealRule(marketplace="ebay", include=("lamp",), max_price=20)])
+
+    def test_rejects_empty_keywords(self):
+        with self.assertRaises(ValueError):
+            DealRules([DealRule(include=("--",))])
+
+
+def random_rules(rng, count):
+    words = ["phone", "lamp", "desk", "camera", "lens", "ring", "gold", "broken"]
+    rules = []
+    for _ in range(count):
+        fields = {
+            "marketplace": rng.choice([None, "ebay", "mercari"]),
+            "query": rng.choice([None, "phone", "lamp"]),
+        }
+        if rng.random() < 0.5:
+            fields["include"] = tuple(rng.sample(words, rng.randint(1, 2)))
+        if rng.random() < 0.2:
+            fields["exclude"] = (rng.choice(words),)
+        for name, low, high in (
+            ("min_price", 1, 100),
+            ("max_price", 100, 500),
+            ("threshold", 0.2, 1.0),
+            ("min_margin", 0, 200),
+            ("fee_rate", 0, 0.2),
+            ("fixed_fee", 0, 10),
+        ):
+            if rng.random() < 0.3:
+                fields[name] = rng.uniform(low, high)
+        rules.append(DealRule(**fields))
+    return rules, words
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class BatchRulesParityTest(unittest.TestCase):
+    def test_batch_matches_generator(self):
+        rng = random.Random(3)
+        rules, words = random_rules(rng, 300)
+        engine = ArbitrageEngine(search_terms=[], rules=rules)
+        listings = [
+            {
+                "title": " ".join(rng.choices(words, k=3)),
+                "price": rng.choice([None, rng.uniform(1, 600)]),
+                "market_value": rng.uniform(1, 1000),
+                "marketplace": rng.choice(["ebay", "mercari", "facebook"]),
+                "query": rng.choice(["phone", "lamp", "desk"]),
+            }
+            for _ in range(3000)
+        ]
+        expected = list(engine.evaluate_deals(listings))
+        actual = engine.evaluate_deals_batch(listings)
+        self.assertTrue(expected)
+        self.assertEqual(
+            [(id(listing), price) for listing, price in actual],
+            [(id(listing), price) for listing, price in expected],
+        )
+
+
+@pytest.mark.asyncio
+async def test_scan_results_are_judged_by_their_rules():
+    found = []
+    engine = ArbitrageEngine(
+        search_terms=["lamp"],
+        alert_callback=lambda listing, price: found.append(listing.title),
+        alert_pipeline=False,
+        rules=[DealRule(marketplace="ebay", query="lamp", exclude=("shade",), threshold=0.9)],
+    )
+    listings = [listing("desk lamp", 80), listing("lamp shade", 10)]
+    await engine._process_listings(listings, "ebay")
+    await engine._process_listings([listing("floor lamp", 80)], "mercari")
+    assert found == ["desk lamp"]
+
+
+class RuleScopeExcludeTest(unittest.TestCase):
+    def test_exclude_without_keyword_rules(self):
+        engine = ArbitrageEngine(search_terms=[], rules=[DealRule(marketplace="ebay", exclude=("broken",))])
+        listings = [listing("broken lamp", 10), listing("lamp", 10)]
+        self.assertEqual(deals(engine, listings, "ebay"), ["lamp"])
+        self.assertEqual(deals(engine, listings, "mercari"), ["broken lamp", "lamp"])
+
+    def test_scopes_without_keyword_rules_skip_keyword_matching(self):
+        rules = DealRules([DealRule(marketplace="ebay", max_price=50), DealRule(query="lens", include=("canon",))])
+        self.assertEqual(set(rules._keyed), {(None, "lens")})
+        rule = rules.resolve(listing("canon lamp", 40), "ebay")
+        self.assertEqual(rule.row[:2], (float("-inf"), 50.0))
+        self.assertTrue(rule.predicate(40, 100, 0.5))
+        self.assertFalse(rule.predicate(60, 200, 0.5))
+
+    def test_exclude_of_other_scope_is_ignored(self):
+        rules = [DealRule(include=("lamp",), threshold=0.9), DealRule(marketplace="ebay", exclude=("desk",))]
+        engine = ArbitrageEngine(search_terms=[], rules=rules)
+        self.assertEqual(deals(engine, [listing("desk lamp", 80)], "mercari"), ["desk lamp"])
+        self.assertEqual(deals(engine, [listing("desk lamp", 80)], "ebay"), [])
@@ -0,0 +1,146 @@
+import importlib.util
+import pickle
+import unittest
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import (
+    MARKETPLACE_BASE_URLS,
+    MARKETPLACE_SPECS,
+    PARSER_BACKENDS,
+    ArbitrageEngine,
+    MarketplaceSpec,
+    compile_extractor,
+    css_to_xpath,
+    parse_price,
+    register_marketplace,
+)
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+BACKENDS = [backend for backend in PARSER_BACKENDS if backend != "lxml" or HAS_LXML]
+
+# A marketplace that only exists as a spec.
+SWAPSHOP = MarketplaceSpec(
+    "swapshop",
+    "https://swapshop.example",
+    "/find?q={query}",
+    items="div.card",
+    title="h2",
+    price="span[class*='cost']",
+    link="a[href]",
+)
+
+SWAPSHOP_PAGE = (
+    '<div class="card"><a href="/l/1"><h2>Old Camera</h2></a><span class="cost big">$1,250.50</span></div>'
+    '<div class="card"><a href="https://swapshop.example/l/2"><h2>Tripod</h2></a></div>'
+    '<div class="card"><h2>Sold out</h2></div>'
+)
+
+
+class ParsePriceTest(unittest.TestCase):
+    def test_parses_first_dollar_amount(self):
+        self.assertEqual(parse_price("was $2,000 now $1,499.99"), 2000.0)
+        self.assertEqual(parse_price("$15"), 15.0)
+
+    def test_missing_or_malformed_price(self):
+        for text in (None, "", "free", "$", "$1.2.3"):
+            self.assertIsNone(parse_price(text))
+
+
+class CssToXpathTest(unittest.TestCase):
+    def test_translates_compound_selectors(self):
+        self.assertEqual(css_to_xpath("a[href]"), "a[@href]")
+        self.assertEqual(
+            css_to_xpath("li.s-item"),
+            "li[contains(concat(' ', normalize-space(@class), ' '), ' s-item ')]",
+        )
+        self.assertEqual(css_to_xpath("p[data-testid='name']"), "p[@data-testid='name']")
+        self.assertEqual(css_to_xpath("[class*='price']"), "*[contains(@class, 'price')]")
+
+    def test_rejects_combinators(self):
+        for selector in ("div a", "ul > li", "a:first-child", ""):
+            with self.assertRaises(ValueError):
+                css_to_xpath(selector)
+
+
+class ExtractorTest(unittest.TestCase):
+    def test_spec_is_compiled_once_per_backend(self):
+        self.assertIs(compile_extractor(SWAPSHOP, "bs4"), compile_extractor(SWAPSHOP, "bs4"))
+
+    def test_extracts_new_marketplace_on_every_backend(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                listings = compile_extractor(SWAPSHOP, backend)(SWAPSHOP_PAGE)
+                self.assertEqual(
+                    [listing.to_dict() for listing in listings],
+                    [
+                        {"title": "Old Camera", "price": 1250.5, "url": "https://swapshop.example/l/1"},
+                        {"title": "Tripod", "price": None, "url": "https://swapshop.example/l/2"},
+                    ],
+                )
+
+    def test_relative_links_use_given_base_url(self):
+        listings = compile_extractor(SWAPSHOP)(SWAPSHOP_PAGE, "http://mirror")
+        self.assertEqual(listings[0].url, "http://mirror/l/1")
+
+    def test_relative_links_resolved_for_every_marketplace(self):
+        pages = {
+            "ebay": '<li class="s-item"><a class="s-item__link" href="/itm/2">'
+            '<h3 class="s-item__title">Lens</h3></a></li>',
+            "craigslist": '<li class="result-row"><a class="result-title" href="/2">Tent</a></li>',
+            "aliexpress": '<a href="/i/3" title="Case" target="_blank"><span class="price">$1</span></a>',
+        }
+        for market, html in pages.items():
+            for backend in BACKENDS:
+                with self.subTest(market=market, backend=backend):
+                    url = PARSER_BACKENDS[backend][market](html)[0].url
+                    self.assertTrue(url.startswith(MARKETPLACE_SPECS[market].base_url + "/"))
+
+    def test_relative_links_can_be_kept(self):
+        spec = SWAPSHOP._replace(name="swapshop-raw", absolute_links=False)
+        self.assertEqual(compile_extractor(spec)(SWAPSHOP_PAGE)[0].url, "/l/1")
+
+    def test_extractors_pickle_by_spec(self):
+        for backend in BACKENDS:
+            extractor = compile_extractor(SWAPSHOP, backend)
+            self.assertIs(pickle.loads(pickle.dumps(extractor)), extractor)
+
+
+@pytest.fixture
+def swapshop():
+    register_marketplace(SWAPSHOP)
+    yield SWAPSHOP
+    for registry in (MARKETPLACE_SPECS, MARKETPLACE_BASE_URLS, *PARSER_BACKENDS.values()):
+        registry.pop(SWAPSHOP.name)
+
+
+@pytest.mark.asyncio
+async def test_registered_spec_is_scanned_without_query_method(swapshop):
+    requests = []
+
+    async def handler(request):
+        requests.append(request.query["q"])
+        return web.Response(text=SWAPSHOP_PAGE, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/find", handler)
+    server = TestServer(app)
+    await server.start_server()
+    base_url = str(server.make_url("")).rstrip("/")
+    engine = ArbitrageEngine(
+        search_terms=["camera"],
+        marketplaces=["swapshop"],
+        base_urls={"swapshop": base_url},
+        parse_executor=None,
+    )
+    try:
+        listings = await engine.fetch_listings()
+    finally:
+        await server.close()
+
+    assert requests == ["camera"]
+    assert [listing.title for listing in listings] == ["Old Camera", "Tripod"]
+    assert listings[0].url == f"{base_url}/l/1"
+    assert "swapshop" in ArbitrageEngine(search_terms=[]).marketplaces
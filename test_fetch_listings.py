@@ -42,3 +42,122 @@ async def test_fetch_listings_combines_results(monkeypatch):
         + expected_mercari
     ):
         assert listing in listings
+
+
+@pytest.mark.asyncio
+async def test_run_reuses_pooled_session(monkeypatch):
+    engine = ArbitrageEngine(search_terms=[], refresh_interval=0, marketplaces=["ebay"])
+    sessions = []
+
+    async def fake_ebay(self, session):
+        sessions.append(session)
+        return []
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", fake_ebay)
+
+    await engine.run(iterations=3)
+
+    assert len(sessions) == 3
+    assert all(session is sessions[0] for session in sessions)
+    assert sessions[0].closed
+    assert engine._session is None
+
+
+@pytest.mark.asyncio
+async def test_pooled_session_connector_settings():
+    engine = ArbitrageEngine(
+        search_terms=[], connection_limit=20, connection_limit_per_host=4
+    )
+    async with engine:
+        session = await engine.open_session()
+        assert session.connector.limit == 20
+        assert session.connector.limit_per_host == 4
+    assert session.closed
+
+
+EBAY_HTML = (
+    '<ul><li class="s-item">'
+    '<a class="s-item__link" href="https://www.ebay.com/itm/1">'
+    '<h3 class="s-item__title">Camera</h3></a>'
+    '<span class="s-item__price">$99.00</span>'
+    '</li></ul>'
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", [None, "thread", "process"])
+async def test_query_parses_on_executor(monkeypatch, executor):
+    engine = ArbitrageEngine(search_terms=["camera"], parse_executor=executor, parse_workers=1)
+
+    async def fake_get(self, url, session, timeout=5, market=None):
+        return EBAY_HTML
+
+    monkeypatch.setattr(ArbitrageEngine, "_async_get", fake_get)
+
+    try:
+        listings = await engine.query_ebay(session=None)
+    finally:
+        await engine.close()
+
+    assert listings == [
+        {"title": "Camera", "price": 99.0, "url": "https://www.ebay.com/itm/1"}
+    ]
+    assert engine._parse_pool is None
+
+
+def test_unknown_parse_executor_rejected():
+    with pytest.raises(ValueError):
+        ArbitrageEngine(search_terms=[], parse_executor="gpu")
+
+
+@pytest.mark.asyncio
+async def test_stream_listings_yields_fast_marketplace_first(monkeypatch):
+    import asyncio
+
+    async def slow_ebay(self, session):
+        await asyncio.sleep(0.05)
+        return [{"title": "slow", "price": 1.0, "url": "https://e/1"}]
+
+    async def fast_mercari(self, session):
+        return [{"title": "fast", "price": 1.0, "url": "https://m/1"}]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", slow_ebay)
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", fast_mercari)
+    engine = ArbitrageEngine(search_terms=[], marketplaces=["ebay", "mercari"])
+
+    batches = [batch async for batch in engine.stream_listings(session=object())]
+
+    assert [[l["title"] for l in batch] for batch in batches] == [["fast"], ["slow"]]
+
+
+@pytest.mark.asyncio
+async def test_scan_alerts_before_slow_marketplace_finishes(monkeypatch):
+    import asyncio
+
+    release = asyncio.Event()
+    alerts = []
+
+    async def slow_ebay(self, session):
+        await release.wait()
+        return []
+
+    async def fast_mercari(self, session):
+        return [{"title": "fast", "price": 1.0, "url": "https://m/1"}]
+
+    def on_alert(listing, price):
+        alerts.append(listing["title"])
+        release.set()
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", slow_ebay)
+    monkeypatch.setattr(ArbitrageEngine, "query_mercari", fast_mercari)
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay", "mercari"],
+        deal_threshold=0.9,
+        alert_callback=on_alert,
+    )
+
+    deals = await asyncio.wait_for(engine.scan(), timeout=1)
+
+    assert deals == 1
+    assert alerts == ["fast"]
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, HistoryRecord, Listing, ListingHistory
+
+
+class ListingHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "history.db")
+        self.history = ListingHistory(self.path)
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp.cleanup()
+
+    def test_price_history_of_one_listing(self):
+        for day, price in enumerate((100, 90, 80)):
+            self.history.record(
+                [{"title": "lens", "price": price, "url": "https://www.ebay.com/itm/1?ref=x"}],
+                "ebay",
+                "lens",
+                now=day,
+            )
+        self.assertEqual(
+            self.history.price_history("https://www.ebay.com/itm/1/"), [(0, 100), (1, 90), (2, 80)]
+        )
+        self.assertEqual(self.history.price_history("https://www.ebay.com/itm/1", since=1, until=2), [(1, 90)])
+
+    def test_time_window_per_query_and_marketplace(self):
+        self.history.record([Listing("phone", 5, "https://a/1", query="phone")], "ebay", now=10)
+        self.history.record([Listing("lens", 7, "https://b/1")], "mercari", "lens", now=20)
+        self.history.record([Listing("phone", 6, "https://c/1", "mercari")], "ebay", "phone", now=30)
+        self.assertEqual(
+            self.history.listings(since=0, until=100, query="phone"),
+            [
+                HistoryRecord(10, "ebay", "phone", "https://a/1", "phone", 5, None),
+                HistoryRecord(30, "mercari", "phone", "https://c/1", "phone", 6, None),
+            ],
+        )
+        self.assertEqual([r.seen_at for r in self.history.listings(marketplace="mercari")], [20, 30])
+        self.assertEqual([r.seen_at for r in self.history.listings(since=15, until=30)], [20])
+        self.assertEqual(len(self.history), 3)
+
+    def test_rows_are_written_off_the_calling_thread(self):
+        threads = []
+        original = self.history._write
+
+        def write(rows):
+            threads.append(threading.current_thread())
+            original(rows)
+
+        self.history._write = write
+        self.history.batch_size = 2
+        self.history.record([Listing("a", 1, "https://a/1"), Listing("b", 2, "https://a/2")], "ebay")
+        self.history.flush()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_history_survives_reopening(self):
+        self.history.record([Listing("a", 1, "https://a/1")], "ebay", "a", now=1)
+        self.history.close()
+        self.history = ListingHistory(self.path)
+        self.assertEqual(self.history.price_history("https://a/1"), [(1, 1)])
+
+    def test_buffer_is_flushed_by_size(self):
+        self.history.batch_size = 3
+        self.history.record([Listing(str(i), i, f"https://a/{i}") for i in range(2)], "ebay")
+        self.assertEqual(len(self.history._buffer), 2)
+        self.history.record([Listing("2", 2, "https://a/2")], "ebay")
+        self.assertEqual(self.history._buffer, [])
+
+    def test_failed_background_writes_are_counted_and_raised(self):
+        import sqlite3
+        from unittest import mock
+
+        self.history.batch_size = 2
+        with mock.patch.object(self.history, "_write", side_effect=sqlite3.OperationalError("full")):
+            self.history.record([Listing(str(i), i, f"https://a/{i}") for i in range(2)], "ebay")
+            # Wait for the write without collecting its outcome
+            self.history._pending[0][0].exception()
+            self.history.flush(wait=False)
+        self.assertEqual(self.history.failures, 2)
+        with self.assertRaisesRegex(sqlite3.OperationalError, "full"):
+            self.history.flush()
+        self.history.record([Listing("2", 2, "https://a/2")], "ebay")
+        self.history.flush()
+        self.assertEqual(len(self.history), 1)
+
+
+@pytest.mark.asyncio
+async def test_run_records_every_scanned_listing(monkeypatch, tmp_path):
+    async def fake_ebay(self, session):
+        return [{"title": "lens", "price": 50, "url": "https://www.ebay.com/itm/1"}]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", fake_ebay)
+    history = ListingHistory(tmp_path / "history.db")
+    engine = ArbitrageEngine(
+        search_terms=["camera", "lens"],
+        marketplaces=["ebay"],
+        refresh_interval=0,
+        history=history,
+    )
+    await engine.run(iterations=2)
+    records = history.listings(query="camera lens")
+    history.close()
+    assert [(r.marketplace, r.url, r.price) for r in records] == [
+        ("ebay", "https://www.ebay.com/itm/1", 50)
+    ] * 2
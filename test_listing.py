@@ -0,0 +1,48 @@
+import pickle
+import unittest
+
+from ArbitrageEngine import ArbitrageEngine, Listing
+
+
+class ListingTest(unittest.TestCase):
+    def test_compares_equal_to_dict_and_supports_lookup(self):
+        listing = Listing("Camera", 10.0, "https://e/1")
+        self.assertEqual(listing, {"title": "Camera", "price": 10.0, "url": "https://e/1"})
+        self.assertEqual(listing["title"], "Camera")
+        self.assertIsNone(listing.get("query"))
+        self.assertEqual(listing.get("missing", 1), 1)
+        with self.assertRaises(KeyError):
+            listing["missing"]
+
+    def test_round_trips_through_dict_and_pickle(self):
+        listing = Listing("Camera", 10.0, "https://e/1", "ebay", "camera", 30.0, "photo")
+        self.assertEqual(listing.to_dict()["category"], "photo")
+        self.assertEqual(Listing.from_dict(listing.to_dict()), listing)
+        self.assertEqual(pickle.loads(pickle.dumps(listing)), listing)
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(Listing("x"), "__dict__"))
+
+    def test_market_value_drives_prediction(self):
+        engine = ArbitrageEngine(search_terms=[])
+        listings = [
+            Listing("cheap", 50, "https://e/1", market_value=200),
+            Listing("fair", 100, "https://e/2"),
+            {"title": "dict input", "price": 10, "market_value": 100},
+        ]
+        deals = list(engine.evaluate_deals(listings))
+        self.assertEqual([(d[0]["title"], d[1]) for d in deals], [("cheap", 200), ("dict input", 100)])
+        self.assertEqual(
+            [(d[0]["title"], d[1]) for d in engine.evaluate_deals_batch(listings * 100)][:2],
+            [("cheap", 200), ("dict input", 100)],
+        )
+
+    def test_parsers_emit_listing_records(self):
+        engine = ArbitrageEngine(search_terms=[])
+        html = '<a href="/marketplace/item/1"><span>Lamp</span><span>$5</span></a>'
+        (listing,) = engine.parse_facebook(html, base_url="https://www.facebook.com")
+        self.assertIsInstance(listing, Listing)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import unittest
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from ArbitrageEngine import ArbitrageEngine, MetricsCollector, metrics_app
+from test_parsers import EBAY_HTML
+
+
+class MetricsCollectorTest(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        collector = MetricsCollector(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.7, 3):
+            collector.observe("fetch", "ebay", seconds)
+        stage = collector.snapshot()["stages"]["fetch"]["ebay"]
+        self.assertEqual(stage["buckets"], {"0.1": 1, "1.0": 3, "+Inf": 4})
+        self.assertEqual(stage["count"], 4)
+        self.assertAlmostEqual(stage["sum"], 4.25)
+
+    def test_prometheus_text(self):
+        collector = MetricsCollector(buckets=(1.0,))
+        collector.observe("parse", "ebay", 0.5)
+        collector.increment("deals", "ebay", 2)
+        text = collector.to_prometheus()
+        self.assertIn('arbitrage_stage_duration_seconds_bucket{stage="parse",marketplace="ebay",le="1.0"} 1', text)
+        self.assertIn('arbitrage_stage_duration_seconds_count{stage="parse",marketplace="ebay"} 1', text)
+        self.assertIn("# TYPE arbitrage_deals_total counter", text)
+        self.assertIn('arbitrage_deals_total{marketplace="ebay"} 2', text)
+
+    def test_hooks_receive_measurements(self):
+        collector = MetricsCollector()
+        seen = []
+        collector.add_hook(lambda *event: seen.append(event))
+        collector.observe("fetch", "ebay", 0.1)
+        collector.increment("retries", "ebay")
+        self.assertEqual(seen, [("observe", "fetch", "ebay", 0.1), ("increment", "retries", "ebay", 1)])
+
+    def test_snapshot_is_json_serializable(self):
+        collector = MetricsCollector()
+        collector.observe("evaluate", None, 0.01)
+        collector.increment("listings", "ebay", 10)
+        snapshot = json.loads(json.dumps(collector.snapshot()))
+        self.assertEqual(snapshot["counters"]["listings"]["ebay"], 10)
+        self.assertGreater(snapshot["rates"]["listings_per_second"], 0)
+
+
+@pytest.mark.asyncio
+async def test_scan_records_stage_metrics(monkeypatch):
+    async def fake_get(self, url, session, timeout=5, market=None):
+        self.metrics.increment("bytes_fetched", market, len(EBAY_HTML))
+        return EBAY_HTML
+
+    monkeypatch.setattr(ArbitrageEngine, "_async_get", fake_get)
+    engine = ArbitrageEngine(search_terms=["camera"], marketplaces=["ebay"], parse_executor=None)
+
+    await engine.scan()
+    await engine.close()
+
+    metrics = engine.metrics
+    snapshot = metrics.snapshot()
+    assert set(snapshot["stages"]) == {"fetch", "parse", "evaluate"}
+    assert metrics.counter("listings", "ebay") == 1
+    assert metrics.counter("scans", "ebay") == 1
+    assert metrics.counter("bytes_fetched", "ebay") == len(EBAY_HTML)
+
+
+@pytest.mark.asyncio
+async def test_failed_query_is_counted(monkeypatch):
+    async def broken(self, session):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", broken)
+    engine = ArbitrageEngine(search_terms=[], marketplaces=["ebay"])
+
+    await engine.fetch_listings(session=object())
+
+    assert engine.metrics.counter("query_failures", "ebay") == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    collector = MetricsCollector()
+    collector.increment("deals", "ebay")
+    async with TestClient(TestServer(metrics_app(collector))) as client:
+        text = await (await client.get("/metrics")).text()
+        snapshot = await (await client.get("/metrics.json")).json()
+    assert 'arbitrage_deals_total{marketplace="ebay"} 1' in text
+    assert snapshot["counters"]["deals"]["ebay"] == 1
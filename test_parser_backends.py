@@ -0,0 +1,73 @@
+import importlib.util
+import unittest
+
+from ArbitrageEngine import ArbitrageEngine, PARSER_BACKENDS
+from test_parsers import FIXTURES
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+
+# Pages that exercise the edge cases of each extraction rule.
+EDGE_CASES = {
+    "facebook": [
+        '<a href="https://www.facebook.com/marketplace/item/9" title="Desk">'
+        "<span>$1,020</span></a>"
+        '<a href="/groups/1">Not a listing $5</a>'
+        '<a href="/marketplace/item/10"><span>$ free</span><span> Lamp </span></a>',
+        "",
+    ],
+    "ebay": [
+        '<li class="s-item s-item--large"><a class="s-item__link" href="/itm/2">'
+        '<h3 class="s-item__title"><span>New</span> Lens</h3></a></li>'
+        '<li class="s-item"><h3 class="s-item__title">No link</h3></li>',
+    ],
+    "craigslist": ['<li class="result-row"><a class="result-title" href="/2">Tent</a></li>'],
+    "aliexpress": [
+        '<a href="/i/3" title="Case" target="_blank"><span class="price">$0.99</span></a>'
+        '<a href="/i/4" title="Strap" target="_blank"></a>',
+    ],
+    "mercari": [
+        '<li data-testid="ItemCell"><a href="https://www.mercari.com/item/m2/">'
+        '<p data-testid="ItemCell__name">Watch</p></a></li>'
+        '<li data-testid="ItemCell"><p data-testid="ItemCell__name">No link</p></li>',
+    ],
+}
+
+
+@unittest.skipUnless(HAS_LXML, "lxml is not installed")
+class ParserBackendParityTest(unittest.TestCase):
+    def assert_parity(self, market, html):
+        args = (html, "https://www.facebook.com") if market == "facebook" else (html,)
+        expected = PARSER_BACKENDS["bs4"][market](*args)
+        actual = PARSER_BACKENDS["lxml"][market](*args)
+        self.assertEqual(actual, expected)
+
+    def test_backends_cover_same_marketplaces(self):
+        self.assertEqual(set(PARSER_BACKENDS["lxml"]), set(PARSER_BACKENDS["bs4"]))
+
+    def test_fixture_parity(self):
+        for market, pages in FIXTURES.items():
+            for html in pages:
+                with self.subTest(market=market):
+                    self.assert_parity(market, html)
+
+    def test_edge_case_parity(self):
+        for market, pages in EDGE_CASES.items():
+            for html in pages:
+                with self.subTest(market=market, html=html):
+                    self.assert_parity(market, html)
+
+    def test_engine_uses_selected_backend(self):
+        engine = ArbitrageEngine(search_terms=[], parser_backend="lxml")
+        self.assertIs(engine._parsers, PARSER_BACKENDS["lxml"])
+        listings = engine.parse_mercari(FIXTURES["mercari"][0])
+        self.assertEqual(listings[0]["url"], "https://www.mercari.com/item/m1/")
+
+
+class ParserBackendConfigTest(unittest.TestCase):
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            ArbitrageEngine(search_terms=[], parser_backend="regex")
+
+
+if __name__ == "__main__":
+    unittest.main()
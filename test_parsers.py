@@ -1,21 +1,75 @@
 import unittest
 from ArbitrageEngine import ArbitrageEngine
 
+FACEBOOK_HTML = (
+    '<div><a href="/marketplace/item/123">'
+    '<div class="title">Old Phone</div>'
+    '<span>$50</span>'
+    '</a></div>'
+)
+
+EBAY_HTML = (
+    '<ul><li class="s-item">'
+    '<a class="s-item__link" href="https://www.ebay.com/itm/1">'
+    '<h3 class="s-item__title">Camera</h3></a>'
+    '<span class="s-item__price">$1,250.00</span>'
+    '</li></ul>'
+)
+
+CRAIGSLIST_HTML = (
+    '<ul><li class="result-row">'
+    '<a class="result-title hdrlnk" href="https://sfbay.craigslist.org/1.html">'
+    ' Road Bike </a>'
+    '<span class="result-meta"><span class="result-price">$300</span></span>'
+    '</li>'
+    '<li class="result-row"><span class="result-price">$5</span></li></ul>'
+)
+
+ALIEXPRESS_HTML = (
+    '<div class="list">'
+    '<a href="https://www.aliexpress.com/item/1.html" title="USB Cable" target="_blank">'
+    '<img src="x.jpg"></a>'
+    '<div><span class="multi--price-sale">US $3.99</span></div>'
+    '<a href="https://www.aliexpress.com/item/2.html" title="" target="_blank"></a>'
+    '</div>'
+)
+
+MERCARI_HTML = (
+    '<ul><li data-testid="ItemCell"><a href="/item/m1/">'
+    '<p data-testid="ItemCell__name">Switch Console</p>'
+    '<p data-testid="ItemCell__price">$180</p>'
+    '</a></li></ul>'
+)
+
+# Fixtures per marketplace, used by the parser backend parity tests.
+FIXTURES = {
+    "facebook": [FACEBOOK_HTML],
+    "ebay": [EBAY_HTML],
+    "craigslist": [CRAIGSLIST_HTML],
+    "aliexpress": [ALIEXPRESS_HTML],
+    "mercari": [MERCARI_HTML],
+}
+
+
 class FacebookParserTest(unittest.TestCase):
     def test_parse_facebook_basic(self):
-        html = (
-            '<div><a href="/marketplace/item/123">'
-            '<div class="title">Old Phone</div>'
-            '<span>$50</span>'
-            '</a></div>'
-        )
         engine = ArbitrageEngine(search_terms=[])
-        listings = engine.parse_facebook(html, base_url="https://www.facebook.com")
+        listings = engine.parse_facebook(FACEBOOK_HTML, base_url="https://www.facebook.com")
         self.assertEqual(len(listings), 1)
         listing = listings[0]
         self.assertEqual(listing["title"], "Old Phone")
         self.assertEqual(listing["price"], 50.0)
         self.assertEqual(listing["url"], "https://www.facebook.com/marketplace/item/123")
 
+
+class EbayParserTest(unittest.TestCase):
+    def test_parse_ebay_basic(self):
+        engine = ArbitrageEngine(search_terms=[])
+        listings = engine.parse_ebay(EBAY_HTML)
+        self.assertEqual(
+            listings,
+            [{"title": "Camera", "price": 1250.0, "url": "https://www.ebay.com/itm/1"}],
+        )
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,185 @@
+import importlib.util
+import unittest
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import PARSER_BACKENDS, ArbitrageEngine, css_to_xpath, page_encoding
+from benchmarks.fixtures import MARKETPLACES, build_page, build_pages
+from benchmarks.mock_server import base_urls, create_app
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+BACKENDS = [backend for backend in PARSER_BACKENDS if backend != "lxml" or HAS_LXML]
+
+
+def chunks(text, size=4096):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class ListingLimitTest(unittest.TestCase):
+    def test_limit_keeps_first_listings(self):
+        for backend in BACKENDS:
+            for market in MARKETPLACES:
+                with self.subTest(backend=backend, market=market):
+                    parser = PARSER_BACKENDS[backend][market]
+                    page = build_page(market, items=10, padding_kb=1)
+                    self.assertEqual(parser(page, None, 4), parser(page)[:4])
+
+
+@unittest.skipUnless(HAS_LXML, "lxml is not installed")
+class LxmlPageStreamTest(unittest.TestCase):
+    def test_stream_matches_full_parse(self):
+        for market in MARKETPLACES:
+            with self.subTest(market=market):
+                parser = PARSER_BACKENDS["lxml"][market]
+                page = build_page(market, items=25, padding_kb=4)
+                stream = parser.stream()
+                self.assertFalse(any([stream.feed(chunk) for chunk in chunks(page)]))
+                self.assertEqual(stream.close(), parser(page))
+
+    def test_stream_is_done_once_limit_items_arrived(self):
+        for market in MARKETPLACES:
+            with self.subTest(market=market):
+                parser = PARSER_BACKENDS["lxml"][market]
+                page = build_page(market, items=200, padding_kb=4)
+                stream = parser.stream(limit=5)
+                fed = 0
+                for chunk in chunks(page):
+                    fed += len(chunk)
+                    if stream.feed(chunk):
+                        break
+                self.assertLess(fed, len(page))
+                self.assertEqual(stream.close(), parser(page)[:5])
+
+    def test_tree_keeps_only_result_items(self):
+        import lxml.html
+
+        for market in MARKETPLACES:
+            with self.subTest(market=market):
+                parser = PARSER_BACKENDS["lxml"][market].compile()
+                page = build_page(market, items=30, padding_kb=16)
+                spec = parser.spec
+                item = css_to_xpath(spec.items)
+                outside = f"//*[not(ancestor-or-self::{item}) and not(descendant::{item})"
+                if spec.price_following:
+                    # Prices following their item are kept with what holds them
+                    price = css_to_xpath(spec.price)
+                    holder = f"*[descendant-or-self::{price}][not(descendant::{item})]"
+                    outside += f" and not(ancestor-or-self::{holder})"
+                for limit in (None, 5):
+                    stream = parser.stream(limit=limit)
+                    for chunk in chunks(page):
+                        if stream.feed(chunk):
+                            break
+                    root = stream.root()
+                    self.assertEqual(root.xpath(outside + "]"), [])
+                    self.assertEqual(root.xpath("//script | //style"), [])
+                self.assertEqual(
+                    len(parser._items(parser._root(page))),
+                    len(parser._items(lxml.html.fromstring(page))),
+                )
+
+    def test_reset_discards_partial_page(self):
+        parser = PARSER_BACKENDS["lxml"]["ebay"]
+        page = build_page("ebay", items=3, padding_kb=1)
+        stream = parser.stream()
+        stream.feed(page[: len(page) // 2])
+        stream.reset()
+        stream.feed(page)
+        self.assertEqual(stream.close(), parser(page))
+
+    def test_empty_stream(self):
+        stream = PARSER_BACKENDS["lxml"]["ebay"].stream(limit=5)
+        stream.feed("  ")
+        self.assertEqual(stream.close(), [])
+
+
+class PageEncodingTest(unittest.TestCase):
+    def test_header_then_meta_then_utf8(self):
+        head = b'<html><head><meta charset="ISO-8859-1"><title>'
+        self.assertEqual(page_encoding("windows-1252", head), "cp1252")
+        self.assertEqual(page_encoding(None, head), "iso8859-1")
+        http_equiv = b'<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">'
+        self.assertEqual(page_encoding(None, http_equiv), "koi8-r")
+        self.assertEqual(page_encoding("bogus", b"<meta charset=nonsense>"), "utf-8")
+        self.assertEqual(page_encoding(None, b"<html>"), "utf-8")
+
+
+async def _scan(backend, **kwargs):
+    server = TestServer(create_app(build_pages(items=200, padding_kb=64)))
+    await server.start_server()
+    try:
+        engine = ArbitrageEngine(
+            search_terms=["phone"],
+            marketplaces=["ebay"],
+            base_urls=base_urls(str(server.make_url("/"))),
+            parser_backend=backend,
+            response_cache=False,
+            **kwargs,
+        )
+        async with engine:
+            listings = await engine.fetch_listings()
+    finally:
+        await server.close()
+    return listings, engine.metrics
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_max_listings_caps_each_page(backend):
+    listings, metrics = await _scan(backend, max_listings=7)
+    page = build_page("ebay", items=200, padding_kb=64)
+    assert [listing.url for listing in listings] == [
+        listing.url for listing in PARSER_BACKENDS["bs4"]["ebay"](page)[:7]
+    ]
+    if backend == "lxml":
+        assert metrics.counter("truncated_pages", "ebay") == 1
+        assert metrics.counter("bytes_fetched", "ebay") < len(page)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_max_page_bytes_stops_download(backend):
+    page = build_page("ebay", items=200, padding_kb=64)
+    cap = page.index("</main>") // 2
+    listings, metrics = await _scan(backend, max_page_bytes=cap)
+    assert 0 < len(listings) < 200
+    assert metrics.counter("bytes_fetched", "ebay") == cap
+    assert metrics.counter("truncated_pages", "ebay") == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("limits", [{}, {"max_page_bytes": 100_000}, {"max_listings": 5}])
+@pytest.mark.parametrize("meta", ["", '<meta charset="iso-8859-1">'])
+async def test_pages_without_charset_header(backend, limits, meta):
+    page = build_page("ebay", items=30, padding_kb=4).replace("<meta charset='utf-8'>", meta, 1)
+    page = page.replace("</h3>", " caf\u00e9</h3>", 1)
+    body = page.encode("latin-1" if meta else "utf-8")
+
+    async def handler(request):
+        return web.Response(body=body, headers={"Content-Type": "text/html"})
+
+    app = web.Application()
+    app.router.add_get("/sch/i.html", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        engine = ArbitrageEngine(
+            search_terms=["phone"],
+            marketplaces=["ebay"],
+            base_urls={"ebay": str(server.make_url("")).rstrip("/")},
+            parser_backend=backend,
+            response_cache=False,
+            **limits,
+        )
+        async with engine:
+            listings = await engine.fetch_listings()
+    finally:
+        await server.close()
+    expected = PARSER_BACKENDS["bs4"]["ebay"](page)[: limits.get("max_listings")]
+    assert len(expected) == (5 if limits.get("max_listings") else 30)
+    assert [listing.to_dict() for listing in listings] == [listing.to_dict() for listing in expected]
+    assert "caf\u00e9" in listings[0].title
+    assert engine.metrics.counter("query_failures", "ebay") == 0
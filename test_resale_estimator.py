@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from ArbitrageEngine import (
+    VECTORIZE_MIN_LISTINGS,
+    ArbitrageEngine,
+    Listing,
+    ResaleEstimator,
+    SoldPriceModel,
+    estimate_key,
+    title_keywords,
+)
+
+SOLD = [
+    ("Apple iPhone 12 64GB", 300),
+    ("iPhone 12 Pro", 400),
+    ("apple iphone 12", 350),
+    ("Nintendo Switch console", 200),
+    ("Switch console with games", 240),
+    ("nintendo switch", 220),
+    ("Phone case", 10),
+    ("phone case red", 12),
+    ("Case for phone", 8),
+]
+
+
+class CountingModel(SoldPriceModel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def predict_batch(self, keys):
+        self.calls.append(list(keys))
+        return super().predict_batch(keys)
+
+
+class TitleKeyTest(unittest.TestCase):
+    def test_keywords_ignore_case_order_punctuation_and_stopwords(self):
+        self.assertEqual(title_keywords("The iPhone-12, Pro!"), ("12", "iphone", "pro"))
+        self.assertEqual(title_keywords("pro iphone 12"), title_keywords("The iPhone-12, Pro!"))
+        self.assertEqual(title_keywords(None), ())
+
+    def test_estimate_key_includes_category(self):
+        self.assertEqual(
+            estimate_key({"title": "Switch", "category": "games"}), ("games", ("switch",))
+        )
+        self.assertEqual(estimate_key(Listing("Switch")), (None, ("switch",)))
+        self.assertEqual(estimate_key(Listing("Switch", category="games")), ("games", ("switch",)))
+
+
+class SoldPriceModelTest(unittest.TestCase):
+    def setUp(self):
+        self.model = SoldPriceModel(SOLD)
+
+    def test_median_of_most_specific_keyword(self):
+        # "iphone" and "12" were sold three times each; "pro" only once
+        self.assertEqual(self.model.predict(estimate_key({"title": "iphone 12 pro max"})), 350)
+        # "iphone" alone is no longer the rarest match once "case" is known
+        self.assertEqual(self.model.predict(estimate_key({"title": "iphone case"})), 10)
+
+    def test_unknown_title(self):
+        self.assertIsNone(self.model.predict(estimate_key({"title": "bicycle"})))
+
+    def test_quantile(self):
+        model = SoldPriceModel(SOLD, quantile=0.0)
+        self.assertEqual(model.predict(estimate_key({"title": "nintendo switch"})), 200)
+
+    def test_category_is_preferred(self):
+        model = SoldPriceModel(
+            [("lens", 100, "camera")] * 3 + [("lens", 5, "glasses")] * 3, min_samples=3
+        )
+        self.assertEqual(model.predict(("camera", ("lens",))), 100)
+        self.assertEqual(model.predict(("glasses", ("lens",))), 5)
+        self.assertEqual(model.predict(("toys", ("lens",))), 52.5)
+
+    def test_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sold.csv")
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write("title,price,category\n")
+                for title, price in SOLD:
+                    handle.write(f'"{title}",{price},\n')
+            model = SoldPriceModel.from_csv(path)
+        self.assertEqual(model.predict(estimate_key({"title": "nintendo switch"})), 220)
+
+
+class ResaleEstimatorTest(unittest.TestCase):
+    def test_repeated_titles_hit_the_cache(self):
+        model = CountingModel(SOLD)
+        estimator = ResaleEstimator(model)
+        listings = [{"title": "Nintendo Switch"}, {"title": "switch, nintendo"}, {"title": "bike"}]
+        self.assertEqual(estimator.estimate_batch(listings), [220, 220, None])
+        self.assertEqual(estimator.estimate_batch(listings), [220, 220, None])
+        self.assertEqual(len(model.calls), 1)
+        self.assertEqual(len(model.calls[0]), 2)
+        self.assertEqual((estimator.hits, estimator.misses), (2, 2))
+
+    def test_ttl_and_lru_eviction(self):
+        model = CountingModel(SOLD)
+        estimator = ResaleEstimator(model, max_entries=1, ttl=None)
+        estimator.estimate({"title": "switch"})
+        estimator.estimate({"title": "iphone"})
+        self.assertEqual(len(estimator), 1)
+        estimator.estimate({"title": "switch"})
+        self.assertEqual(len(model.calls), 3)
+
+        expiring = ResaleEstimator(model, ttl=-1)
+        expiring.estimate({"title": "switch"})
+        expiring.estimate({"title": "switch"})
+        self.assertEqual(expiring.hits, 0)
+
+
+class EngineEstimatorTest(unittest.TestCase):
+    def make_engine(self):
+        self.model = CountingModel(SOLD)
+        return ArbitrageEngine(search_terms=[], resale_estimator=ResaleEstimator(self.model))
+
+    def test_predict_prefers_market_value_then_estimate_then_heuristic(self):
+        engine = self.make_engine()
+        self.assertEqual(engine.predict_resale_value({"title": "switch", "price": 1, "market_value": 5}), 5)
+        self.assertEqual(engine.predict_resale_value({"title": "switch", "price": 1}), 220)
+        self.assertEqual(engine.predict_resale_value({"title": "bike", "price": 10}), 15)
+
+    def test_batch_evaluation_uses_one_model_call(self):
+        for count in (3, VECTORIZE_MIN_LISTINGS + 1):
+            with self.subTest(count=count):
+                engine = self.make_engine()
+                listings = [Listing(f"Nintendo Switch {i % 2}", 50, f"u{i}") for i in range(count)]
+                listings.append(Listing("bike", 10, "bike"))
+                found = engine.evaluate_deals_batch(listings)
+                self.assertEqual(len(found), count)
+                self.assertTrue(all(price == 220 for _, price in found))
+                self.assertEqual(len(self.model.calls), 1)
+                self.assertEqual(found, list(engine.evaluate_deals(listings)))
+
+
+
+@pytest.mark.asyncio
+async def test_scanned_listings_are_valued_in_their_category(monkeypatch):
+    async def query_ebay(self, session, terms=None):
+        return [{"title": "Lens", "price": 40, "url": f"https://e/{terms[0]}"}]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", query_ebay)
+    model = SoldPriceModel([("lens", 100, "camera")] * 3 + [("lens", 5, "glasses")] * 3)
+    engine = ArbitrageEngine(
+        search_terms=["camera lens", "glasses lens"],
+        marketplaces=["ebay"],
+        query_groups=["camera lens", "glasses lens"],
+        categories={"camera lens": "camera", None: "glasses"},
+        resale_estimator=ResaleEstimator(model),
+    )
+    listings = await engine.fetch_listings()
+    assert sorted(listing.category for listing in listings) == ["camera", "glasses"]
+    deals = engine.evaluate_deals_batch(listings)
+    assert [(deal.query, price) for deal, price in deals] == [("camera lens", 100)]
+
+
+if __name__ == "__main__":
+    unittest.main()
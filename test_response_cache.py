@@ -0,0 +1,127 @@
+import unittest
+from unittest import mock
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import ArbitrageEngine, Listing, ResponseCache
+from test_parsers import EBAY_HTML
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_lookup_requires_matching_hash(self):
+        cache = ResponseCache()
+        cache.store("u", cache.hash_body("a"), [{"title": "x"}])
+        self.assertEqual(cache.lookup("u", cache.hash_body("a")), [{"title": "x"}])
+        self.assertIsNone(cache.lookup("u", cache.hash_body("b")))
+
+    def test_lru_eviction_by_entry_count(self):
+        cache = ResponseCache(max_entries=2)
+        for url in ("a", "b"):
+            cache.store(url, b"h", [])
+        cache.lookup("a")
+        cache.store("c", b"h", [])
+        self.assertIsNotNone(cache.lookup("a"))
+        self.assertIsNone(cache.lookup("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_memory_bound_evicts_oldest(self):
+        listings = [{"title": "t" * 1000}]
+        cache = ResponseCache(max_bytes=3000)
+        cache.store("a", b"h", listings)
+        cache.store("b", b"h", listings)
+        cache.store("c", b"h", listings)
+        self.assertIsNone(cache.lookup("a"))
+        self.assertLessEqual(cache.total_bytes, 3000)
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(ttl=10)
+        with mock.patch("ArbitrageEngine.time.monotonic", return_value=100.0):
+            cache.store("u", b"h", [])
+        with mock.patch("ArbitrageEngine.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.lookup("u"))
+        self.assertEqual(len(cache), 0)
+
+    def test_conditional_headers_from_validators(self):
+        cache = ResponseCache()
+        cache.record_validators("u", '"v1"', "Wed, 01 Jan 2025 00:00:00 GMT")
+        cache.store("u", b"h", [])
+        self.assertEqual(
+            cache.conditional_headers("u"),
+            {"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"},
+        )
+
+    def test_callers_cannot_modify_cached_listings(self):
+        cache = ResponseCache()
+        parsed = [Listing("Widget", 10.0, "https://example.com/1")]
+        cache.store("u", b"h", parsed)
+        parsed[0].query = "first"
+        hit = cache.lookup("u", b"h")
+        self.assertIsNone(hit[0].query)
+        hit[0].query = "second"
+        self.assertIsNone(cache.lookup("u", b"h")[0].query)
+        self.assertEqual(hit[0].title, "Widget")
+
+    def test_hash_hit_takes_over_new_validators(self):
+        cache = ResponseCache()
+        cache.record_validators("u", '"v1"', None)
+        cache.store("u", b"h", [])
+        cache.record_validators("u", '"v2"', "Thu, 02 Jan 2025 00:00:00 GMT")
+        self.assertIsNone(cache.lookup("u", b"other"))
+        self.assertEqual(cache.conditional_headers("u"), {"If-None-Match": '"v1"'})
+        self.assertEqual(cache.lookup("u", b"h"), [])
+        self.assertEqual(
+            cache.conditional_headers("u"),
+            {"If-None-Match": '"v2"', "If-Modified-Since": "Thu, 02 Jan 2025 00:00:00 GMT"},
+        )
+
+
+@pytest.mark.asyncio
+async def test_unchanged_page_skips_parsing():
+    requests = []
+
+    async def handler(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text=EBAY_HTML, content_type="text/html", headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    parses = []
+
+    def counting_parser(html):
+        parses.append(html)
+        return [{"title": "Camera", "price": 1.0, "url": None}]
+
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        engine = ArbitrageEngine(search_terms=[], parse_executor=None)
+        url = str(server.make_url("/"))
+        first = await engine._fetch_and_parse(url, session, counting_parser)
+        second = await engine._fetch_and_parse(url, session, counting_parser)
+
+    assert first == second == [{"title": "Camera", "price": 1.0, "url": None}]
+    assert requests == [None, '"v1"']
+    assert len(parses) == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_body_without_validators_skips_parsing(monkeypatch):
+    async def fake_get(self, url, session, timeout=5, market=None):
+        return EBAY_HTML
+
+    monkeypatch.setattr(ArbitrageEngine, "_async_get", fake_get)
+    engine = ArbitrageEngine(search_terms=[], parse_executor=None)
+    parses = []
+
+    def counting_parser(html):
+        parses.append(html)
+        return []
+
+    for _ in range(3):
+        await engine._fetch_and_parse("https://example.com", None, counting_parser)
+
+    assert len(parses) == 1
+    assert engine.response_cache.hits == 2
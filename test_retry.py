@@ -0,0 +1,167 @@
+import asyncio
+import unittest
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ArbitrageEngine import (
+    ArbitrageEngine,
+    LatencyTracker,
+    RateLimiter,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+NO_JITTER = RetryPolicy(max_attempts=3, base_delay=0.01, jitter=False)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_exponential_backoff_is_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+        self.assertEqual([policy.backoff(n) for n in range(1, 5)], [1, 2, 4, 5])
+
+    def test_jitter_stays_within_nominal_delay(self):
+        policy = RetryPolicy(base_delay=1)
+        for _ in range(50):
+            self.assertTrue(0 <= policy.backoff(3) <= 4)
+
+    def test_retry_after_overrides_backoff(self):
+        self.assertEqual(NO_JITTER.backoff(1, retry_after=2.5), 2.5)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class LatencyTrackerTest(unittest.TestCase):
+    def test_timeout_follows_observed_latency(self):
+        tracker = LatencyTracker(initial=5, minimum=0.5, maximum=30)
+        self.assertEqual(tracker.timeout, 5)
+        for _ in range(50):
+            tracker.observe(0.2)
+        self.assertAlmostEqual(tracker.timeout, 0.5, places=2)
+        tracker.observe(10)
+        self.assertGreater(tracker.timeout, 5)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_penalize_and_reward():
+    limiter = RateLimiter(rate=10)
+    limiter.penalize()
+    limiter.penalize()
+    assert limiter.rate == 2.5
+    for _ in range(20):
+        limiter.reward()
+    assert limiter.rate == 10
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_honours_pause():
+    limiter = RateLimiter()
+    loop = asyncio.get_running_loop()
+    limiter.penalize(pause=0.05)
+    start = loop.time()
+    await limiter.wait()
+    assert loop.time() - start >= 0.04
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_throttled_request_is_retried_after_retry_after():
+    calls = []
+
+    async def handler(request):
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        return web.Response(text="ok")
+
+    server = await _serve(handler)
+    engine = ArbitrageEngine(
+        search_terms=[], retry_policy=NO_JITTER, response_cache=False, rate_limits={"ebay": 100}
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            body = await engine._request(str(server.make_url("/")), session, "ebay")
+    finally:
+        await server.close()
+
+    assert body == "ok"
+    assert len(calls) == 2
+    assert engine._rate_limiters["ebay"].rate < 100
+
+
+@pytest.mark.asyncio
+async def test_persistent_failure_gives_up_and_query_returns_empty(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return web.Response(status=503)
+
+    server = await _serve(handler)
+    url = str(server.make_url("/"))
+    engine = ArbitrageEngine(search_terms=[], retry_policy=NO_JITTER, parse_executor=None)
+    try:
+        async with aiohttp.ClientSession() as session:
+            listings = await engine._fetch_and_parse(url, session, engine.parse_ebay, market="ebay")
+    finally:
+        await server.close()
+
+    assert listings == []
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return web.Response(status=404, text="gone")
+
+    server = await _serve(handler)
+    engine = ArbitrageEngine(search_terms=[], retry_policy=NO_JITTER, response_cache=False)
+    try:
+        async with aiohttp.ClientSession() as session:
+            body = await engine._request(str(server.make_url("/")), session, "ebay")
+    finally:
+        await server.close()
+
+    assert body == "gone"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_response_times_out_and_is_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(0.5)
+        return web.Response(text="ok")
+
+    server = await _serve(handler)
+    engine = ArbitrageEngine(
+        search_terms=[], retry_policy=NO_JITTER, response_cache=False, request_timeout=0.1
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            body = await engine._request(str(server.make_url("/")), session, "ebay")
+    finally:
+        await server.close()
+
+    assert body == "ok"
+    assert len(calls) == 2
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, MarketSchedule, PrioritySemaphore, ScheduledJob
+
+
+@pytest.mark.asyncio
+async def test_marketplaces_poll_at_independent_intervals(monkeypatch):
+    calls = {"facebook": 0, "aliexpress": 0}
+
+    async def fake_fb(self, session):
+        calls["facebook"] += 1
+        return []
+
+    async def fake_ali(self, session):
+        calls["aliexpress"] += 1
+        return []
+
+    monkeypatch.setattr(ArbitrageEngine, "query_facebook", fake_fb)
+    monkeypatch.setattr(ArbitrageEngine, "query_aliexpress", fake_ali)
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["facebook", "aliexpress"],
+        refresh_interval=1,
+        schedules={"facebook": MarketSchedule(interval=0.02)},
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(engine.run(), timeout=0.25)
+
+    assert calls["aliexpress"] == 1
+    assert calls["facebook"] >= 8
+    assert engine._session is None
+
+
+@pytest.mark.asyncio
+async def test_overlapping_run_is_skipped(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def slow_ebay(self, session):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return []
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", slow_ebay)
+    engine = ArbitrageEngine(search_terms=[], marketplaces=["ebay"])
+    job = ScheduledJob("ebay", None, None, interval=0.01)
+
+    await engine._run_periodic(job, iterations=3)
+    await engine.close()
+
+    assert peak == 1
+    assert job.runs == 3
+    assert job.skipped >= 3
+
+
+@pytest.mark.asyncio
+async def test_deadline_abandons_slow_scan(monkeypatch):
+    async def hanging_ebay(self, session):
+        await asyncio.sleep(10)
+        return []
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", hanging_ebay)
+    engine = ArbitrageEngine(search_terms=[], marketplaces=["ebay"])
+    job = ScheduledJob("ebay", None, None, interval=0, deadline=0.01)
+
+    await asyncio.wait_for(engine._run_periodic(job, iterations=2), timeout=1)
+    await engine.close()
+
+    assert job.failures == 2
+
+
+def test_schedule_overrides_per_query():
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay", "mercari"],
+        refresh_interval=60,
+        query_groups=["phone", "lens"],
+        schedules={
+            "ebay": MarketSchedule(interval=30, priority=1),
+            ("ebay", "lens"): MarketSchedule(interval=5, deadline=2),
+        },
+    )
+    jobs = {(job.market, job.query): job for job in engine.build_schedule()}
+    assert jobs[("ebay", "phone")].interval == 30
+    assert jobs[("ebay", "lens")].interval == 5
+    assert jobs[("ebay", "lens")].deadline == 2
+    assert jobs[("mercari", "phone")].interval == 60
+
+
+@pytest.mark.asyncio
+async def test_priority_semaphore_serves_higher_priority_first():
+    semaphore = PrioritySemaphore(1)
+    await semaphore.acquire()
+    order = []
+
+    async def waiter(name, priority):
+        await semaphore.acquire(priority)
+        order.append(name)
+        semaphore.release()
+
+    tasks = [
+        asyncio.create_task(waiter("low", 0)),
+        asyncio.create_task(waiter("high", 5)),
+        asyncio.create_task(waiter("mid", 1)),
+    ]
+    await asyncio.sleep(0)
+    semaphore.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["high", "mid", "low"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    semaphore = PrioritySemaphore(1)
+    await semaphore.acquire()
+    waiter = asyncio.create_task(semaphore.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    semaphore.release()
+
+    await asyncio.wait_for(semaphore.acquire(), timeout=0.1)
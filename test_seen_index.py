@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from ArbitrageEngine import ArbitrageEngine, SeenListingIndex, normalize_listing_url
+
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_strips_query_fragment_and_trailing_slash(self):
+        self.assertEqual(
+            normalize_listing_url("HTTPS://WWW.eBay.com/itm/1/?hash=abc#photos"),
+            "https://www.ebay.com/itm/1",
+        )
+
+
+class SeenListingIndexTest(unittest.TestCase):
+    def test_only_new_or_repriced_listings_pass(self):
+        index = SeenListingIndex()
+        first = [
+            {"title": "a", "price": 10, "url": "https://x.com/1?ref=1"},
+            {"title": "b", "price": 20, "url": "https://x.com/2"},
+        ]
+        self.assertEqual(index.filter_new(first, now=0), first)
+
+        second = [
+            {"title": "a", "price": 10, "url": "https://x.com/1?ref=2"},
+            {"title": "b", "price": 15, "url": "https://x.com/2"},
+            {"title": "c", "price": 5, "url": "https://x.com/3"},
+        ]
+        self.assertEqual(index.filter_new(second, now=1), second[1:])
+
+    def test_expired_listing_is_new_again(self):
+        index = SeenListingIndex(ttl=100)
+        listing = {"title": "a", "price": 10, "url": "https://x.com/1"}
+        index.filter_new([listing], now=0)
+        self.assertEqual(index.filter_new([listing], now=50), [])
+        self.assertEqual(index.filter_new([listing], now=151), [listing])
+
+    def test_bounded_size_forgets_least_recent(self):
+        index = SeenListingIndex(max_entries=2)
+        listings = [{"title": str(i), "price": 1, "url": f"https://x.com/{i}"} for i in range(3)]
+        index.filter_new(listings, now=0)
+        self.assertEqual(len(index), 2)
+        self.assertNotIn(listings[0], index)
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "seen.db")
+            listing = {"title": "a", "price": 10, "url": "https://x.com/1"}
+            index = SeenListingIndex(path=path)
+            index.filter_new([listing])
+            index.close()
+
+            reopened = SeenListingIndex(path=path)
+            self.assertEqual(reopened.filter_new([listing]), [])
+            reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_run_alerts_each_deal_once(monkeypatch):
+    async def fake_ebay(self, session):
+        return [{"title": "steal", "price": 1, "url": "https://www.ebay.com/itm/1"}]
+
+    monkeypatch.setattr(ArbitrageEngine, "query_ebay", fake_ebay)
+    alerts = []
+    engine = ArbitrageEngine(
+        search_terms=[],
+        marketplaces=["ebay"],
+        refresh_interval=0,
+        deal_threshold=0.9,
+        alert_callback=lambda listing, price: alerts.append(listing),
+    )
+
+    await engine.run(iterations=3)
+
+    assert len(alerts) == 1
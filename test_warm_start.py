@@ -0,0 +1,134 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pytest
+
+from ArbitrageEngine import (
+    MarketplaceSpec,
+    WarmWorker,
+    compile_extractor,
+    default_warm_socket,
+    warm_start,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCAN = ["item", "--iterations", "1", "--marketplaces", "none"]
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_import_skips_heavy_dependencies(self):
+        code = (
+            "import sys, ArbitrageEngine; "
+            "print([m for m in ('aiohttp', 'bs4', 'soupsieve', 'lxml', 'numpy', 'sqlite3') "
+            "if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_extractors_compile_on_first_use(self):
+        spec = MarketplaceSpec("lazy", "https://lazy.example", "/?q={query}", items="li", link="a")
+        extractor = compile_extractor(spec)
+        self.assertFalse(extractor._compiled)
+        self.assertEqual(extractor('<li><a href="/1">Lamp $5</a></li>')[0].price, 5.0)
+        self.assertTrue(extractor._compiled)
+
+
+@pytest.fixture
+def socket_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "warm.sock")
+        yield path
+        if os.path.exists(path):
+            # Retire the worker by presenting it an outdated version
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(path)
+                conn.sendall(json.dumps({"argv": [], "stamp": "outdated"}).encode() + b"\n")
+                assert json.loads(conn.makefile("rb").readline()) == {"stale": True}
+            assert not os.path.exists(path)
+
+
+def test_warm_start_reuses_worker(socket_path, capsys):
+    assert warm_start(SCAN, socket_path, idle_timeout=30) == 0
+    assert os.path.exists(socket_path)
+    assert warm_start(SCAN, socket_path, idle_timeout=30) == 0
+
+    assert warm_start(["--deal-threshold", "x"], socket_path) == 2
+    assert "usage:" in capsys.readouterr().err
+
+
+def test_refuses_socket_of_another_user(socket_path, capsys):
+    from unittest import mock
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as squatter:
+        squatter.bind(socket_path)
+        squatter.listen()
+        squatter.settimeout(0.1)
+        with mock.patch("ArbitrageEngine.os.getuid", return_value=os.getuid() + 1):
+            assert warm_start(SCAN, socket_path, timeout=1) == 1
+            assert WarmWorker(socket_path)._listen() is None
+        assert "owned by another user" in capsys.readouterr().err
+        with pytest.raises(socket.timeout):
+            squatter.accept()
+        assert os.path.exists(socket_path)
+    os.unlink(socket_path)
+
+
+class DefaultSocketTest(unittest.TestCase):
+    def setUp(self):
+        from unittest import mock
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.runtime = tmp.name
+        patcher = mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.runtime})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_socket_is_in_private_directory(self):
+        path = default_warm_socket()
+        directory = os.path.join(self.runtime, "arbitrage-engine")
+        self.assertEqual(path, os.path.join(directory, "worker.sock"))
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+        self.assertEqual(default_warm_socket(), path)
+
+    def test_rejects_shared_or_foreign_directory(self):
+        from unittest import mock
+
+        directory = os.path.join(self.runtime, "arbitrage-engine")
+        os.mkdir(directory, 0o700)
+        with mock.patch("ArbitrageEngine.os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                default_warm_socket()
+        os.chmod(directory, 0o777)
+        with self.assertRaises(PermissionError):
+            default_warm_socket()
+        os.rmdir(directory)
+        os.symlink(self.runtime, directory)
+        with self.assertRaises(PermissionError):
+            default_warm_socket()
+
+
+class CLIWarmStartTest(unittest.TestCase):
+    def test_cli_forwards_to_warm_worker(self):
+        from unittest import mock
+
+        argv = ["item", "--warm-start", "--warm-socket", "/tmp/w.sock", "--iterations", "1"]
+
+        with mock.patch("ArbitrageEngine.warm_start", return_value=3) as client:
+            with mock.patch("ArbitrageEngine.ArbitrageEngine") as AE:
+                from ArbitrageEngine import main
+
+                with self.assertRaises(SystemExit) as exit:
+                    main(argv)
+                AE.assert_not_called()
+                self.assertEqual(exit.exception.code, 3)
+                client.assert_called_once_with(
+                    ["item", "--warm-socket", "/tmp/w.sock", "--iterations", "1"], "/tmp/w.sock", 600.0
+                )